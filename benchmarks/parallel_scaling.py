@@ -0,0 +1,65 @@
+"""
+Measures how `render_text` throughput scales with the number of worker
+processes, on `resources/demo_texts.txt` repeated to book length.
+
+    python benchmarks/parallel_scaling.py --workers 1 2 4 8 --repeat 20
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from glyph_renderer import GlyphRenderer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=10, help="How often to repeat the demo text"
+    )
+    parser.add_argument(
+        "--check", action="store_true", help="Verify output matches the serial path"
+    )
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "resources", "demo_texts.txt")) as f:
+        text = " ".join([f.read()] * args.repeat)
+    n_words = len(text.split())
+    settings = dict(line_width=748, line_height=100, lines_per_page=10)
+
+    reference = None
+    print(f"{n_words} words, {os.cpu_count()} CPUs")
+    print(
+        f"{'workers':>8} {'seconds':>9} {'words/s':>10} {'pages/s':>9} {'speedup':>8}"
+    )
+    baseline = None
+    for workers in args.workers:
+        # a fresh renderer per run, so no run benefits from another's word cache
+        renderer = GlyphRenderer()
+        start = time.perf_counter()
+        pages = renderer.render_text(text, workers=workers, **settings)
+        elapsed = time.perf_counter() - start
+
+        baseline = baseline or elapsed
+        print(
+            f"{workers:>8} {elapsed:>9.2f} {n_words / elapsed:>10.0f} "
+            f"{len(pages) / elapsed:>9.1f} {baseline / elapsed:>7.2f}x"
+        )
+
+        if args.check:
+            signature = [(page.size, page.tobytes()) for page in pages]
+            if reference is None:
+                reference = signature
+            elif signature != reference:
+                sys.exit(f"Output with {workers} workers differs from the first run")
+
+
+if __name__ == "__main__":
+    main()
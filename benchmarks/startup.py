@@ -0,0 +1,109 @@
+"""
+Checks the start-up cost of the CLI against a budget.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --budget-ms 150 --repeat 5
+
+Runs `main.py --help` and an encode-only `main.py encode` with
+`python -X importtime` and fails (exit status 1) if either imports a module
+it should not need (PIL, numpy, tqdm, asyncio) or if its total import time,
+as reported by -X importtime, exceeds the budget. The reported time is the best
+of `--repeat` runs. The modules an encode-only run imports are listed with
+`--verbose`, slowest first.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "src", "main.py")
+
+# Modules that only rendering (or serving) needs
+FORBIDDEN = ("PIL", "numpy", "tqdm", "asyncio")
+
+DEFAULT_BUDGET_MS = 150
+
+
+def import_times(args):
+    """
+    Runs main.py with -X importtime.
+
+    Returns:
+        dict: Cumulative import time in microseconds per top-level import.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", MAIN, *args],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode != 0:
+        sys.exit(f"main.py {' '.join(args)} failed:\n{completed.stderr}")
+
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            # Top-level imports only; their times include their dependencies
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def check(label, args, budget_ms, repeat, verbose):
+    runs = [import_times(args) for _ in range(repeat)]
+    best = min(runs, key=lambda times: sum(times.values()))
+    total_ms = sum(best.values()) / 1000
+
+    modules = set().union(*runs)
+    forbidden = sorted(
+        name
+        for name in modules
+        if any(name == root or name.startswith(root + ".") for root in FORBIDDEN)
+    )
+
+    ok = total_ms <= budget_ms and not forbidden
+    print(
+        f"{label:<8} {total_ms:>7.1f} ms of {budget_ms} ms {'ok' if ok else 'FAILED'}"
+    )
+    if forbidden:
+        print(f"  imports {', '.join(forbidden)}")
+    if verbose:
+        for name, micros in sorted(best.items(), key=lambda item: -item[1]):
+            print(f"  {micros / 1000:>7.1f} ms  {name}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help="Import time budget per command",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per command")
+    parser.add_argument("--verbose", action="store_true", help="List the imports")
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        f.write("Hello, world. Issue 2024\n")
+    try:
+        results = [
+            check("--help", ["--help"], args.budget_ms, args.repeat, args.verbose),
+            check(
+                "encode", ["encode", f.name], args.budget_ms, args.repeat, args.verbose
+            ),
+        ]
+    finally:
+        os.remove(f.name)
+
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
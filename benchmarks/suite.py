@@ -0,0 +1,292 @@
+"""
+Benchmarks encoding, glyph loading, word and text rendering and PDF export on
+fixed corpora, and compares the results against a stored baseline.
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --baseline results.json --threshold 0.15
+
+The corpora are `resources/demo_texts.txt` cut to its first 100 words (short),
+as is (medium) and repeated 20 times (book). Every case runs in a fresh
+process, so that each starts cold and reports its own peak RSS; the reported
+time is the best of `--repeat` runs. Throughput is reported in words/s
+(glyphs/s for load_glyph_image) and pages/s. With `--baseline`, a case is a
+regression if it got more than `--threshold` slower, and the script exits
+with status 1 if any case did.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+SIZES = {"short": 100, "medium": None, "book": 20}
+RESULT_PREFIX = "RESULT "
+# Layout of the render_text cases: the pages of the "kindle" PDF profile
+PAGE_SETTINGS = dict(line_width=748, line_height=100, lines_per_page=10)
+
+
+def load_corpus(size):
+    with open(os.path.join(ROOT, "resources", "demo_texts.txt"), encoding="utf-8") as f:
+        words = f.read().split()
+    if size == "short":
+        words = words[: SIZES["short"]]
+    elif size == "book":
+        words = words * SIZES["book"]
+    return " ".join(words)
+
+
+def bench_encode_word(text):
+    from orthic_encoder import OrthicEncoder
+
+    encoder = OrthicEncoder()
+    words = text.split()
+
+    def run():
+        for word in words:
+            encoder.encode_word(word)
+        return {"words": len(words)}
+
+    return run
+
+
+def bench_load_glyph_image(text):
+    import glyph_atlas
+    from glyph_renderer import GlyphRenderer
+
+    def run():
+        # A fresh atlas each time, so that every glyph is decoded again
+        renderer = GlyphRenderer(atlas=glyph_atlas.GlyphAtlas())
+        symbols = renderer.atlas.symbols()
+        for symbol in symbols:
+            renderer.load_glyph_image(symbol)
+        return {"glyphs": len(symbols)}
+
+    return run
+
+
+def bench_render_word(text):
+    from glyph_renderer import GlyphRenderer
+
+    # No word cache, so that every word is actually rasterised
+    renderer = GlyphRenderer(cache_bytes=0)
+    words = text.split()
+
+    def run():
+        for word in words:
+            renderer.render_word(word)
+        return {"words": len(words)}
+
+    return run
+
+
+def bench_render_text(text):
+    from glyph_renderer import GlyphRenderer
+
+    def run():
+        renderer = GlyphRenderer()
+        pages = renderer.render_text(text, **PAGE_SETTINGS)
+        return {"words": len(text.split()), "pages": len(pages)}
+
+    return run
+
+
+def bench_render_text_scaled(text):
+    from glyph_renderer import GlyphRenderer
+
+    def run():
+        # The "kindle" layout drawn at the resolution of the "kindle-paperwhite"
+        renderer = GlyphRenderer(scale=300 / 212)
+        pages = renderer.render_text(text, **PAGE_SETTINGS)
+        return {"words": len(text.split()), "pages": len(pages)}
+
+    return run
+
+
+def bench_pdf_export(text):
+    import pdf_export
+    from orthic_engine import OrthicEngine
+
+    def run():
+        engine = OrthicEngine()
+        pages = pdf_export.render_pdf(engine, text, io.BytesIO())
+        return {"words": len(text.split()), "pages": pages}
+
+    return run
+
+
+def bench_pdf_export_words(text):
+    import pdf_export
+    from orthic_engine import OrthicEngine
+
+    def run():
+        engine = OrthicEngine()
+        pages = pdf_export.render_pdf(engine, text, io.BytesIO(), backend="words")
+        return {"words": len(text.split()), "pages": pages}
+
+    return run
+
+
+def bench_pdf_export_vector(text):
+    import pdf_export
+    from orthic_engine import OrthicEngine
+
+    def run():
+        engine = OrthicEngine()
+        pages = pdf_export.render_pdf(engine, text, io.BytesIO(), backend="vector")
+        return {"words": len(text.split()), "pages": pages}
+
+    return run
+
+
+# name -> (benchmark, corpus sizes it runs on)
+CASES = {
+    "encode_word": (bench_encode_word, list(SIZES)),
+    "load_glyph_image": (bench_load_glyph_image, ["medium"]),
+    "render_word": (bench_render_word, list(SIZES)),
+    "render_text": (bench_render_text, list(SIZES)),
+    "render_text_scaled": (bench_render_text_scaled, ["medium"]),
+    "pdf_export": (bench_pdf_export, list(SIZES)),
+    "pdf_export_words": (bench_pdf_export_words, list(SIZES)),
+    "pdf_export_vector": (bench_pdf_export_vector, list(SIZES)),
+}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_case(name, size, repeat):
+    """Runs one case in this process and returns its result."""
+    benchmark, _ = CASES[name]
+    run = benchmark(load_corpus(size))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        counts = run()
+        best = min(best, time.perf_counter() - start)
+
+    result = {"seconds": best, "peak_rss_mb": peak_rss_mb()}
+    for unit, count in counts.items():
+        result[unit] = count
+        result[f"{unit}_per_s"] = count / best
+    return result
+
+
+def run_case_process(name, size, repeat):
+    """Runs one case in a fresh process and returns its result."""
+    completed = subprocess.run(
+        [sys.executable, __file__, "--case", name, size, "--repeat", str(repeat)],
+        capture_output=True,
+        text=True,
+    )
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX) :])
+    sys.exit(f"{name}/{size} failed:\n{completed.stderr}")
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results against a baseline.
+
+    Returns:
+        list: (case, baseline seconds, seconds, change) of every case that got
+        more than `threshold` slower.
+    """
+    regressions = []
+    print(f"\n{'case':<26} {'baseline':>9} {'now':>9} {'change':>8} {'rss':>8}")
+    for case, result in results.items():
+        before = baseline.get(case)
+        if before is None:
+            continue
+        change = result["seconds"] / before["seconds"] - 1
+        rss_change = result["peak_rss_mb"] - before["peak_rss_mb"]
+        flag = "  REGRESSION" if change > threshold else ""
+        print(
+            f"{case:<26} {before['seconds']:>9.3f} {result['seconds']:>9.3f} "
+            f"{change:>+8.1%} {rss_change:>+6.1f}MB{flag}"
+        )
+        if change > threshold:
+            regressions.append((case, before["seconds"], result["seconds"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--cases", nargs="+", choices=list(CASES), default=list(CASES), help="Cases"
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", choices=list(SIZES), default=list(SIZES), help="Corpora"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case")
+    parser.add_argument("--output", type=str, help="Save the results as JSON")
+    parser.add_argument(
+        "--baseline", type=str, help="Compare against results saved with --output"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="Slowdown (as a fraction) that counts as a regression",
+    )
+    parser.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case is not None:
+        print(RESULT_PREFIX + json.dumps(run_case(*args.case, args.repeat)))
+        return
+
+    results = {}
+    print(f"{'case':<26} {'seconds':>9} {'words/s':>10} {'pages/s':>8} {'peak RSS':>9}")
+    for name in args.cases:
+        for size in CASES[name][1]:
+            if size not in args.sizes:
+                continue
+            result = run_case_process(name, size, args.repeat)
+            results[f"{name}/{size}"] = result
+            rate = result.get("words_per_s", result.get("glyphs_per_s"))
+            pages = result.get("pages_per_s")
+            pages = f"{pages:.1f}" if pages is not None else "-"
+            print(
+                f"{name + '/' + size:<26} {result['seconds']:>9.3f} {rate:>10.0f} "
+                f"{pages:>8} {result['peak_rss_mb']:>7.1f}MB"
+            )
+
+    if args.output is not None:
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "repeat": args.repeat,
+            },
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            sys.exit(
+                f"{len(regressions)} case(s) more than {args.threshold:.0%} slower "
+                "than the baseline"
+            )
+
+
+if __name__ == "__main__":
+    main()
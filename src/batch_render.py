@@ -0,0 +1,431 @@
+"""
+Headless rendering of many documents at once.
+
+    python3 src/main.py batch 'books/*.txt' --output-dir out --png --pdf
+
+Each input file is rendered to PNG pages and/or a PDF in the output
+directory, named after the input: `<name>.png` (or `<name>-<page>.png` when
+paginated) and `<name>.pdf`. A manifest in the output directory records a
+hash of each document's text, render options and glyphs. Documents whose hash
+is unchanged and whose outputs all still exist are skipped.
+
+Documents are rendered in parallel by a process pool. The glyphs are loaded
+once, in the parent before the pool starts, and the workers are forked so that
+they share them, whatever the platform's default start method. Where fork is
+not available (Windows), each worker loads the glyphs itself. A compiled glyph
+pack is memory-mapped, so its pages are shared between processes in any case.
+
+With a word cache on disk (`--cache-dir`, see `disk_cache`), the workers share
+rendered words with each other and with later batches, and the summary reports
+how long warm (cached) and cold words took.
+"""
+
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import glyph_atlas
+import glyph_pack
+import pdf_export
+import text_layout
+from orthic_engine import get_engine
+
+MANIFEST_FILENAME = ".text2orthic-batch.json"
+
+
+class BatchResult:
+    """
+    What happened to one document.
+
+    Attributes:
+        path (str): The input file.
+        status (str): "rendered", "up to date" or "failed".
+        outputs (list): The files written (or found up to date).
+        pages (int): Number of pages rendered, per output format.
+        words (int): Number of words in the document.
+        seconds (float): Time spent rendering it.
+        error (str or None): Why it failed.
+        cache (dict or None): What the word cache on disk did for it: "hits",
+            "misses", "warm_seconds" and "cold_seconds".
+    """
+
+    __slots__ = (
+        "path",
+        "status",
+        "outputs",
+        "pages",
+        "words",
+        "seconds",
+        "error",
+        "cache",
+    )
+
+    def __init__(
+        self,
+        path,
+        status,
+        outputs=(),
+        pages=0,
+        words=0,
+        seconds=0.0,
+        error=None,
+        cache=None,
+    ):
+        self.path = path
+        self.status = status
+        self.outputs = list(outputs)
+        self.pages = pages
+        self.words = words
+        self.seconds = seconds
+        self.error = error
+        self.cache = cache
+
+    def __repr__(self):
+        return f"BatchResult(path={self.path!r}, status={self.status!r})"
+
+
+def expand_inputs(patterns):
+    """
+    Expands file names and glob patterns (`**` matches subdirectories).
+
+    Returns:
+        list: The matching files, without duplicates, in the order given.
+
+    Raises:
+        FileNotFoundError: If a pattern matches no file.
+    """
+    paths = {}
+    for pattern in patterns:
+        matches = sorted(
+            path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path)
+        )
+        if not matches:
+            raise FileNotFoundError(f"No input files match '{pattern}'")
+        paths.update(dict.fromkeys(matches))
+    return list(paths)
+
+
+def output_stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def document_hash(path, options, glyph_hash):
+    """
+    Hashes everything a document's outputs depend on: its text, the render
+    options and the glyphs.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    digest.update(glyph_hash.encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILENAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def render_document(path, output_dir, options):
+    """
+    Renders one document to PNG pages and/or a PDF in `output_dir`.
+
+    Args:
+        path (str): The text file to render.
+        output_dir (str): Where to write the outputs.
+        options (dict): "png" and "pdf" (whether to write each format),
+            "settings" (the `render_text` layout settings for PNGs), and
+            "profile", "bits" and "backend" (for PDFs, see `pdf_export`).
+
+    Returns:
+        BatchResult: The outcome; failures are reported rather than raised.
+    """
+    engine = get_engine()
+    stem = os.path.join(output_dir, output_stem(path))
+    outputs = []
+    pages = 0
+    cache_before = engine.disk_cache_stats()
+    start = time.perf_counter()
+    try:
+        if options["png"]:
+            settings = options["settings"]
+            paginated = settings.get("lines_per_page", float("inf")) != float("inf")
+            with open(path, encoding="utf-8") as f:
+                for page_number, page in enumerate(
+                    engine.iter_pages(f, **settings), start=1
+                ):
+                    output = f"{stem}-{page_number}.png" if paginated else f"{stem}.png"
+                    page.save(output)
+                    outputs.append(output)
+            pages = len(outputs)
+
+        if options["pdf"]:
+            with open(path, encoding="utf-8") as f:
+                pdf_pages = pdf_export.render_pdf(
+                    engine,
+                    f,
+                    f"{stem}.pdf",
+                    options["profile"],
+                    options["bits"],
+                    options["backend"],
+                )
+            outputs.append(f"{stem}.pdf")
+            pages = pages or pdf_pages
+
+        with open(path, encoding="utf-8") as f:
+            words = sum(1 for _ in text_layout.iter_words(f))
+    except Exception as error:
+        return BatchResult(
+            path,
+            "failed",
+            outputs,
+            seconds=time.perf_counter() - start,
+            error=f"{type(error).__name__}: {error}",
+        )
+    finally:
+        # Workers never exit cleanly, so write their new words now
+        engine.flush()
+
+    return BatchResult(
+        path,
+        "rendered",
+        outputs,
+        pages,
+        words,
+        time.perf_counter() - start,
+        cache=_cache_delta(cache_before, engine.disk_cache_stats()),
+    )
+
+
+def _cache_delta(before, after):
+    if before is None:
+        return None
+    return {
+        name: after[name] - before[name]
+        for name in ("hits", "misses", "warm_seconds", "cold_seconds")
+    }
+
+
+def _render_task(task):
+    return render_document(*task)
+
+
+def _pool_context():
+    # Spawned or forkserver workers (the default on macOS, and on Linux from
+    # Python 3.14) would each load every glyph again
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
+def run_batch(
+    patterns,
+    output_dir,
+    png=True,
+    pdf=False,
+    profile=pdf_export.DEFAULT_PROFILE,
+    bits=8,
+    backend=pdf_export.DEFAULT_BACKEND,
+    settings=None,
+    workers=None,
+    force=False,
+    on_result=None,
+):
+    """
+    Renders every document matching `patterns` into `output_dir`.
+
+    Args:
+        patterns (list): Input files and glob patterns.
+        output_dir (str): Where to write the outputs; created if needed.
+        png (bool, optional): Write PNG pages.
+        pdf (bool, optional): Write a PDF.
+        profile (str, optional): Page format of the PDFs.
+        bits (int, optional): 8 for grayscale, 1 for black-and-white PDF pages.
+        backend (str, optional): How PDF pages are stored, see
+            `pdf_export.render_pdf`.
+        settings (dict, optional): Layout settings for the PNGs, see
+            `GlyphRenderer.render_text`.
+        workers (int, optional): Number of processes. Defaults to one per CPU;
+            1 renders in this process.
+        force (bool, optional): Render documents even if they are up to date.
+        on_result (callable, optional): Called with each BatchResult as soon as
+            it is known.
+
+    Returns:
+        list: One BatchResult per document, in input order.
+    """
+    paths = expand_inputs(patterns)
+    stems = {}
+    for path in paths:
+        stems.setdefault(output_stem(path), []).append(path)
+    clashes = [group for group in stems.values() if len(group) > 1]
+    if clashes:
+        raise ValueError(
+            "Inputs would overwrite each other's outputs: "
+            + "; ".join(", ".join(group) for group in clashes)
+        )
+
+    os.makedirs(output_dir, exist_ok=True)
+    options = {
+        "png": png,
+        "pdf": pdf,
+        "profile": pdf_export.get_profile(profile).name,
+        "bits": bits,
+        "backend": pdf_export.check_backend(backend),
+        "settings": settings or {},
+    }
+    engine = get_engine()
+    glyph_hash = glyph_pack.content_hash(engine.glyph_folder)
+    manifest = load_manifest(output_dir)
+
+    results = {}
+    hashes = {}
+    todo = []
+    for path in paths:
+        key = os.path.abspath(path)
+        hashes[path] = document_hash(path, options, glyph_hash)
+        entry = manifest.get(key)
+        if (
+            not force
+            and entry is not None
+            and entry["hash"] == hashes[path]
+            and all(os.path.exists(output) for output in entry["outputs"])
+        ):
+            result = BatchResult(
+                path, "up to date", entry["outputs"], entry["pages"], entry["words"]
+            )
+            results[path] = result
+            if on_result is not None:
+                on_result(result)
+        else:
+            todo.append(path)
+
+    def finish(result):
+        results[result.path] = result
+        if result.status == "rendered":
+            key = os.path.abspath(result.path)
+            previous = manifest.get(key, {}).get("outputs", [])
+            # e.g. pages that no longer exist because the document got shorter
+            for output in set(previous) - set(result.outputs):
+                if os.path.exists(output):
+                    os.remove(output)
+            manifest[key] = {
+                "hash": hashes[result.path],
+                "outputs": result.outputs,
+                "pages": result.pages,
+                "words": result.words,
+            }
+            save_manifest(output_dir, manifest)
+        if on_result is not None:
+            on_result(result)
+
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    tasks = [(path, output_dir, options) for path in todo]
+    if workers <= 1:
+        for task in tasks:
+            finish(_render_task(task))
+    else:
+        # Load every glyph before forking so that the workers inherit them
+        glyph_atlas.get_atlas(engine.glyph_folder).preload()
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=_pool_context()
+        ) as pool:
+            for result in pool.map(_render_task, tasks):
+                finish(result)
+
+    return [results[path] for path in paths]
+
+
+def format_summary(results, elapsed):
+    """
+    Formats a per-file timing and throughput table, with totals.
+
+    Args:
+        results (list): The BatchResults.
+        elapsed (float): Wall-clock time of the whole batch, in seconds.
+
+    Returns:
+        str: The table.
+    """
+    width = max([len("file")] + [len(result.path) for result in results])
+    lines = [
+        f"{'file':<{width}} {'status':<10} {'pages':>6} {'words':>8} "
+        f"{'seconds':>8} {'words/s':>8}"
+    ]
+    for result in results:
+        if result.status == "rendered" and result.seconds:
+            rate = f"{result.words / result.seconds:.0f}"
+        else:
+            rate = "-"
+        seconds = f"{result.seconds:.2f}" if result.status != "up to date" else "-"
+        lines.append(
+            f"{result.path:<{width}} {result.status:<10} {result.pages:>6} "
+            f"{result.words:>8} {seconds:>8} {rate:>8}"
+        )
+        if result.error:
+            lines.append(f"  {result.error}")
+
+    counts = {
+        status: sum(result.status == status for result in results)
+        for status in ("rendered", "up to date", "failed")
+    }
+    rendered = [result for result in results if result.status == "rendered"]
+    words = sum(result.words for result in rendered)
+    pages = sum(result.pages for result in rendered)
+    lines.append(
+        f"{len(results)} files ({counts['rendered']} rendered, "
+        f"{counts['up to date']} up to date, {counts['failed']} failed): "
+        f"{pages} pages, {words} words in {elapsed:.2f}s"
+        + (
+            f", {words / elapsed:.0f} words/s, {pages / elapsed:.1f} pages/s"
+            if elapsed
+            else ""
+        )
+    )
+
+    caches = [result.cache for result in rendered if result.cache is not None]
+    if caches:
+        lines.append(format_cache_summary(caches))
+    return "\n".join(lines)
+
+
+def format_cache_summary(caches):
+    """
+    Formats the warm and cold timings of the word cache on disk.
+
+    Args:
+        caches (list): The `BatchResult.cache` dicts to add up.
+
+    Returns:
+        str: One line.
+    """
+    hits = sum(cache["hits"] for cache in caches)
+    misses = sum(cache["misses"] for cache in caches)
+    warm = sum(cache["warm_seconds"] for cache in caches)
+    cold = sum(cache["cold_seconds"] for cache in caches)
+
+    def per_word(seconds, count):
+        return f" ({seconds / count * 1000:.2f} ms/word)" if count else ""
+
+    lookups = hits + misses
+    return (
+        f"disk cache: {hits} warm words in {warm:.2f}s{per_word(warm, hits)}, "
+        f"{misses} cold in {cold:.2f}s{per_word(cold, misses)}, "
+        f"{hits / lookups if lookups else 0:.0%} hit rate"
+    )
@@ -0,0 +1,86 @@
+"""
+Single-channel compositing of coverage masks.
+
+Every glyph is black ink whose shape lives entirely in its alpha channel, so
+words and pages can be composited as 8-bit "L" coverage masks (0 = blank,
+255 = solid ink) instead of RGBA images, touching a quarter of the bytes.
+Colour is only applied when a mask is turned into an output image.
+"""
+
+from PIL import Image, ImageChops
+
+# How a mask is combined with what is already on the canvas. "over" is the
+# alpha arithmetic of `Image.alpha_composite` (a + b - a * b / 255), so it
+# matches the RGBA output up to rounding.
+BLEND_MODES = {
+    "over": ImageChops.screen,
+    "max": ImageChops.lighter,
+    "add": ImageChops.add,
+}
+DEFAULT_BLEND = "over"
+
+INK = (0, 0, 0)
+BACKGROUND = (255, 255, 255)
+
+
+def check_blend(blend):
+    if blend not in BLEND_MODES:
+        raise ValueError(
+            f"Unknown blend mode '{blend}', expected one of {', '.join(BLEND_MODES)}"
+        )
+    return blend
+
+
+def composite(canvas, mask, dest=(0, 0), blend=DEFAULT_BLEND):
+    """
+    Blends `mask` into `canvas` in place, with its top-left corner at `dest`.
+
+    Like `Image.alpha_composite`, `dest` may be negative and whatever falls
+    outside the canvas is clipped.
+
+    Args:
+        canvas (Image): An "L" coverage mask to draw on.
+        mask (Image): The "L" coverage mask to draw.
+        dest (tuple, optional): Where the mask's top-left corner goes.
+        blend (str, optional): One of `BLEND_MODES`.
+
+    Returns:
+        Image: `canvas`.
+    """
+    x, y = dest
+    left, top = max(x, 0), max(y, 0)
+    right = min(x + mask.width, canvas.width)
+    bottom = min(y + mask.height, canvas.height)
+    if left >= right or top >= bottom:
+        return canvas
+
+    box = (left, top, right, bottom)
+    source = mask.crop((left - x, top - y, right - x, bottom - y))
+    canvas.paste(BLEND_MODES[blend](canvas.crop(box), source), box)
+    return canvas
+
+
+def colorize(mask, ink=INK, background=BACKGROUND):
+    """
+    Paints a coverage mask in `ink` on an opaque `background`.
+
+    Returns:
+        Image: An RGBA image, as `GlyphRenderer.paste_on_white_background` returns.
+    """
+    return Image.composite(
+        Image.new("RGBA", mask.size, ink),
+        Image.new("RGBA", mask.size, background),
+        mask,
+    )
+
+
+def to_transparent(mask, ink=INK):
+    """
+    Paints a coverage mask in `ink` on a transparent background.
+
+    Returns:
+        Image: An RGBA image whose alpha channel is `mask`.
+    """
+    image = Image.new("RGBA", mask.size, ink)
+    image.putalpha(mask)
+    return image
@@ -0,0 +1,339 @@
+"""
+A persistent cache of rendered words, shared between processes and runs.
+
+`WordCache` keeps rendered words for the life of one process; a
+`DiskWordCache` keeps them on disk, so that jobs which render much the same
+vocabulary every day (and every worker process of those jobs) only render each
+word once.
+
+Entries are content-addressed: the key is a SHA-256 of the cache format
+version, the content hash of the glyph folder, the render parameters (the
+blend mode and scale) and the word. Editing, adding or removing any glyph PNG therefore
+makes every old entry unreachable; stale entries are evicted like any other
+least recently used entry.
+
+The cache is one SQLite database in WAL mode (`words.sqlite3` in the cache
+directory), read through a memory map. Any number of processes may read and
+write it at once: readers are never blocked, and SQLite's locking serialises
+the writers. Bitmaps are stored zlib-compressed, and new entries are written in
+batches of `BATCH_SIZE` (call `flush` to write the rest). The compressed bitmaps
+are bounded by `max_bytes`; once a write goes over it, the least recently used
+entries are deleted down to `EVICT_TO` of the budget. Last-use times are only
+refreshed once they are `TOUCH_INTERVAL` seconds old, so reads rarely write.
+
+Set the `TEXT2ORTHIC_CACHE_DIR` environment variable (or pass `--cache-dir` to
+the CLI) to give the process-wide engine a disk cache.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import weakref
+import zlib
+
+from PIL import Image
+
+import glyph_pack
+import instrumentation
+from glyph import Glyph
+
+CACHE_DIR_ENV = "TEXT2ORTHIC_CACHE_DIR"
+DATABASE_FILENAME = "words.sqlite3"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+FORMAT_VERSION = 1
+BATCH_SIZE = 64
+EVICT_TO = 0.9
+TOUCH_INTERVAL = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS words (
+    key BLOB PRIMARY KEY,
+    glyphs TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS words_used ON words (used);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta VALUES ('bytes', 0);
+"""
+
+# Caches with an open database, closed (and so flushed) at exit. Held weakly,
+# so that caches dropped by their renderer (e.g. on a glyph reload) go away
+_open_caches = weakref.WeakSet()
+_open_caches_lock = threading.Lock()
+
+
+@atexit.register
+def _close_open_caches():
+    with _open_caches_lock:
+        caches = list(_open_caches)
+    for cache in caches:
+        cache.close()
+
+
+class DiskWordCache:
+    """
+    A word cache on disk for one glyph folder and set of render parameters.
+
+    Several instances, in any number of processes, may share a directory. An
+    instance is thread-safe, and reconnects by itself in a forked child.
+    """
+
+    def __init__(
+        self,
+        directory,
+        glyph_folder,
+        blend=None,
+        max_bytes=DEFAULT_MAX_BYTES,
+        scale=1.0,
+    ):
+        """
+        Args:
+            directory (str): Where to keep the cache; created if needed.
+            glyph_folder: The folder of the glyph PNGs the words are rendered with.
+            blend (str, optional): The renderer's blend mode, see `GlyphRenderer`.
+            max_bytes (int, optional): Budget for the compressed bitmaps.
+            scale (float, optional): The renderer's scale, see `GlyphRenderer`.
+        """
+        self.directory = os.fspath(directory)
+        self.glyph_folder = glyph_folder
+        self.blend = blend
+        self.max_bytes = max_bytes
+        self.scale = scale
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.warm_seconds = 0.0
+        self.cold_seconds = 0.0
+        self._namespace = None
+        self._connection = None
+        self._pid = None
+        self._failed = False
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, DATABASE_FILENAME)
+
+    def key(self, word):
+        """
+        Returns:
+            bytes: The content address of a word's entry.
+        """
+        if self._namespace is None:
+            fingerprint = glyph_pack.content_hash(self.glyph_folder)
+            self._namespace = json.dumps(
+                [FORMAT_VERSION, fingerprint, self.blend, float(self.scale)]
+            ).encode()
+        return hashlib.sha256(self._namespace + b"\0" + word.encode()).digest()
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            # In a forked child, never use the parent's connection, and leave
+            # the parent's unwritten entries to the parent
+            self._connection = None
+            self._pending = {}
+            self._pid = os.getpid()
+
+    def _connect(self):
+        self._check_process()
+        if self._connection is None:
+            import sqlite3
+
+            os.makedirs(self.directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={256 * 1024 * 1024}")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+            with _open_caches_lock:
+                _open_caches.add(self)
+        return self._connection
+
+    def get(self, word):
+        """
+        Looks up a word.
+
+        Returns:
+            tuple or None: (glyphs, image) if the word is cached, otherwise None.
+        """
+        start = time.perf_counter()
+        key = self.key(word)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                self.hits += 1
+                self.warm_seconds += time.perf_counter() - start
+                return entry[1]
+            if self._failed:
+                self.misses += 1
+                return None
+            try:
+                row = (
+                    self._connect()
+                    .execute(
+                        "SELECT glyphs, mode, width, height, data, used FROM words "
+                        "WHERE key = ?",
+                        (key,),
+                    )
+                    .fetchone()
+                )
+                if row is not None and time.time() - row[5] > TOUCH_INTERVAL:
+                    self._connection.execute(
+                        "UPDATE words SET used = ? WHERE key = ?",
+                        (int(time.time()), key),
+                    )
+            except Exception as error:
+                self._fail(error)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+
+        glyphs_data, mode, width, height, data, _ = row
+        glyphs = [Glyph(*glyph) for glyph in json.loads(glyphs_data)]
+        image = Image.frombytes(mode, (width, height), zlib.decompress(data))
+        with self._lock:
+            self.hits += 1
+            self.warm_seconds += time.perf_counter() - start
+        return glyphs, image
+
+    def put(self, word, glyphs, image, seconds=0.0):
+        """
+        Stores a rendered word. It is written with the next batch.
+
+        Args:
+            word (str): The word.
+            glyphs (list): Its encoded glyphs.
+            image (Image): The rendered word.
+            seconds (float, optional): How long rendering it took, for `stats`.
+        """
+        key = self.key(word)
+        record = (
+            key,
+            json.dumps(
+                [[glyph.symbol, glyph.capital, glyph.double] for glyph in glyphs]
+            ),
+            image.mode,
+            image.width,
+            image.height,
+            zlib.compress(image.tobytes(), 1),
+        )
+        with self._lock:
+            self._check_process()
+            self._pending[key] = (record, (glyphs, image))
+            self.cold_seconds += seconds
+            if len(self._pending) >= BATCH_SIZE:
+                self._flush()
+
+    def flush(self):
+        """Writes the entries that are still waiting for a batch."""
+        with self._lock:
+            self._check_process()
+            self._flush()
+
+    def _flush(self):
+        if not self._pending or self._failed:
+            self._pending = {}
+            return
+        connection = None
+        now = int(time.time())
+        try:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            added = 0
+            for record, _ in self._pending.values():
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO words "
+                    "(key, glyphs, mode, width, height, data, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    record + (now,),
+                )
+                if cursor.rowcount == 1:
+                    added += len(record[5])
+                    self.writes += 1
+            connection.execute(
+                "UPDATE meta SET value = value + ? WHERE name = 'bytes'", (added,)
+            )
+            (total,) = connection.execute(
+                "SELECT value FROM meta WHERE name = 'bytes'"
+            ).fetchone()
+            if total > self.max_bytes:
+                self._evict(total)
+            connection.execute("COMMIT")
+        except Exception as error:
+            if connection is not None and connection.in_transaction:
+                connection.execute("ROLLBACK")
+            self._fail(error)
+        self._pending = {}
+
+    def _evict(self, total):
+        connection = self._connection
+        target = int(self.max_bytes * EVICT_TO)
+        while total > target:
+            rows = connection.execute(
+                "SELECT key, length(data) FROM words ORDER BY used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                total = 0
+                break
+            for key, size in rows:
+                if total <= target:
+                    break
+                connection.execute("DELETE FROM words WHERE key = ?", (key,))
+                total -= size
+                self.evictions += 1
+        connection.execute("UPDATE meta SET value = ? WHERE name = 'bytes'", (total,))
+
+    def _fail(self, error):
+        # The cache is only an optimisation: if the disk is full or the database
+        # is unusable, say so once and carry on without it
+        if not self._failed:
+            self._failed = True
+            instrumentation.warn(
+                f"Disabled the word cache in {self.directory}: "
+                f"{type(error).__name__}: {error}",
+                "disk_cache_error",
+                directory=self.directory,
+                error=str(error),
+            )
+
+    def close(self):
+        """Writes any pending entries and closes the database."""
+        with self._lock:
+            self._check_process()
+            self._flush()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+        with _open_caches_lock:
+            _open_caches.discard(self)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hits (warm words) and misses (cold words) with the time spent
+            on each, entries written and evicted, and the hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "warm_seconds": self.warm_seconds,
+                "cold_seconds": self.cold_seconds,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
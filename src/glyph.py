@@ -1,3 +1,5 @@
+import sys
+
 # symbols that are not connected to each other when printed and for which
 # no double-letter symbol should be rendered
 SPECIAL_SYMBOLS = [
@@ -21,17 +23,41 @@ SPECIAL_SYMBOLS = [
 
 
 class Glyph:
-    def __init__(self, symbol: str, capital: bool = False, double: bool = False):
-        self.symbol = symbol
-        self.capital = capital
-        self.double = double
+    """
+    An Orthic glyph: a symbol name plus capital and double-letter flags.
 
-    def __eq__(self, value):
-        return (
-            self.symbol == value.symbol
-            and self.capital == value.capital
-            and self.double == value.double
-        )
+    Glyphs are interned, immutable values. Constructing a glyph returns the one
+    shared instance for its symbol and flags, so equal glyphs are the same
+    object: they compare by identity, hash cheaply and can be used as dict keys
+    and set members, and an encoded document costs one pointer per glyph.
+    """
+
+    __slots__ = ("symbol", "capital", "double")
+
+    # (symbol, capital, double) -> the shared Glyph
+    _interned = {}
+
+    def __new__(cls, symbol: str, capital: bool = False, double: bool = False):
+        key = (symbol, bool(capital), bool(double))
+        glyph = cls._interned.get(key)
+        if glyph is None:
+            glyph = object.__new__(cls)
+            object.__setattr__(glyph, "symbol", sys.intern(symbol))
+            object.__setattr__(glyph, "capital", key[1])
+            object.__setattr__(glyph, "double", key[2])
+            # Another thread may have interned the same glyph meanwhile
+            glyph = cls._interned.setdefault(key, glyph)
+        return glyph
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Glyph is immutable, cannot set '{name}'")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Glyph is immutable, cannot delete '{name}'")
+
+    def __reduce__(self):
+        # Unpickling and copying go through __new__ and so return the shared glyph
+        return (Glyph, (self.symbol, self.capital, self.double))
 
     def __repr__(self):
         return (
@@ -0,0 +1,390 @@
+import threading
+from importlib import resources
+
+import numpy as np
+from PIL import Image
+
+import glyph_pack
+import instrumentation
+from glyph import SPECIAL_SYMBOLS
+
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+
+
+def alignment_mask(pixels):
+    """
+    Marks the green and red alignment pixels of an RGBA pixel array.
+
+    Args:
+        pixels (ndarray): A height x width x 4 array.
+
+    Returns:
+        ndarray: A height x width boolean array.
+    """
+    rgb = pixels[..., :3]
+    return np.all(rgb == GREEN, axis=-1) | np.all(rgb == RED, axis=-1)
+
+
+def convert_grayscale_to_alpha(img):
+    img = img.convert("RGBA")
+    pixels = np.array(img)
+
+    # Convert grayscale to alpha, with the same float arithmetic (and
+    # truncation) as int(0.299 * r + 0.587 * g + 0.114 * b) per pixel
+    r, g, b = (pixels[..., channel].astype(np.float64) for channel in range(3))
+    grayscale = (0.299 * r + 0.587 * g + 0.114 * b).astype(np.int64)
+
+    # Keep red and green pixels
+    ink = ~alignment_mask(pixels)
+    pixels[ink, :3] = 0
+    pixels[ink, 3] = 255 - grayscale[ink]
+
+    img.frombytes(pixels.tobytes())
+    return img
+
+
+def _last_position(mask):
+    indices = np.flatnonzero(mask)
+    if len(indices) == 0:
+        return None
+    y, x = divmod(int(indices[-1]), mask.shape[1])
+    return (x, y)
+
+
+def find_glyph_start_end_positions(img):
+    pixels = np.asarray(img.convert("RGBA"))
+    start_position = _last_position(np.all(pixels == (*GREEN, 255), axis=-1))
+    end_position = _last_position(np.all(pixels == (*RED, 255), axis=-1))
+    return start_position, end_position
+
+
+def find_alignment_pixels(img):
+    ys, xs = np.nonzero(alignment_mask(np.asarray(img.convert("RGBA"))))
+    return [(int(x), int(y)) for y, x in zip(ys, xs)]
+
+
+def scale_position(position, scale, size):
+    """
+    Maps a pixel position to the pixel containing its centre at another scale.
+
+    Args:
+        position (tuple or None): (x, y) at scale 1.
+        scale (float): The new scale.
+        size (tuple): Size of the scaled image, to clamp to.
+
+    Returns:
+        tuple or None: (x, y) at `scale`, or None if `position` is None.
+    """
+    if position is None:
+        return None
+    return (
+        min(int((position[0] + 0.5) * scale), size[0] - 1),
+        min(int((position[1] + 0.5) * scale), size[1] - 1),
+    )
+
+
+def replace_alignment_pixels(canvas, color=(0, 0, 0)):
+    if len(color) == 3:
+        color = (*color, 255)
+
+    pixels = np.array(canvas)
+    pixels[alignment_mask(pixels)] = color
+    canvas.frombytes(pixels.tobytes())
+
+    return canvas
+
+
+class GlyphEntry:
+    """
+    A preprocessed glyph: its alpha image, anchors and alignment-pixel variants.
+
+    Attributes:
+        symbol (str): The glyph name (the PNG filename without extension).
+        image (Image): The alpha-converted image, alignment pixels still visible.
+        start (tuple or None): Position of the green start pixel.
+        end (tuple or None): Position of the red end pixel.
+        bbox (tuple or None): Bounding box of the non-transparent pixels of `image`.
+        alignment_pixels (list): Positions of all green and red pixels.
+        connected (Image): `image` with the alignment pixels painted black.
+        detached (Image): `image` with the alignment pixels made transparent.
+        stitch_bbox (tuple or None): Bounding box of the visible pixels of
+            `stitch_image`.
+        mask (Image): The alpha channel of `image`, as an "L" coverage mask.
+        stitch_mask (Image): The alpha channel of `stitch_image`.
+    """
+
+    __slots__ = (
+        "symbol",
+        "image",
+        "start",
+        "end",
+        "bbox",
+        "alignment_pixels",
+        "connected",
+        "detached",
+        "stitch_bbox",
+        "mask",
+        "stitch_mask",
+    )
+
+    def __init__(
+        self, symbol, image, start, end, bbox, alignment_pixels, connected, detached
+    ):
+        self.symbol = symbol
+        self.image = image
+        self.start = start
+        self.end = end
+        self.bbox = bbox
+        self.alignment_pixels = alignment_pixels
+        self.connected = connected
+        self.detached = detached
+        self.stitch_bbox = self.stitch_image.getbbox()
+        # Glyph ink is black, so the alpha channel is all there is to them
+        self.mask = image.getchannel("A")
+        self.stitch_mask = self.stitch_image.getchannel("A")
+
+    @property
+    def size(self):
+        return self.image.size
+
+    @property
+    def stitch_image(self):
+        """The variant to composite when stitching this glyph into a word."""
+        return self.detached if self.symbol in SPECIAL_SYMBOLS else self.connected
+
+    def scaled(self, scale):
+        """
+        Resamples the glyph to another scale.
+
+        The images are resized with Lanczos filtering and the anchors and
+        alignment pixels are moved to the pixels that contain their centres.
+
+        Args:
+            scale (float): The new scale; 1 is the size of the glyph PNG.
+
+        Returns:
+            GlyphEntry: The scaled glyph.
+        """
+        size = (
+            max(1, round(self.image.width * scale)),
+            max(1, round(self.image.height * scale)),
+        )
+
+        def resize(img):
+            return img.resize(size, Image.Resampling.LANCZOS)
+
+        image = resize(self.image)
+        alignment_pixels = list(
+            dict.fromkeys(
+                scale_position(position, scale, size)
+                for position in self.alignment_pixels
+            )
+        )
+        return GlyphEntry(
+            self.symbol,
+            image,
+            scale_position(self.start, scale, size),
+            scale_position(self.end, scale, size),
+            image.getbbox(),
+            alignment_pixels,
+            resize(self.connected),
+            resize(self.detached),
+        )
+
+    @classmethod
+    def from_image(cls, symbol, img):
+        image = convert_grayscale_to_alpha(img)
+        start, end = find_glyph_start_end_positions(image)
+        connected = replace_alignment_pixels(image.copy())
+        detached = replace_alignment_pixels(image.copy(), (0, 0, 0, 0))
+        return cls(
+            symbol,
+            image,
+            start,
+            end,
+            image.getbbox(),
+            find_alignment_pixels(image),
+            connected,
+            detached,
+        )
+
+    @classmethod
+    def from_pack(cls, symbol, pack):
+        image, start, end, bbox, alignment_pixels = pack.read(symbol)
+        connected = image.copy()
+        detached = image.copy()
+        for position in alignment_pixels:
+            connected.putpixel(position, (0, 0, 0))
+            detached.putpixel(position, (0, 0, 0, 0))
+        return cls(
+            symbol, image, start, end, bbox, alignment_pixels, connected, detached
+        )
+
+
+class GlyphAtlas:
+    """
+    In-memory store of every glyph in a glyph folder.
+
+    Each PNG is decoded and preprocessed at most once; afterwards the images and
+    anchors are served from memory. Entries are built on first access, so
+    symbols that are never rendered are never decoded. If the folder has an
+    up-to-date compiled pack (see `glyph_pack`), glyphs are read from it instead
+    of from the PNGs.
+    """
+
+    def __init__(self, glyph_folder=resources.files("glyphs"), use_pack=True):
+        self.glyph_folder = glyph_folder
+        self.pack = glyph_pack.load_pack(glyph_folder) if use_pack else None
+        self._symbols = None
+        self._entries = {}
+        self._scaled = {}
+        self._lock = threading.Lock()
+
+    def symbols(self):
+        """
+        Lists the glyph names available in the glyph folder.
+
+        Returns:
+            list: The names of all PNGs in the folder, without extension.
+        """
+        if self._symbols is None:
+            if self.pack is not None:
+                self._symbols = self.pack.symbols()
+            else:
+                self._symbols = glyph_pack.glyph_names(self.glyph_folder)
+        return self._symbols
+
+    def __contains__(self, symbol):
+        return symbol in self.symbols()
+
+    def __getitem__(self, symbol) -> GlyphEntry:
+        entry = self._entries.get(symbol)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(symbol)
+                if entry is None:
+                    entry = self._load(symbol)
+                    self._entries[symbol] = entry
+        return entry
+
+    def preload(self):
+        """Decodes every glyph in the folder up front."""
+        for symbol in self.symbols():
+            self[symbol]
+        return self
+
+    def scaled(self, scale):
+        """
+        Returns the glyphs resampled to a scale, e.g. to render for a screen or
+        printer of a higher resolution than the glyph PNGs.
+
+        Each scale's atlas is created once and kept, and resamples each glyph
+        once, on first access.
+
+        Args:
+            scale (float): The scale; 1 is the size of the glyph PNGs.
+
+        Returns:
+            GlyphAtlas or ScaledAtlas: This atlas for scale 1, otherwise a
+            ScaledAtlas.
+        """
+        if scale <= 0:
+            raise ValueError(f"Scale must be positive, got {scale}")
+        if scale == 1:
+            return self
+        atlas = self._scaled.get(scale)
+        if atlas is None:
+            with self._lock:
+                atlas = self._scaled.get(scale)
+                if atlas is None:
+                    atlas = self._scaled[scale] = ScaledAtlas(self, scale)
+        return atlas
+
+    def _load(self, symbol):
+        with instrumentation.timer("glyph_load"):
+            return self._decode(symbol)
+
+    def _decode(self, symbol):
+        if self.pack is not None and symbol in self.pack:
+            return GlyphEntry.from_pack(symbol, self.pack)
+
+        path = self.glyph_folder.joinpath(f"{symbol}.png")
+        with Image.open(path) as img:
+            return GlyphEntry.from_image(symbol, img)
+
+
+class ScaledAtlas:
+    """
+    The glyphs of a GlyphAtlas, resampled to another scale.
+
+    Offers the same lookups as GlyphAtlas. Use `GlyphAtlas.scaled` rather than
+    creating these directly, so that each scale is resampled only once.
+    """
+
+    def __init__(self, atlas, scale):
+        """
+        Args:
+            atlas (GlyphAtlas): The glyphs at scale 1.
+            scale (float): The scale to resample them to.
+        """
+        self.atlas = atlas
+        self.scale = scale
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def glyph_folder(self):
+        return self.atlas.glyph_folder
+
+    def symbols(self):
+        return self.atlas.symbols()
+
+    def __contains__(self, symbol):
+        return symbol in self.atlas
+
+    def __getitem__(self, symbol) -> GlyphEntry:
+        entry = self._entries.get(symbol)
+        if entry is None:
+            source = self.atlas[symbol]
+            with self._lock:
+                entry = self._entries.get(symbol)
+                if entry is None:
+                    with instrumentation.timer("glyph_scale"):
+                        entry = source.scaled(self.scale)
+                    self._entries[symbol] = entry
+        return entry
+
+    def preload(self):
+        """Resamples every glyph in the folder up front."""
+        for symbol in self.symbols():
+            self[symbol]
+        return self
+
+
+_atlases = {}
+_atlases_lock = threading.Lock()
+
+
+def get_atlas(glyph_folder=resources.files("glyphs")) -> GlyphAtlas:
+    """
+    Returns the process-wide atlas for a glyph folder, creating it if needed.
+    """
+    key = str(glyph_folder)
+    with _atlases_lock:
+        atlas = _atlases.get(key)
+        if atlas is None:
+            atlas = _atlases[key] = GlyphAtlas(glyph_folder)
+        return atlas
+
+
+def reload_atlas(glyph_folder=resources.files("glyphs")) -> GlyphAtlas:
+    """
+    Replaces the process-wide atlas for a glyph folder with a freshly loaded one.
+
+    Objects still holding the previous atlas keep working with the old glyphs.
+    """
+    atlas = GlyphAtlas(glyph_folder)
+    with _atlases_lock:
+        _atlases[str(glyph_folder)] = atlas
+    return atlas
@@ -0,0 +1,403 @@
+"""
+Vector outlines of the glyphs, traced from the glyph PNGs.
+
+Each glyph's ink (the coverage mask `GlyphRenderer` stitches into words) is
+traced into closed contours at half coverage with marching squares. Edge
+crossings are interpolated between pixel centres, so the contours follow the
+anti-aliased edges of the strokes to a fraction of a pixel. The contours are
+then simplified (Ramer-Douglas-Peucker) and kept with the glyph's anchors and
+bounding boxes, in the glyph's pixel coordinates, so that words chain exactly
+as they do in raster output (see `GlyphRenderer.chain_glyphs`).
+
+Tracing is a one-time step: `build_outlines` stores the outlines of every glyph
+in a JSON file next to the PNGs, which is ignored as soon as any PNG changes
+(like a glyph pack, see `glyph_pack`). Without an up-to-date file, glyphs are
+traced on first use.
+
+Build it with `python src/glyph_outlines.py`.
+"""
+
+import json
+import os
+import pathlib
+import sys
+import threading
+from importlib import resources
+
+import glyph_pack
+import instrumentation
+
+OUTLINES_FILENAME = ".glyphoutlines.json"
+OUTLINES_VERSION = 1
+# Coverage at which strokes are traced, out of 255
+THRESHOLD = 127.5
+# Largest distance, in pixels, simplified contours may stray from the traced ones
+TOLERANCE = 0.2
+
+# Marching squares: the cell edges crossed by the contour, per case. Corners are
+# numbered top left 8, top right 4, bottom right 2 and bottom left 1; edges are
+# T(op), R(ight), B(ottom) and L(eft). The saddles (5 and 10) are looked up with
+# their centre inside (True) or outside (False).
+_SEGMENTS = {
+    1: (("L", "B"),),
+    2: (("B", "R"),),
+    3: (("L", "R"),),
+    4: (("T", "R"),),
+    (5, True): (("L", "T"), ("B", "R")),
+    (5, False): (("T", "R"), ("L", "B")),
+    6: (("T", "B"),),
+    7: (("L", "T"),),
+    8: (("L", "T"),),
+    9: (("T", "B"),),
+    (10, True): (("T", "R"), ("L", "B")),
+    (10, False): (("L", "T"), ("B", "R")),
+    11: (("T", "R"),),
+    12: (("L", "R"),),
+    13: (("B", "R"),),
+    14: (("L", "B"),),
+}
+
+
+def trace(mask, threshold=THRESHOLD, tolerance=TOLERANCE):
+    """
+    Traces the outlines of the ink in a coverage mask.
+
+    Args:
+        mask (Image): An "L" coverage mask.
+        threshold (float, optional): Coverage at which the outline runs.
+        tolerance (float, optional): How far, in pixels, the simplified contours
+            may stray from the traced ones.
+
+    Returns:
+        list: Closed contours, each a list of (x, y) points in pixel coordinates
+        (the top-left corner of the mask is (0, 0)). Filled with the even-odd
+        rule, they cover the ink.
+    """
+    import numpy as np
+
+    values = np.pad(np.asarray(mask, dtype=np.float64), 1)
+    inside = values >= threshold
+    # Case number of every cell between four neighbouring pixel centres
+    cases = (
+        inside[:-1, :-1] * 8
+        + inside[:-1, 1:] * 4
+        + inside[1:, 1:] * 2
+        + inside[1:, :-1] * 1
+    )
+
+    def crossing(a, b):
+        # Where the contour crosses the edge between pixel centres a and b,
+        # given as (row, column) in the padded mask
+        va, vb = values[a], values[b]
+        t = (threshold - va) / (vb - va)
+        # Pixel centres are at +0.5, less the padding
+        return (
+            a[1] - 0.5 + t * (b[1] - a[1]),
+            a[0] - 0.5 + t * (b[0] - a[0]),
+        )
+
+    # Each crossing is keyed by its edge: ("h", row, column) joins the centres
+    # (row, column) and (row, column + 1), ("v", row, column) joins (row, column)
+    # and (row + 1, column). Every crossing ends exactly two segments.
+    neighbours = {}
+    points = {}
+    for i, j in zip(*np.nonzero((cases > 0) & (cases < 15))):
+        i, j = int(i), int(j)
+        case = int(cases[i, j])
+        if case in (5, 10):
+            centre = values[i : i + 2, j : j + 2].mean() >= threshold
+            segments = _SEGMENTS[case, bool(centre)]
+        else:
+            segments = _SEGMENTS[case]
+        edges = {
+            "T": ("h", i, j),
+            "B": ("h", i + 1, j),
+            "L": ("v", i, j),
+            "R": ("v", i, j + 1),
+        }
+        for first, second in segments:
+            a, b = edges[first], edges[second]
+            neighbours.setdefault(a, []).append(b)
+            neighbours.setdefault(b, []).append(a)
+            for key in (a, b):
+                if key not in points:
+                    kind, row, column = key
+                    end = (row, column + 1) if kind == "h" else (row + 1, column)
+                    points[key] = crossing((row, column), end)
+
+    contours = []
+    while neighbours:
+        start, ends = next(iter(neighbours.items()))
+        contour = [points[start]]
+        previous, current = start, ends[0]
+        del neighbours[start]
+        while current != start:
+            contour.append(points[current])
+            ends = neighbours.pop(current)
+            following = ends[0] if ends[0] != previous else ends[1]
+            previous, current = current, following
+        contour = simplify(contour, tolerance)
+        if len(contour) >= 3:
+            contours.append(contour)
+    return contours
+
+
+def simplify(contour, tolerance):
+    """
+    Simplifies a closed contour with the Ramer-Douglas-Peucker algorithm.
+
+    Returns:
+        list: The points of `contour` that are needed to keep every dropped
+        point within `tolerance` of the simplified contour.
+    """
+    if len(contour) < 4:
+        return contour
+    # Split the loop at the point farthest from the first, and simplify both
+    # halves as open polylines
+    x0, y0 = contour[0]
+    far = max(
+        range(len(contour)),
+        key=lambda k: (contour[k][0] - x0) ** 2 + (contour[k][1] - y0) ** 2,
+    )
+    first = _simplify_open(contour[: far + 1], tolerance)
+    second = _simplify_open(contour[far:] + contour[:1], tolerance)
+    return first[:-1] + second[:-1]
+
+
+def _simplify_open(points, tolerance):
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = (dx * dx + dy * dy) ** 0.5
+        farthest, distance = None, tolerance
+        for k in range(first + 1, last):
+            x, y = points[k]
+            if length:
+                d = abs(dy * (x - x1) - dx * (y - y1)) / length
+            else:
+                d = ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+            if d > distance:
+                farthest, distance = k, d
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+class GlyphOutline:
+    """
+    A glyph as vector contours, with the anchors and boxes of its bitmap.
+
+    Offers the attributes `GlyphRenderer.chain_glyphs` reads from a GlyphEntry,
+    so outlines chain exactly as bitmaps do.
+
+    Attributes:
+        symbol (str): The glyph name.
+        size (tuple): Size of the glyph's bitmap.
+        start (tuple or None): Position of the green start pixel.
+        end (tuple or None): Position of the red end pixel.
+        bbox (tuple or None): Bounding box of the bitmap's visible pixels.
+        stitch_bbox (tuple or None): The same, once stitched.
+        contours (list): Closed contours of the stitched ink, as lists of (x, y),
+            to fill with the even-odd rule.
+    """
+
+    __slots__ = ("symbol", "size", "start", "end", "bbox", "stitch_bbox", "contours")
+
+    def __init__(self, symbol, size, start, end, bbox, stitch_bbox, contours):
+        self.symbol = symbol
+        self.size = size
+        self.start = start
+        self.end = end
+        self.bbox = bbox
+        self.stitch_bbox = stitch_bbox
+        self.contours = contours
+
+    @classmethod
+    def from_entry(cls, entry):
+        """Traces a GlyphEntry (see `glyph_atlas`)."""
+        return cls(
+            entry.symbol,
+            entry.size,
+            entry.start,
+            entry.end,
+            entry.bbox,
+            entry.stitch_bbox,
+            trace(entry.stitch_mask),
+        )
+
+    def to_dict(self):
+        return {
+            "size": list(self.size),
+            "start": self.start,
+            "end": self.end,
+            "bbox": self.bbox,
+            "stitch_bbox": self.stitch_bbox,
+            # Flattened, to two decimals: plenty for pixel coordinates
+            "contours": [
+                [round(value, 2) for point in contour for value in point]
+                for contour in self.contours
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, symbol, data):
+        return cls(
+            symbol,
+            tuple(data["size"]),
+            _point(data["start"]),
+            _point(data["end"]),
+            _point(data["bbox"]),
+            _point(data["stitch_bbox"]),
+            [list(zip(contour[0::2], contour[1::2])) for contour in data["contours"]],
+        )
+
+    def __repr__(self):
+        return f"GlyphOutline(symbol={self.symbol!r}, contours={len(self.contours)})"
+
+
+def _point(value):
+    return tuple(value) if value is not None else None
+
+
+class OutlineAtlas:
+    """
+    The outlines of every glyph in a glyph folder.
+
+    Read from the folder's outlines file if it is up to date, otherwise traced
+    from the glyph atlas on first access, one glyph at a time.
+    """
+
+    def __init__(self, glyph_folder=resources.files("glyphs"), use_file=True):
+        self.glyph_folder = glyph_folder
+        self._entries = (load_outlines(glyph_folder) if use_file else None) or {}
+        self._symbols = None
+        self._lock = threading.Lock()
+
+    def symbols(self):
+        if self._symbols is None:
+            self._symbols = glyph_pack.glyph_names(self.glyph_folder)
+        return self._symbols
+
+    def __contains__(self, symbol):
+        return symbol in self.symbols()
+
+    def __getitem__(self, symbol) -> GlyphOutline:
+        entry = self._entries.get(symbol)
+        if entry is None:
+            import glyph_atlas
+
+            source = glyph_atlas.get_atlas(self.glyph_folder)[symbol]
+            with self._lock:
+                entry = self._entries.get(symbol)
+                if entry is None:
+                    with instrumentation.timer("glyph_trace"):
+                        entry = GlyphOutline.from_entry(source)
+                    self._entries[symbol] = entry
+        return entry
+
+    def preload(self):
+        """Traces every glyph in the folder up front."""
+        for symbol in self.symbols():
+            self[symbol]
+        return self
+
+
+def outlines_path(glyph_folder):
+    return glyph_folder.joinpath(OUTLINES_FILENAME)
+
+
+def load_outlines(glyph_folder=resources.files("glyphs")):
+    """
+    Reads the outlines file of a glyph folder.
+
+    Returns:
+        dict or None: GlyphOutlines by glyph name, or None if the file is
+        missing, unreadable, of another version, or out of date with respect to
+        the PNGs.
+    """
+    try:
+        with open(outlines_path(glyph_folder), encoding="utf-8") as f:
+            data = json.load(f)
+        if data["version"] != OUTLINES_VERSION:
+            return None
+        stamp = glyph_pack.source_stamp(glyph_folder)
+        if (stamp is None or stamp != data["stamp"]) and glyph_pack.content_hash(
+            glyph_folder
+        ) != data["content_hash"]:
+            return None
+        return {
+            symbol: GlyphOutline.from_dict(symbol, entry)
+            for symbol, entry in data["glyphs"].items()
+        }
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def build_outlines(glyph_folder=resources.files("glyphs"), path=None):
+    """
+    Traces every glyph of a glyph folder and writes the outlines file.
+
+    Args:
+        glyph_folder (optional): The glyph folder.
+        path (optional): Where to write the file. Defaults to the glyph folder.
+
+    Returns:
+        The path the file was written to.
+    """
+    path = path or outlines_path(glyph_folder)
+    atlas = OutlineAtlas(glyph_folder, use_file=False)
+    data = {
+        "version": OUTLINES_VERSION,
+        "content_hash": glyph_pack.content_hash(glyph_folder),
+        "stamp": glyph_pack.source_stamp(glyph_folder),
+        "glyphs": {symbol: atlas[symbol].to_dict() for symbol in atlas.symbols()},
+    }
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return path
+
+
+_atlases = {}
+_atlases_lock = threading.Lock()
+
+
+def get_outlines(glyph_folder=resources.files("glyphs")) -> OutlineAtlas:
+    """
+    Returns the process-wide outline atlas for a glyph folder, creating it if
+    needed.
+    """
+    key = str(glyph_folder)
+    with _atlases_lock:
+        atlas = _atlases.get(key)
+        if atlas is None:
+            atlas = _atlases[key] = OutlineAtlas(glyph_folder)
+        return atlas
+
+
+def reload_outlines(glyph_folder=resources.files("glyphs")) -> OutlineAtlas:
+    """
+    Replaces the process-wide outline atlas for a glyph folder with a fresh one,
+    e.g. after the glyph atlas was reloaded (see `glyph_atlas.reload_atlas`).
+    """
+    atlas = OutlineAtlas(glyph_folder)
+    with _atlases_lock:
+        _atlases[str(glyph_folder)] = atlas
+    return atlas
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        folder = pathlib.Path(sys.argv[1])
+    else:
+        folder = resources.files("glyphs")
+    written = build_outlines(folder)
+    print(f"Wrote {written}")
@@ -0,0 +1,241 @@
+"""
+Compiled glyph pack: every glyph of a glyph folder preprocessed into one file.
+
+Decoding the PNGs and scanning them for alignment pixels dominates start-up,
+so `build_pack` stores the result of that work (alpha bitmaps, anchors,
+bounding boxes and the symbol table) in a single versioned binary file which
+`load_pack` memory-maps. The pack lives next to the PNGs it was built from and
+is ignored as soon as any of them changes, so dropping a new PNG into the
+folder keeps working without a rebuild.
+
+Layout: an 8-byte magic, a little-endian u32 version and u32 index length,
+a JSON index, then the raw RGBA bitmaps at the offsets listed in the index
+(relative to the end of the index).
+
+Build it with `python src/glyph_pack.py`.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+import sys
+from importlib import resources
+
+PACK_MAGIC = b"T2OGLYPH"
+PACK_VERSION = 1
+PACK_FILENAME = ".glyphpack"
+
+_HEADER = struct.Struct("<8sII")
+
+
+def glyph_sources(glyph_folder):
+    """
+    Lists the glyph PNGs in a glyph folder.
+
+    Returns:
+        list: (glyph name, resource) pairs, sorted by glyph name.
+    """
+    sources = []
+    for resource in glyph_folder.iterdir():
+        glyph_name, ext = os.path.splitext(os.path.basename(resource.name))
+        if ext == ".png":
+            sources.append((glyph_name, resource))
+    return sorted(sources, key=lambda source: source[0])
+
+
+def glyph_names(glyph_folder):
+    """
+    Returns:
+        list: The names of the glyph PNGs in a glyph folder, sorted.
+    """
+    return [glyph_name for glyph_name, _ in glyph_sources(glyph_folder)]
+
+
+def source_stamp(glyph_folder):
+    """
+    Cheap change detector for a glyph folder: name, size and mtime per PNG.
+
+    Returns None when the folder is not on a regular filesystem.
+    """
+    stamp = []
+    for glyph_name, resource in glyph_sources(glyph_folder):
+        try:
+            st = os.stat(resource)
+        except TypeError:
+            return None
+        stamp.append([glyph_name, st.st_size, st.st_mtime_ns])
+    return stamp
+
+
+def content_hash(glyph_folder):
+    """
+    Hashes the names and contents of every PNG in a glyph folder.
+
+    Returns:
+        str: A hex digest that changes whenever any glyph is added, removed or edited.
+    """
+    digest = hashlib.sha256()
+    for glyph_name, resource in glyph_sources(glyph_folder):
+        data = resource.read_bytes()
+        digest.update(f"{glyph_name}\0{len(data)}\0".encode())
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def pack_path(glyph_folder):
+    return glyph_folder.joinpath(PACK_FILENAME)
+
+
+class GlyphPack:
+    """
+    A memory-mapped glyph pack.
+
+    Bitmaps are exposed as read-only images backed directly by the mapping,
+    so opening a pack costs one small JSON parse regardless of glyph count.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, index_length = _HEADER.unpack_from(self._map, 0)
+        if magic != PACK_MAGIC:
+            raise ValueError(f"{path} is not a glyph pack")
+        if version != PACK_VERSION:
+            raise ValueError(
+                f"{path} has pack version {version}, expected {PACK_VERSION}"
+            )
+
+        index = json.loads(self._map[_HEADER.size : _HEADER.size + index_length])
+        self._data_offset = _HEADER.size + index_length
+        self.content_hash = index["content_hash"]
+        self.stamp = index["stamp"]
+        self.glyphs = index["glyphs"]
+
+    def symbols(self):
+        return list(self.glyphs)
+
+    def __contains__(self, symbol):
+        return symbol in self.glyphs
+
+    def read(self, symbol):
+        """
+        Reads a glyph from the pack.
+
+        Returns:
+            tuple: (image, start, end, bbox, alignment_pixels), where `image` is the
+            alpha-converted RGBA bitmap and `alignment_pixels` lists every green or
+            red pixel that has to be hidden when the glyph is stitched.
+        """
+        # Imported here so that listing glyphs (e.g. to encode) never loads PIL
+        from PIL import Image
+
+        info = self.glyphs[symbol]
+        width, height = info["size"]
+        offset = self._data_offset + info["offset"]
+        buffer = memoryview(self._map)[offset : offset + width * height * 4]
+        image = Image.frombuffer("RGBA", (width, height), buffer, "raw", "RGBA", 0, 1)
+        return (
+            image,
+            _point(info["start"]),
+            _point(info["end"]),
+            _point(info["bbox"]),
+            [tuple(p) for p in info["alignment_pixels"]],
+        )
+
+    def is_fresh(self, glyph_folder):
+        """
+        Checks whether the pack still matches the PNGs in `glyph_folder`.
+
+        Sizes and mtimes are compared first; the contents are only hashed when
+        those differ (e.g. after a fresh checkout), so an unchanged folder is
+        validated without reading a single PNG.
+        """
+        stamp = source_stamp(glyph_folder)
+        if stamp is not None and stamp == self.stamp:
+            return True
+        return content_hash(glyph_folder) == self.content_hash
+
+
+def _point(value):
+    return tuple(value) if value is not None else None
+
+
+def load_pack(glyph_folder=resources.files("glyphs")):
+    """
+    Opens the compiled pack of a glyph folder.
+
+    Returns:
+        GlyphPack or None: The pack, or None if it is missing, unreadable, built
+        by another pack version, or out of date with respect to the PNGs.
+    """
+    path = pack_path(glyph_folder)
+    try:
+        pack = GlyphPack(path)
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+    return pack if pack.is_fresh(glyph_folder) else None
+
+
+def build_pack(atlas, path=None):
+    """
+    Compiles every glyph of an atlas into a pack file.
+
+    Args:
+        atlas (GlyphAtlas): The atlas to compile; its glyphs are decoded from PNG.
+        path (optional): Where to write the pack. Defaults to the glyph folder.
+
+    Returns:
+        The path the pack was written to.
+    """
+    glyph_folder = atlas.glyph_folder
+    path = path or pack_path(glyph_folder)
+
+    glyphs = {}
+    bitmaps = []
+    offset = 0
+    for symbol in atlas.symbols():
+        entry = atlas[symbol]
+        image = entry.image
+        glyphs[symbol] = {
+            "size": image.size,
+            "offset": offset,
+            "start": entry.start,
+            "end": entry.end,
+            "bbox": entry.bbox,
+            "alignment_pixels": entry.alignment_pixels,
+        }
+        data = image.tobytes()
+        bitmaps.append(data)
+        offset += len(data)
+
+    index = {
+        "content_hash": content_hash(glyph_folder),
+        "stamp": source_stamp(glyph_folder),
+        "glyphs": glyphs,
+    }
+
+    encoded = json.dumps(index, separators=(",", ":")).encode()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(encoded)))
+        f.write(encoded)
+        for data in bitmaps:
+            f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    from glyph_atlas import GlyphAtlas
+
+    if len(sys.argv) > 1:
+        folder = pathlib.Path(sys.argv[1])
+    else:
+        folder = resources.files("glyphs")
+    written = build_pack(GlyphAtlas(folder, use_pack=False))
+    print(f"Wrote {written}")
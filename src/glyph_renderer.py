@@ -1,10 +1,20 @@
-from typing import List
+import time
+from typing import Iterator, List
 from PIL import Image
-from tqdm import tqdm
 from importlib import resources
 
+import coverage_mask
+import disk_cache
+import glyph_atlas
+import instrumentation
 from glyph import Glyph, SPECIAL_SYMBOLS
+import text_layout
 from orthic_encoder import OrthicEncoder
+from text_layout import PageLayout, TextLayout
+from word_cache import DEFAULT_MAX_BYTES, WordCache
+
+# Size of the (blank) image rendered for a word without any known glyph
+EMPTY_WORD_SIZE = (100 * 45 + 512, 1024)
 
 
 def sign(x: int):
@@ -12,8 +22,70 @@ def sign(x: int):
 
 
 class GlyphRenderer:
-    def __init__(self, glyph_folder=resources.files('glyphs')):
+    def __init__(
+        self,
+        glyph_folder=resources.files("glyphs"),
+        encoder=None,
+        atlas=None,
+        cache_bytes=DEFAULT_MAX_BYTES,
+        blend=None,
+        progress=instrumentation.tqdm_progress,
+        cache_dir=None,
+        disk_cache_bytes=disk_cache.DEFAULT_MAX_BYTES,
+        scale=1.0,
+    ):
+        """
+        Args:
+            glyph_folder (optional): Folder containing the glyph PNGs.
+            encoder (OrthicEncoder, optional): Encoder to share; created if omitted.
+            atlas (GlyphAtlas, optional): Glyph atlas to share (at scale 1); the
+                process-wide atlas of `glyph_folder` if omitted.
+            cache_bytes (int, optional): Byte budget of the rendered-word cache.
+                0 disables caching.
+            blend (str, optional): Composite words and pages as single-channel
+                coverage masks, blended with this mode (see
+                `coverage_mask.BLEND_MODES`), and only colour them in for output.
+                Defaults to None, which composites RGBA images.
+            progress (callable, optional): Progress factory used by `render_text`:
+                called with the number of words, it returns an object with
+                `update()` and `close()` methods, or None. Defaults to a tqdm
+                progress bar if tqdm is installed; None disables progress
+                reporting.
+            cache_dir (str, optional): Directory of a word cache on disk, shared
+                with other processes and runs (see `disk_cache`). Defaults to
+                None, which keeps rendered words in memory only.
+            disk_cache_bytes (int, optional): Byte budget of the cache on disk.
+            scale (float, optional): Render at this multiple of the size of the
+                glyph PNGs, with glyphs and anchors resampled once per scale
+                (see `GlyphAtlas.scaled`). Layout settings stay in unscaled
+                pixels: text is laid out at scale 1 and the layout is then
+                scaled (see `scale_page`), so line and page breaks are the same
+                at every scale. Defaults to 1.
+        """
         self.glyph_folder = glyph_folder
+        self.blend = coverage_mask.check_blend(blend) if blend is not None else None
+        self.progress = progress
+        self.scale = scale
+        self.word_cache = WordCache(cache_bytes) if cache_bytes > 0 else None
+        self.disk_cache = None
+        if cache_dir is not None:
+            self.disk_cache = disk_cache.DiskWordCache(
+                cache_dir, glyph_folder, self.blend, disk_cache_bytes, scale
+            )
+        if atlas is None:
+            atlas = glyph_atlas.get_atlas(glyph_folder)
+        if encoder is None:
+            encoder = OrthicEncoder(glyph_folder)
+        self.atlas = atlas.scaled(scale)
+        self.encoder = encoder
+        self.empty_word_size = tuple(round(side * scale) for side in EMPTY_WORD_SIZE)
+
+        # Measures words for layout; only needs its own glyphs at other scales
+        self.layout_renderer = self
+        if scale != 1:
+            self.layout_renderer = GlyphRenderer(
+                glyph_folder, encoder, atlas, cache_bytes=0, blend=blend, progress=None
+            )
 
     def render_text(
         self,
@@ -22,6 +94,7 @@ class GlyphRenderer:
         line_height=100,
         line_width=1300,
         lines_per_page=float("inf"),
+        workers=1,
     ):
         """
         Renders Orthic shorthand text as an image or a series of images (pages).
@@ -38,95 +111,489 @@ class GlyphRenderer:
             line_width (int, optional): The width of the canvas in pixels. Defaults to 1300.
             lines_per_page (int, optional): The maximum number of lines per page. Defaults to float("inf"),
                 which indicates no pagination.
+            workers (int, optional): Number of processes to render with (see `parallel_render`).
+                Defaults to 1, which renders in this process.
 
         Returns:
             list or Image: A list of PIL Image objects, each representing a page, if `lines_per_page` is finite.
             If `lines_per_page` is infinite, a single Image object is returned representing the entire text.
         """
-        words = text.split()
-        pages = []
-        current_line = 1
-        canvas = Image.new("RGBA", (line_width, line_height), (255, 255, 255, 0))
-        x, y = 0, line_height
-
-        for word in tqdm(words):
-            word_img = self.render_word(word, transparent_background=True)
-            if x + word_img.width > line_width:
-                x = 0
-                y += line_height
-                current_line += 1
-
-                # paginate
-                if current_line > lines_per_page:
-                    # render and save
-                    canvas = self.crop_to_content(canvas)
-                    canvas = self.paste_on_white_background(canvas)
-
-                    pages.append(canvas)
-
-                    # create a fresh page
-                    canvas = Image.new(
-                        "RGBA", (line_width, line_height), (255, 255, 255, 0)
-                    )
-                    x, y = 0, line_height
-                    current_line = 1
+        layout = self.layout_text(
+            text,
+            space_width=space_width,
+            line_height=line_height,
+            line_width=line_width,
+            lines_per_page=lines_per_page,
+        )
+        if workers > 1:
+            import parallel_render
+
+            pages = parallel_render.render_layout(
+                layout,
+                workers,
+                self.glyph_folder,
+                blend=self.blend,
+                progress=self.progress,
+                cache_dir=(
+                    self.disk_cache.directory if self.disk_cache is not None else None
+                ),
+                scale=self.scale,
+            )
+        else:
+            pages = self.render_layout(layout)
+
+        return pages if layout.paginated else pages[0]
+
+    def layout_text(
+        self,
+        text: str,
+        space_width=10,
+        line_height=100,
+        line_width=1300,
+        lines_per_page=float("inf"),
+    ) -> TextLayout:
+        """
+        Computes the geometry of `render_text` (line and page breaks and the
+        position of every word) without rendering anything.
 
-            if y + word_img.height > canvas.height:
-                canvas = self.expand_canvas(canvas, line_width, y + word_img.height)
+        Args:
+            text (str): The English text to lay out.
+            space_width, line_height, line_width, lines_per_page: See `render_text`.
 
-            canvas.alpha_composite(word_img, (x, y - word_img.height // 2))
-            x += word_img.width + space_width
+        Returns:
+            TextLayout: The layout of each page, at this renderer's scale.
+        """
+        base = self.layout_renderer
+        layout = text_layout.layout_text(
+            text.split(),
+            base.measure_word,
+            space_width=space_width,
+            line_height=line_height,
+            line_width=line_width,
+            lines_per_page=lines_per_page,
+            visible_ink=base.visible_ink,
+        )
+        if base is not self:
+            layout = TextLayout(
+                [self.scale_page(page) for page in layout.pages], layout.paginated
+            )
+        return layout
 
-        canvas = self.crop_to_content(canvas)
-        canvas = self.paste_on_white_background(canvas)
+    def iter_pages(
+        self,
+        source,
+        space_width=10,
+        line_height=100,
+        line_width=1300,
+        lines_per_page=float("inf"),
+    ) -> Iterator[Image.Image]:
+        """
+        Renders text page by page, yielding each page as soon as it is full.
 
-        pages.append(canvas)
+        Unlike `render_text`, the text does not need to be in memory at once and
+        pages are produced while the rest of the text is still being read, so
+        memory use does not grow with the length of the text.
 
-        return pages if lines_per_page != float("inf") else pages[0]
+        Args:
+            source (str or iterable): The English text, or an iterable of text
+                chunks such as an open file.
+            space_width, line_height, line_width, lines_per_page: See `render_text`.
+
+        Yields:
+            Image: The pages, in order, as `render_text` would return them.
+        """
+        page_layouts = self.iter_page_layouts(
+            source,
+            space_width=space_width,
+            line_height=line_height,
+            line_width=line_width,
+            lines_per_page=lines_per_page,
+        )
+        for page in page_layouts:
+            yield self.render_page(page)
+
+    def iter_page_layouts(
+        self,
+        source,
+        space_width=10,
+        line_height=100,
+        line_width=1300,
+        lines_per_page=float("inf"),
+    ) -> Iterator[PageLayout]:
+        """
+        Lays out text page by page, like `iter_pages` but without rendering.
+
+        Args:
+            source (str or iterable): The English text, or an iterable of text
+                chunks such as an open file.
+            space_width, line_height, line_width, lines_per_page: See `render_text`.
+
+        Yields:
+            PageLayout: The layout of each page, in order, at this renderer's
+            scale.
+        """
+        base = self.layout_renderer
+        page_layouts = text_layout.iter_page_layouts(
+            text_layout.iter_words(source),
+            base.measure_word,
+            space_width=space_width,
+            line_height=line_height,
+            line_width=line_width,
+            lines_per_page=lines_per_page,
+            visible_ink=base.visible_ink,
+        )
+        if base is not self:
+            page_layouts = map(self.scale_page, page_layouts)
+        return page_layouts
+
+    def scale_page(self, page: PageLayout) -> PageLayout:
+        """
+        Maps a page laid out at scale 1 (e.g. by `layout_renderer`) to this
+        renderer's scale, so that one layout can be drawn by renderers of
+        several scales.
+
+        Returns:
+            PageLayout: The page, with the positions of its words scaled and their
+            sizes measured at this scale.
+        """
+        if self.scale == 1:
+            return page
+        return text_layout.scale_page(page, self.scale, self.measure_word)
+
+    def render_layout(self, layout: TextLayout) -> List[Image.Image]:
+        """
+        Renders each page of a layout.
+
+        Returns:
+            list: One image per page.
+        """
+        progress = None
+        if self.progress is not None:
+            progress = self.progress(sum(len(page.words) for page in layout.pages))
+        pages = [self.render_page(page, progress) for page in layout.pages]
+        if progress is not None:
+            progress.close()
+        return pages
+
+    def render_page(self, page: PageLayout, progress=None):
+        """
+        Renders one laid-out page onto a canvas of its final size.
+
+        Args:
+            page (PageLayout): The page to render.
+            progress (optional): Progress reporter to advance by one per word.
+
+        Returns:
+            Image: The page on a white background.
+        """
+        return self.compose_page(
+            page, lambda word: self.compose_word(word)[1], progress
+        )
+
+    def compose_page(self, page: PageLayout, word_image, progress=None):
+        """
+        Composites a laid-out page from word images obtained from `word_image`.
+
+        Args:
+            page (PageLayout): The page to render.
+            word_image (callable): Maps a word to its transparent-background image
+                (its coverage mask if the renderer blends masks).
+            progress (optional): Progress reporter to advance by one per word.
+
+        Returns:
+            Image: The page on a white background.
+        """
+        with instrumentation.timer("page_assembly"):
+            page_image = self._compose_page(page, word_image, progress)
+        instrumentation.count("pages_assembled")
+        return page_image
+
+    def _compose_page(self, page: PageLayout, word_image, progress):
+        left, top = page.crop[0], page.crop[1]
+        if self.blend is not None:
+            mask = Image.new("L", page.size, 0)
+            for box in page.words:
+                coverage_mask.composite(
+                    mask, word_image(box.word), (box.x - left, box.y - top), self.blend
+                )
+                if progress is not None:
+                    progress.update()
+
+            return coverage_mask.colorize(mask)
+
+        canvas = Image.new("RGBA", page.size, (255, 255, 255, 0))
+        for box in page.words:
+            canvas.alpha_composite(word_image(box.word), (box.x - left, box.y - top))
+            if progress is not None:
+                progress.update()
+
+        return self.paste_on_white_background(canvas)
 
     def render_word(self, word: str, transparent_background: bool = False):
-        encoder = OrthicEncoder()
-        glyphs = encoder.encode_word(word)
+        _, canvas = self.compose_word(word)
+
+        if self.blend is not None:
+            if transparent_background:
+                return coverage_mask.to_transparent(canvas)
+            return coverage_mask.colorize(canvas)
+
+        if transparent_background:
+            # the composed image may be shared through the word cache
+            return canvas.copy()
+
+        return self.paste_on_white_background(canvas)
+
+    def compose_word(self, word: str):
+        """
+        Encodes and renders a single word on a transparent background (or as a
+        coverage mask if the renderer blends masks).
+
+        Results are served from (and stored in) the word cache and the cache on
+        disk if the renderer has them. The returned image may be shared with the
+        cache and must not be modified; use `render_word` to get an image of your
+        own.
+
+        Args:
+            word (str): The word to render.
+
+        Returns:
+            tuple: (glyphs, image), the encoded glyphs and the rendered word.
+        """
+        if self.word_cache is not None:
+            entry = self.word_cache.get(word)
+            if entry is not None:
+                return entry
+
+        if self.disk_cache is not None:
+            entry = self.disk_cache.get(word)
+            if entry is not None:
+                if self.word_cache is not None:
+                    self.word_cache.put(word, *entry)
+                return entry
+
+        start = time.perf_counter()
+        with instrumentation.timer("compose_word"):
+            glyphs, canvas = self._compose_word(word)
+        instrumentation.count("words_composed")
+
+        if self.word_cache is not None:
+            self.word_cache.put(word, glyphs, canvas)
+        if self.disk_cache is not None:
+            self.disk_cache.put(word, glyphs, canvas, time.perf_counter() - start)
+
+        return glyphs, canvas
+
+    def _compose_word(self, word: str):
+        glyphs = self.encode_word(word)
+        chain, (left, top), canvas_size, _, indicator = self.word_geometry(glyphs)
+        placements = self._placements(chain)
+
+        if self.blend is not None:
+            canvas = Image.new("L", canvas_size, 0)
+            for img, _, (x, y) in placements:
+                coverage_mask.composite(canvas, img, (x - left, y - top), self.blend)
+
+            if indicator is not None:
+                mark, position = indicator
+                coverage_mask.composite(canvas, self._image(mark), position, self.blend)
+        else:
+            canvas = Image.new("RGBA", canvas_size, (255, 255, 255, 0))
+            for img, _, (x, y) in placements:
+                canvas.alpha_composite(img, (x - left, y - top))
+
+            if indicator is not None:
+                mark, position = indicator
+                canvas.alpha_composite(self._image(mark), position)
+
+        return glyphs, canvas
+
+    def encode_word(self, word: str):
+        """
+        Encodes a word for rendering, reporting any characters without a glyph.
+
+        Only words that are composed are encoded here, so the unknown_glyphs
+        counter and event (see `instrumentation`) cover cache misses only.
+
+        Returns:
+            list: The encoded glyphs.
+        """
+        unknown = [] if instrumentation.enabled() else None
+        with instrumentation.timer("encode"):
+            glyphs = self.encoder.encode_word(word, unknown)
 
         n_unknown_glyphs = sum(glyph.symbol == "Unknown" for glyph in glyphs)
         if n_unknown_glyphs > 0:
-            tqdm.write(
-                f"Encountered {n_unknown_glyphs} unknown glyphs when rendering the word '{word}'"
+            for char in unknown or ():
+                instrumentation.count("unknown_glyphs", symbol=char)
+            instrumentation.warn(
+                f"Encountered {n_unknown_glyphs} unknown glyphs when rendering the word '{word}'",
+                "unknown_glyphs",
+                word=word,
+                count=n_unknown_glyphs,
             )
+        return glyphs
+
+    def measure_word(self, word: str):
+        """
+        Computes the size of a rendered word without rendering it.
+
+        Args:
+            word (str): The word to measure.
+
+        Returns:
+            tuple: (width, height, ink), the size of the word image and the bounding
+            box of its visible pixels (None if it has none).
+        """
+        with instrumentation.timer("encode"):
+            glyphs = self.encoder.encode_word(word)
+        _, _, (width, height), ink, _ = self.word_geometry(glyphs)
+        return width, height, ink
+
+    def visible_ink(self, word: str, box):
+        """
+        Finds the bounding box of a word's visible pixels within `box` (in word
+        image coordinates). Unlike `measure_word`, this renders the word.
+        """
+        _, word_img = self.compose_word(word)
+        with instrumentation.timer("crop"):
+            bbox = word_img.crop(box).getbbox()
+        if bbox is None:
+            return None
+        return (box[0] + bbox[0], box[1] + bbox[1], box[0] + bbox[2], box[1] + bbox[3])
+
+    def word_geometry(self, glyphs, atlas=None):
+        """
+        Computes the geometry of a word from its glyphs.
+
+        Args:
+            glyphs (list): The encoded glyphs of the word.
+            atlas (optional): Where to look the glyphs up, see `chain_glyphs`.
+
+        Returns:
+            tuple: (chain, origin, size, ink, indicator). `chain` is as returned
+            by `chain_glyphs`; `origin` is the point of the glyph chain that
+            becomes the word image's top-left corner; `size` is the size of the
+            word image; `ink` is the bounding box of its visible pixels (None if it
+            has none); `indicator` is the capital mark's entry and where it goes
+            in the word image, or None.
+        """
+        atlas = self.atlas if atlas is None else atlas
+        chain = self.chain_glyphs(glyphs, atlas)
+
+        # The word is exactly as large as the union of what was drawn
+        boxes = []
+        for entry, stitched, (x, y) in chain:
+            bbox = entry.stitch_bbox if stitched else entry.bbox
+            if bbox:
+                boxes.append((x + bbox[0], y + bbox[1], x + bbox[2], y + bbox[3]))
+        if boxes:
+            left = min(box[0] for box in boxes)
+            top = min(box[1] for box in boxes)
+            width = max(box[2] for box in boxes) - left
+            height = max(box[3] for box in boxes) - top
+            ink = (0, 0, width, height)
+        else:
+            # Nothing to draw; keep the size the old scratch canvas had so that
+            # text layout is unchanged
+            left, top = 0, 0
+            width, height = self.empty_word_size
+            ink = None
+
+        # Check if there is any capital letter in the word,
+        # if so, add an indicator below the word
+        indicator = None
+        if any(glyph.capital for glyph in glyphs):
+            mark = atlas["capital_mark"]
+            indicator = (mark, (0, height))
+            if mark.bbox:
+                ink = text_layout.union_boxes(
+                    ink,
+                    (
+                        mark.bbox[0],
+                        height + mark.bbox[1],
+                        mark.bbox[2],
+                        height + mark.bbox[3],
+                    ),
+                )
+            width = max(width, mark.size[0])
+            height += mark.size[1]
+
+        return chain, (left, top), (width, height), ink, indicator
 
-        # Start with an empty (big) canvas
-        #   This is a bit wasteful; we should dynamically resize the canvas,
-        #   but that turned out to be a bit messy to get correct (since we also
-        #   need to pad incase, say, multiple p:s leave the canvas on the left).
-        canvas = Image.new("RGBA", (100 * 45 + 512, 1024), (255, 255, 255, 0))
-        last_position = (512, 512)  # Starting position
+    def layout_word(self, glyphs):
+        """
+        Computes where each glyph image of a word goes, without drawing anything.
+
+        Args:
+            glyphs (list): The encoded glyphs of the word.
+
+        Returns:
+            list: (image, bbox, position) per image to draw, in drawing order;
+            the images are coverage masks if the renderer blends masks.
+            `position` is where the image's top-left corner goes and `bbox` is the
+            bounding box of its visible pixels (None if it has none).
+        """
+        return self._placements(self.chain_glyphs(glyphs))
+
+    def chain_glyphs(self, glyphs, atlas=None):
+        """
+        Chains the glyphs of a word by their anchors.
+
+        Each glyph's green start pixel is placed on the previous glyph's red end
+        pixel, starting at (0, 0), and a doubled letter gets a dot below it.
+        Only the glyphs' anchors and sizes are used, so the chain works the same
+        for any representation of the glyphs.
+
+        Args:
+            glyphs (list): The encoded glyphs of the word.
+            atlas (optional): Maps glyph names to entries with `start`, `end`,
+                `size`, `bbox` and `stitch_bbox`, e.g. a GlyphAtlas or an
+                OutlineAtlas (see `glyph_outlines`). Defaults to the renderer's
+                atlas.
+
+        Returns:
+            list: (entry, stitched, position) per glyph or dot to draw, in
+            drawing order. `stitched` is False for the doubled-letter dots, which
+            are drawn unstitched, and `position` is where the entry's top-left
+            corner goes.
+        """
+        atlas = self.atlas if atlas is None else atlas
+        chain = []
+        last_position = (0, 0)  # Starting position
 
         for glyph in glyphs:
             if glyph.symbol != "Unknown":
-                img = self.load_glyph_image(glyph.symbol)
-                start_pos, end_pos = self.find_glyph_start_end_positions(img)
-
-                # Hide alignment pixels
-                if glyph.symbol in SPECIAL_SYMBOLS:
-                    # if non-connected symbol (e.g., a number or a semicolon) put transparent pixel
-                    img = self.replace_alignment_pixels(img, (0, 0, 0, 0))
-                else:
-                    # otherwise use black
-                    img = self.replace_alignment_pixels(img)
+                entry = atlas[glyph.symbol]
+                start_pos, end_pos = entry.start, entry.end
 
                 if not start_pos:
-                    tqdm.write(
-                        f"Could not find start position (green pixel) in {glyph.symbol}"
+                    instrumentation.warn(
+                        f"Could not find start position (green pixel) in {glyph.symbol}",
+                        "anchor_missing",
+                        symbol=glyph.symbol,
+                        anchor="start",
                     )
                     continue
 
                 if not end_pos:
-                    tqdm.write(
-                        f"Could not find end position (red pixel) in {glyph.symbol}"
+                    instrumentation.warn(
+                        f"Could not find end position (red pixel) in {glyph.symbol}",
+                        "anchor_missing",
+                        symbol=glyph.symbol,
+                        anchor="end",
                     )
                     continue
 
-                canvas = self.place_glyph(canvas, img, last_position, start_pos)
+                chain.append(
+                    (
+                        entry,
+                        True,
+                        (
+                            last_position[0] - start_pos[0],
+                            last_position[1] - start_pos[1],
+                        ),
+                    )
+                )
                 last_position = (
                     last_position[0] + end_pos[0] - start_pos[0],
                     last_position[1] + end_pos[1] - start_pos[1],
@@ -134,72 +601,55 @@ class GlyphRenderer:
 
                 if glyph.double:
                     # Indicate a double-letter with a dot below
-                    dot_img = self.load_glyph_image("doubled_dot")
+                    width, height = entry.size
                     dot_pos = (
                         last_position[0]
-                        - (img.width // 2) * sign(end_pos[0] - start_pos[0]),
-                        last_position[1] - end_pos[1] + start_pos[1] + img.height,
+                        - (width // 2) * sign(end_pos[0] - start_pos[0]),
+                        last_position[1] - end_pos[1] + start_pos[1] + height,
                     )
 
-                    canvas = self.place_glyph(canvas, dot_img, dot_pos, (0, 0))
+                    chain.append((atlas["doubled_dot"], False, dot_pos))
 
-        canvas = self.crop_to_content(canvas)
+        return chain
 
-        # Check if there is any capital letter in the word,
-        # if so, add an indicator below the word
-        if any(glyph.capital for glyph in glyphs):
-            indicator_img = self.load_glyph_image("capital_mark")
-            old_height = canvas.height
-            canvas = self.expand_canvas(
-                canvas,
-                max(canvas.width, indicator_img.width),
-                canvas.height + indicator_img.height,
-            )
-            canvas.alpha_composite(indicator_img, (0, old_height))
+    def _placements(self, chain):
+        # The image to draw for each link of a glyph chain
+        placements = []
+        for entry, stitched, position in chain:
+            if not stitched:
+                placements.append((self._image(entry), entry.bbox, position))
+            elif self.blend is not None:
+                placements.append((entry.stitch_mask, entry.stitch_bbox, position))
+            else:
+                placements.append((entry.stitch_image, entry.stitch_bbox, position))
+        return placements
 
-        if not transparent_background:
-            canvas = self.paste_on_white_background(canvas)
-
-        return canvas
+    def _image(self, entry):
+        # The image to draw for an unstitched glyph (doubled dot, capital mark)
+        return entry.mask if self.blend is not None else entry.image
 
-    def load_glyph_image(self, symbol):
-        # Load the glyph image
-        path = self.glyph_folder.joinpath(f"{symbol}.png")
-        img = Image.open(path)
+    def warm_cache(self, words):
+        """
+        Renders words into the word cache ahead of time, e.g. the most frequent
+        words of a language.
 
-        # Parse transparency
-        img = self.convert_grayscale_to_alpha(img)
+        Args:
+            words (iterable): The words to render, most important first.
+        """
+        if self.word_cache is None:
+            return
+        for word in words:
+            self.compose_word(word)
 
-        return img
+    def load_glyph_image(self, symbol):
+        # Served from the atlas; copy so callers may draw on the result
+        return self.atlas[symbol].image.copy()
 
     def convert_grayscale_to_alpha(self, img):
-        img = img.convert("RGBA")
-
-        for y in range(img.height):
-            for x in range(img.width):
-                r, g, b, _ = img.getpixel((x, y))
-
-                # Skip red and green pixels
-                if (r, g, b) == (255, 0, 0) or (r, g, b) == (0, 255, 0):
-                    continue
-
-                # Convert grayscale to alpha
-                grayscale = int(0.299 * r + 0.587 * g + 0.114 * b)
-                alpha = 255 - grayscale
-                img.putpixel((x, y), (0, 0, 0, alpha))
-
-        return img
+        return glyph_atlas.convert_grayscale_to_alpha(img)
 
     def find_glyph_start_end_positions(self, img):
-        start_position = end_position = None
-        for y in range(img.height):
-            for x in range(img.width):
-                pixel = img.getpixel((x, y))
-                if pixel == (0, 255, 0, 255):  # Green pixel
-                    start_position = (x, y)
-                elif pixel == (255, 0, 0, 255):  # Red pixel
-                    end_position = (x, y)
-        return start_position, end_position
+        return glyph_atlas.find_glyph_start_end_positions(img)
 
     def place_glyph(self, canvas, glyph_img, last_position, start_position):
         # Calculate the offset for placement
@@ -216,17 +666,7 @@ class GlyphRenderer:
         return new_canvas
 
     def replace_alignment_pixels(self, canvas, color=(0, 0, 0)):
-        for y in range(canvas.height):
-            for x in range(canvas.width):
-                pixel = canvas.getpixel((x, y))
-                if pixel[0:3] == (0, 255, 0) or pixel[0:3] == (
-                    255,
-                    0,
-                    0,
-                ):  # Green or Red
-                    canvas.putpixel((x, y), color)
-
-        return canvas
+        return glyph_atlas.replace_alignment_pixels(canvas, color)
 
     def crop_to_content(self, canvas):
         bbox = canvas.getbbox()
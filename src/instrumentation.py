@@ -0,0 +1,353 @@
+"""
+Opt-in timers, counters and structured events for the render pipeline.
+
+Instrumentation is off by default, and then every hook is a single check of
+a module global. `enable` turns it on for the whole process, and the hooks in
+the pipeline start recording:
+
+    timers    encode, encode_many, glyph_load, glyph_scale, glyph_trace,
+              compose_word, crop, page_assembly, export
+              (count, total and maximum seconds; nested stages are inclusive,
+              e.g. page_assembly includes the compose_word of its words)
+    counters  unknown_glyphs{symbol=...} per character without a glyph,
+              words_composed, pages_assembled, pages_exported
+    events    unknown_glyphs and anchor_missing, with the word or glyph
+              involved (replacing the printed warnings while enabled)
+
+unknown_glyphs is counted, and its event sent, when a word is composed, not per
+occurrence of the word in the text: words served from the word cache or the
+cache on disk, and words that are only measured for layout, are not counted
+again. Like words_composed, it therefore counts cache misses, and a run with a
+warm cache reports fewer.
+
+Events are passed to a sink as they happen, and `flush` hands the sink a
+snapshot of the timers and counters. Sinks are `MemorySink`, `JsonLinesSink`
+and `PrometheusSink`, or any object with `event(record)` and
+`flush(snapshot)` methods.
+
+    sink = instrumentation.enable(instrumentation.MemorySink())
+    engine.render_text(text)
+    instrumentation.flush()
+    sink.snapshot["timers"]["compose_word"]
+
+Only the calling process is instrumented; the worker processes of
+`parallel_render` and `batch_render` are not.
+
+Progress bars are a separate, optional concern: `tqdm_progress` reports
+progress with tqdm if it is installed, and renderers accept any other
+progress factory, or None for no progress reporting.
+"""
+
+import json
+import os
+import threading
+import time
+
+PROMETHEUS_PREFIX = "text2orthic"
+
+_active = None
+
+
+class MemorySink:
+    """
+    Keeps events and the last snapshot in memory.
+
+    Attributes:
+        events (list): Every event record, in order.
+        snapshot (dict or None): The last flushed snapshot.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.snapshot = None
+
+    def event(self, record):
+        self.events.append(record)
+
+    def flush(self, snapshot):
+        self.snapshot = snapshot
+
+
+class _FileSink:
+    def __init__(self, file):
+        """
+        Args:
+            file (str or file): A path to write to, or a text file object (which
+                is left open).
+        """
+        if isinstance(file, (str, os.PathLike)):
+            self.file = open(file, "w", encoding="utf-8")
+            self.owns_file = True
+        else:
+            self.file = file
+            self.owns_file = False
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+
+
+class JsonLinesSink(_FileSink):
+    """
+    Writes each event, and each flushed snapshot, as a line of JSON.
+
+    Event lines have `"type": "event"` and snapshot lines `"type": "metrics"`.
+    """
+
+    def event(self, record):
+        self.file.write(json.dumps({"type": "event", **record}) + "\n")
+
+    def flush(self, snapshot):
+        self.file.write(json.dumps({"type": "metrics", **snapshot}) + "\n")
+        self.file.flush()
+
+
+class PrometheusSink(_FileSink):
+    """
+    Writes flushed snapshots in the Prometheus text exposition format.
+
+    Events are not written one by one; they are counted in the
+    `text2orthic_events_total` metric.
+    """
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.event_counts = {}
+
+    def event(self, record):
+        name = record["event"]
+        self.event_counts[name] = self.event_counts.get(name, 0) + 1
+
+    def flush(self, snapshot):
+        prefix = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent per pipeline stage.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage, timer in sorted(snapshot["timers"].items()):
+            labels = _labels({"stage": stage})
+            lines.append(f"{prefix}_stage_seconds_sum{labels} {timer['seconds']}")
+            lines.append(f"{prefix}_stage_seconds_count{labels} {timer['count']}")
+
+        counters = {}
+        for counter in snapshot["counters"]:
+            counters.setdefault(counter["name"], []).append(counter)
+        for name, samples in sorted(counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            for sample in samples:
+                labels = _labels(sample["labels"])
+                lines.append(f"{prefix}_{name}_total{labels} {sample['value']}")
+
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for name, value in sorted(self.event_counts.items()):
+            lines.append(f"{prefix}_events_total{_labels({'event': name})} {value}")
+
+        if self.file.seekable():
+            # Each dump replaces the previous one
+            self.file.seek(0)
+            self.file.truncate()
+        self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for key, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+def sink_for_path(path):
+    """
+    Returns:
+        A PrometheusSink for paths ending in ".prom", otherwise a JsonLinesSink.
+    """
+    if str(path).endswith(".prom"):
+        return PrometheusSink(path)
+    return JsonLinesSink(path)
+
+
+class Instrumentation:
+    """
+    Collects timers and counters and passes events to a sink. Thread-safe.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink if sink is not None else MemorySink()
+        self.timers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            timer = self.timers.get(stage)
+            if timer is None:
+                self.timers[stage] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                timer[2] = max(timer[2], seconds)
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def event(self, name, **fields):
+        record = {"event": name, "time": time.time(), **fields}
+        with self._lock:
+            self.sink.event(record)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: "timers" (stage -> count, seconds, max_seconds) and "counters"
+            (a list of name, labels and value).
+        """
+        with self._lock:
+            return {
+                "timers": {
+                    stage: {"count": count, "seconds": total, "max_seconds": longest}
+                    for stage, (count, total, longest) in self.timers.items()
+                },
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+            }
+
+    def flush(self):
+        snapshot = self.snapshot()
+        with self._lock:
+            self.sink.flush(snapshot)
+        return snapshot
+
+
+class _Timer:
+    __slots__ = ("recorder", "stage", "start")
+
+    def __init__(self, recorder, stage):
+        self.recorder = recorder
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.recorder.observe(self.stage, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable(sink=None):
+    """
+    Turns instrumentation on for this process, replacing any previous recorder.
+
+    Args:
+        sink (optional): Where events and snapshots go. Defaults to a MemorySink.
+
+    Returns:
+        The sink.
+    """
+    global _active
+    _active = Instrumentation(sink)
+    return _active.sink
+
+
+def disable():
+    """
+    Flushes and turns instrumentation off.
+
+    Returns:
+        dict or None: The final snapshot, or None if instrumentation was off.
+    """
+    global _active
+    recorder, _active = _active, None
+    if recorder is None:
+        return None
+    snapshot = recorder.flush()
+    if hasattr(recorder.sink, "close"):
+        recorder.sink.close()
+    return snapshot
+
+
+def enabled():
+    return _active is not None
+
+
+def timer(stage):
+    """A context manager that times a pipeline stage."""
+    if _active is None:
+        return _NULL_TIMER
+    return _Timer(_active, stage)
+
+
+def count(name, value=1, **labels):
+    if _active is not None:
+        _active.count(name, value, **labels)
+
+
+def event(name, **fields):
+    if _active is not None:
+        _active.event(name, **fields)
+
+
+def flush():
+    """
+    Hands a snapshot of the timers and counters to the sink.
+
+    Returns:
+        dict or None: The snapshot, or None if instrumentation is off.
+    """
+    if _active is None:
+        return None
+    return _active.flush()
+
+
+def warn(message, name, **fields):
+    """
+    Reports a problem: as a structured event while instrumentation is on,
+    otherwise as a printed message.
+    """
+    if _active is not None:
+        _active.event(name, message=message, **fields)
+        return
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        print(message)
+    else:
+        # Keeps progress bars intact
+        tqdm.write(message)
+
+
+def tqdm_progress(total):
+    """
+    Progress factory that shows a tqdm progress bar, if tqdm is installed.
+
+    Returns:
+        tqdm or None: An object with `update()` and `close()` methods, or None.
+    """
+    try:
+        from tqdm import tqdm
+    except ImportError:
+        return None
+    return tqdm(total=total)
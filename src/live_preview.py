@@ -0,0 +1,435 @@
+"""
+Background, incremental rendering for interactive previews.
+
+`IncrementalRenderer` re-renders a text after an edit by redrawing only the
+lines that changed: words are compared by position with the previous render,
+the horizontal bands covered by words that moved, appeared or disappeared are
+composed again, and the rest of each page is kept. Unchanged words come out of
+the renderer's word cache and word sizes are remembered between renders, so
+laying out the whole text again after each keystroke stays cheap. The result
+is the image `OrthicEngine.render_text` would return.
+
+`PreviewWorker` runs an IncrementalRenderer on a background thread. Submitting
+a new text cancels the render in progress (the next one starts from the last
+completed render), and progress and results are posted through a callback,
+e.g. PySimpleGUI's thread-safe `window.write_event_value`:
+
+    worker = PreviewWorker(engine, window.write_event_value)
+    worker.submit(text)
+
+`PdfExportWorker` likewise writes PDF exports on a background thread and posts
+when each is done, so that exporting a long text does not freeze the window.
+"""
+
+import io
+import math
+import queue
+import threading
+
+from PIL import Image
+
+import pdf_export
+import text_layout
+from text_layout import PageLayout
+
+PROGRESS_EVENT = "-PREVIEW-PROGRESS-"
+DONE_EVENT = "-PREVIEW-DONE-"
+ERROR_EVENT = "-PREVIEW-ERROR-"
+
+EXPORT_DONE_EVENT = "-EXPORT-DONE-"
+EXPORT_ERROR_EVENT = "-EXPORT-ERROR-"
+
+
+class Cancelled(Exception):
+    """Raised inside a render that was superseded by a newer one."""
+
+
+def png_bytes(image, max_size=None):
+    """
+    Encodes an image as PNG in memory, e.g. for `sg.Image(data=...)`.
+
+    Args:
+        image (Image): The image.
+        max_size (tuple, optional): Shrink the image to fit (width, height)
+            first, keeping its aspect ratio.
+
+    Returns:
+        bytes: The PNG file.
+    """
+    if max_size is not None:
+        image = image.copy()
+        image.thumbnail(max_size)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class _PageState:
+    __slots__ = ("words", "canvas")
+
+    def __init__(self, words, canvas):
+        # (word, x, y, width, height) of every word on the page
+        self.words = words
+        # The page canvas, line width x canvas height, on white
+        self.canvas = canvas
+
+
+class _Progress:
+    # Counts composed words and stops the render once it is cancelled
+    __slots__ = ("cancelled", "report", "done", "total")
+
+    def __init__(self, cancelled, report, total):
+        self.cancelled = cancelled
+        self.report = report
+        self.done = 0
+        self.total = total
+
+    def check(self):
+        if self.cancelled is not None and self.cancelled():
+            raise Cancelled
+
+    def update(self, n=1):
+        self.check()
+        self.done += n
+        if self.report is not None:
+            self.report(self.done, self.total)
+
+
+class IncrementalRenderer:
+    """
+    Renders successive versions of a text, reusing what did not change.
+
+    Not thread-safe; use one instance per thread.
+    """
+
+    def __init__(self, engine, max_sizes=65536):
+        """
+        Args:
+            engine (OrthicEngine): Provides the renderer and render settings.
+            max_sizes (int, optional): Number of word sizes to remember.
+        """
+        self.engine = engine
+        self.max_sizes = max_sizes
+        self._renderer = None
+        self._settings = None
+        self._sizes = {}
+        self._pages = []
+
+    def reset(self):
+        """Forgets the previous render, so that the next one starts afresh."""
+        self._sizes = {}
+        self._pages = []
+
+    def render(self, text, cancelled=None, report=None, **settings):
+        """
+        Renders a text, redrawing only what changed since the previous call.
+
+        Args:
+            text (str): The English text to render.
+            cancelled (callable, optional): Polled while rendering; once it
+                returns True the render stops with `Cancelled`, and the next
+                call starts from the previous completed render.
+            report (callable, optional): Called with (words composed, words to
+                compose) after each word.
+            **settings: Overrides for the engine's render settings.
+
+        Returns:
+            list or Image: As `OrthicEngine.render_text` returns it.
+        """
+        renderer = self.engine.renderer
+        settings = self.engine.render_settings(**settings)
+        if renderer is not self._renderer or settings != self._settings:
+            # The engine was reloaded with new glyphs, or the layout changed
+            self.reset()
+            self._renderer = renderer
+            self._settings = settings
+
+        progress = _Progress(cancelled, report, 0)
+        layout = text_layout.layout_text(
+            text.split(),
+            lambda word: self._measure(word, progress),
+            visible_ink=renderer.layout_renderer.visible_ink,
+            **settings,
+        )
+        page_layouts = [renderer.scale_page(page) for page in layout.pages]
+        line_width = math.ceil(settings["line_width"] * renderer.scale)
+
+        plans = []
+        for i, page in enumerate(page_layouts):
+            previous = self._pages[i] if i < len(self._pages) else None
+            plans.append(self._plan(page, previous, line_width))
+        progress.total = sum(len(words) for _, _, bands in plans for _, words in bands)
+
+        def word_image(word):
+            return renderer.compose_word(word)[1]
+
+        pages = []
+        states = []
+        for page, (previous, size, bands) in zip(page_layouts, plans):
+            # Compose every changed band before touching any canvas, so that a
+            # cancelled render leaves the previous one intact
+            updates = [
+                (
+                    band,
+                    renderer.compose_page(
+                        PageLayout(words, band), word_image, progress
+                    ),
+                )
+                for band, words in bands
+            ]
+            canvas = Image.new("RGBA", size, "white")
+            if previous is not None:
+                canvas.paste(previous.canvas, (0, 0))
+            for band, image in updates:
+                canvas.paste(image, band[:2])
+
+            words = [
+                (box.word, box.x, box.y, box.width, box.height) for box in page.words
+            ]
+            states.append(_PageState(words, canvas))
+            pages.append(canvas.crop(page.crop))
+
+        self._pages = states
+        return pages if layout.paginated else pages[0]
+
+    def _measure(self, word, progress):
+        size = self._sizes.get(word)
+        if size is None:
+            progress.check()
+            if len(self._sizes) >= self.max_sizes:
+                self._sizes.clear()
+            size = self._sizes[word] = self._renderer.layout_renderer.measure_word(word)
+        return size
+
+    def _plan(self, page, previous, line_width):
+        """
+        Works out which bands of a page must be composed again.
+
+        Returns:
+            tuple: (previous, size, bands). `previous` is the _PageState to start
+            from (None to start from a blank canvas), `size` is the size of the
+            page canvas and `bands` lists (band, words): each band is the box of
+            a run of changed lines, with the WordBoxes that reach into it.
+        """
+        words = {(box.word, box.x, box.y, box.width, box.height) for box in page.words}
+        # The canvas is tall enough for every word and the crop
+        height = max([page.crop[3]] + [box.y + box.height for box in page.words])
+        size = (line_width, max(height, 1))
+
+        if previous is None:
+            changed = words
+        else:
+            changed = words.symmetric_difference(previous.words)
+
+        spans = sorted(
+            (max(y, 0), min(y + h, size[1])) for _, _, y, _, h in changed if h > 0
+        )
+        merged = []
+        for top, bottom in spans:
+            if top >= bottom:
+                continue
+            if merged and top <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], bottom)
+            else:
+                merged.append([top, bottom])
+
+        bands = []
+        for top, bottom in merged:
+            band = (0, top, line_width, bottom)
+            bands.append(
+                (
+                    band,
+                    [
+                        box
+                        for box in page.words
+                        if box.y < bottom and box.y + box.height > top
+                    ],
+                )
+            )
+        return previous, size, bands
+
+
+class Preview:
+    """
+    A completed preview render.
+
+    Attributes:
+        text (str): The text rendered.
+        image (Image or list): The rendered text, as `render_text` returns it.
+        thumbnail (bytes): The (first) page shrunk to the thumbnail size, as PNG.
+        resized (bool): Whether the thumbnail is smaller than the page.
+    """
+
+    __slots__ = ("text", "image", "thumbnail", "resized")
+
+    def __init__(self, text, image, thumbnail, resized):
+        self.text = text
+        self.image = image
+        self.thumbnail = thumbnail
+        self.resized = resized
+
+    def __repr__(self):
+        return f"Preview(words={len(self.text.split())}, resized={self.resized})"
+
+
+class PreviewWorker:
+    """
+    Renders previews on a background thread.
+
+    Events are posted by calling `post(event, value)` from the worker thread:
+
+        PROGRESS_EVENT  (words composed, words to compose), at most once per
+                        percent
+        DONE_EVENT      a Preview
+        ERROR_EVENT     the error message, if a render failed
+
+    Only the latest submitted text is rendered; a render that is superseded
+    is cancelled and posts nothing more.
+    """
+
+    def __init__(self, engine, post, thumbnail_size=(550, 200), **settings):
+        """
+        Args:
+            engine (OrthicEngine): The engine to render with.
+            post (callable): Called with (event, value) from the worker thread.
+            thumbnail_size (tuple, optional): Maximum size of the thumbnails.
+            **settings: Overrides for the engine's render settings.
+        """
+        self.post = post
+        self.thumbnail_size = thumbnail_size
+        self.settings = settings
+        self.renderer = IncrementalRenderer(engine)
+        self._condition = threading.Condition()
+        self._pending = None
+        self._generation = 0
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="preview-worker", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, text):
+        """Renders `text`, cancelling any render in progress."""
+        with self._condition:
+            self._pending = text
+            self._generation += 1
+            self._condition.notify()
+
+    def cancel(self):
+        """Cancels the render in progress and any pending one."""
+        with self._condition:
+            self._pending = None
+            self._generation += 1
+
+    def close(self):
+        """Cancels any render and stops the worker thread."""
+        with self._condition:
+            self._closed = True
+            self._pending = None
+            self._generation += 1
+            self._condition.notify()
+        self._thread.join()
+
+    def _current(self, generation):
+        return self._generation == generation and not self._closed
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                text, self._pending = self._pending, None
+                generation = self._generation
+
+            try:
+                preview = self._render(text, generation)
+            except Cancelled:
+                continue
+            except Exception as error:
+                if self._current(generation):
+                    self.post(ERROR_EVENT, f"{type(error).__name__}: {error}")
+                continue
+            if self._current(generation):
+                self.post(DONE_EVENT, preview)
+
+    def _render(self, text, generation):
+        reported = -1
+
+        def report(done, total):
+            nonlocal reported
+            percent = done * 100 // total
+            if percent != reported and self._current(generation):
+                reported = percent
+                self.post(PROGRESS_EVENT, (done, total))
+
+        image = self.renderer.render(
+            text, lambda: not self._current(generation), report, **self.settings
+        )
+        page = image[0] if isinstance(image, list) else image
+        thumbnail = page.copy()
+        thumbnail.thumbnail(self.thumbnail_size)
+        return Preview(text, image, png_bytes(thumbnail), thumbnail.size != page.size)
+
+
+class PdfExportWorker:
+    """
+    Exports PDFs on a background thread, one at a time.
+
+    Events are posted by calling `post(event, value)` from the worker thread:
+
+        EXPORT_DONE_EVENT   (path, number of pages written)
+        EXPORT_ERROR_EVENT  (path, the error message), if an export failed
+
+    Exports submitted while one is running are written after it, in order.
+    """
+
+    def __init__(self, engine, post):
+        """
+        Args:
+            engine (OrthicEngine): The engine to render with.
+            post (callable): Called with (event, value) from the worker thread.
+        """
+        self.engine = engine
+        self.post = post
+        self._jobs = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="pdf-export-worker", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, text, path, profile=pdf_export.DEFAULT_PROFILE, **options):
+        """
+        Exports `text` to the PDF `path`, see `pdf_export.render_pdf` for the
+        profile and the other options.
+        """
+        self._jobs.put((text, path, profile, options))
+
+    def close(self):
+        """
+        Stops the worker thread, once the exports submitted so far are written.
+        Nothing is posted any more.
+        """
+        self._closed = True
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            text, path, profile, options = job
+            try:
+                pages = pdf_export.render_pdf(
+                    self.engine, text, path, profile, **options
+                )
+            except Exception as error:
+                message = f"{type(error).__name__}: {error}"
+                event, value = EXPORT_ERROR_EVENT, (path, message)
+            else:
+                event, value = EXPORT_DONE_EVENT, (path, pages)
+            if not self._closed:
+                self.post(event, value)
@@ -1,20 +1,140 @@
-from orthic_encoder import OrthicEncoder
-from glyph_renderer import GlyphRenderer
+# Only light modules are imported up front; each command imports what it needs
+# so that e.g. `encode` and `--help` never load PIL
+import instrumentation
+import pdf_export
 import argparse
+import json
+import os
+import sys
+import time
 
 
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in COMMANDS:
+        COMMANDS[argv[0]](argv[1:])
+    else:
+        render(argv)
+
+
+def render(argv):
     parser = argparse.ArgumentParser(
-        description="Render Orthic shorthand text as an image."
+        description="Render Orthic shorthand text as an image.",
+        epilog="Other commands: batch, encode, serve. Run '%(prog)s <command> -h' for their "
+        "options.",
     )
     parser.add_argument(
         "text",
         type=str,
-        nargs="+",
+        nargs="*",
         help="The text to render in Orthic shorthand.",
-        default="""The preceding rules and examples will enable the student to read the
-    specimen of writing given on the opposite page, of which this page is a""",
     )
+    parser.add_argument(
+        "--file",
+        type=str,
+        help="Read the text from a file ('-' for stdin) instead of the arguments; "
+        "pages are rendered while the file is being read",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Save the pages instead of showing them; "
+        "'{page}' in the path is replaced by the page number. A '.svg' path "
+        "saves the pages as vector graphics",
+    )
+    parser.add_argument(
+        "--pdf",
+        type=str,
+        action="append",
+        help="Export a PDF for an e-book reader to this path; the page format "
+        "comes from --profile and overrides the layout options below. Repeat "
+        "with a --profile each to export for several devices from one layout",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sorted(pdf_export.PROFILES),
+        action="append",
+        help=f"Page format of the PDF (default: {pdf_export.DEFAULT_PROFILE})",
+    )
+    add_pdf_backend_argument(parser)
+    parser.add_argument(
+        "--scale",
+        type=float,
+        help="Render PNG or SVG pages at this multiple of the glyph size; the layout "
+        "options stay in unscaled pixels, so lines break in the same places",
+        default=1.0,
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        help="Record stage timings, counters and warnings to this file, as JSON "
+        "lines or, for a '.prom' file, in the Prometheus text format",
+    )
+    add_cache_dir_argument(parser)
+    add_layout_arguments(parser)
+    args = parser.parse_args(argv)
+    if not args.text and args.file is None:
+        parser.error("provide the text to render, or --file")
+    if args.scale <= 0:
+        parser.error("--scale must be positive")
+    pdfs = args.pdf or []
+    profiles = args.profile or [pdf_export.DEFAULT_PROFILE]
+    if len(profiles) == 1:
+        profiles = profiles * len(pdfs)
+    elif len(profiles) != len(pdfs):
+        parser.error("give one --profile, or one per --pdf")
+    args.targets = list(zip(pdfs, profiles))
+    use_cache_dir(args)
+
+    if args.metrics is not None:
+        instrumentation.enable(instrumentation.sink_for_path(args.metrics))
+
+    from orthic_engine import get_engine
+
+    engine = get_engine()
+    settings = layout_settings(args)
+
+    try:
+        if args.file is None:
+            output(engine, " ".join(args.text), settings, args)
+        elif args.file == "-":
+            output(engine, sys.stdin, settings, args)
+        else:
+            with open(args.file, encoding="utf-8") as f:
+                output(engine, f, settings, args)
+    finally:
+        instrumentation.disable()
+
+
+def add_pdf_backend_argument(parser):
+    parser.add_argument(
+        "--pdf-backend",
+        choices=pdf_export.BACKENDS,
+        help="How PDF pages are stored: 'raster' embeds each page as an image, "
+        "'words' each distinct word once (much smaller for long texts), "
+        "'vector' each distinct word once as outlines (smaller still, and sharp "
+        "at any zoom)",
+        default=pdf_export.DEFAULT_BACKEND,
+    )
+
+
+def add_cache_dir_argument(parser):
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Keep rendered words in a cache in this directory, shared between "
+        "processes and runs (default: $TEXT2ORTHIC_CACHE_DIR, if set)",
+    )
+
+
+def use_cache_dir(args):
+    # Through the environment, so that the engine of every worker process
+    # finds the cache too
+    if args.cache_dir is not None:
+        os.environ["TEXT2ORTHIC_CACHE_DIR"] = os.path.abspath(args.cache_dir)
+
+
+def add_layout_arguments(parser):
     parser.add_argument(
         "--space-width", type=int, help="Size of inter-word spacing", default=10
     )
@@ -30,14 +150,202 @@ def main():
         help="Number of lines per page",
         default=float("inf"),
     )
-    args = parser.parse_args()
 
-    renderer = GlyphRenderer()
-    text = " ".join(args.text)
-    rendered_image = renderer.render_text(
-        text, args.space_width, args.line_height, args.line_width, args.lines_per_page
+
+def layout_settings(args):
+    return dict(
+        space_width=args.space_width,
+        line_height=args.line_height,
+        line_width=args.line_width,
+        lines_per_page=args.lines_per_page,
+    )
+
+
+def output(engine, source, settings, args):
+    if len(args.targets) > 1:
+        pdf_export.render_pdfs(engine, source, args.targets, backend=args.pdf_backend)
+    elif args.targets:
+        path, profile = args.targets[0]
+        pdf_export.render_pdf(engine, source, path, profile, backend=args.pdf_backend)
+    elif args.output is not None and args.output.lower().endswith(".svg"):
+        vector = engine.vector_renderer().scaled(args.scale)
+        output_svg_pages(vector.iter_pages(source, **settings), args.output)
+    else:
+        renderer = engine.scaled_renderer(args.scale)
+        output_pages(renderer.iter_pages(source, **settings), args.output)
+
+
+def output_pages(pages, output=None):
+    for page_number, page in enumerate(pages, start=1):
+        if output is None:
+            page.show()
+        else:
+            with instrumentation.timer("export"):
+                page.save(output.format(page=page_number))
+            instrumentation.count("pages_exported")
+
+
+def output_svg_pages(pages, output):
+    for page_number, page in enumerate(pages, start=1):
+        with instrumentation.timer("export"):
+            with open(output.format(page=page_number), "w", encoding="utf-8") as f:
+                f.write(page)
+        instrumentation.count("pages_exported")
+
+
+def encode(argv):
+    parser = argparse.ArgumentParser(
+        prog=f"{os.path.basename(sys.argv[0])} encode",
+        description="Encode a text into Orthic glyphs, writing one JSON object per "
+        'word: {"word": ..., "ids": [...], "flags": [...]}. Flags are 1 for a '
+        "capital and 2 for a doubled letter.",
+    )
+    parser.add_argument("file", help="The text file to encode ('-' for stdin)")
+    parser.add_argument(
+        "--output", type=str, help="Write the JSON lines here instead of to stdout"
+    )
+    parser.add_argument(
+        "--names",
+        action="store_true",
+        help='Write glyph names ("glyphs") instead of glyph IDs',
+    )
+    parser.add_argument(
+        "--symbols",
+        type=str,
+        help="Also save the glyph names, indexed by glyph ID, as a JSON list",
+    )
+    args = parser.parse_args(argv)
+
+    from orthic_encoder import OrthicEncoder
+
+    encoder = OrthicEncoder()
+    if args.file == "-":
+        encoded = encoder.encode_text(sys.stdin)
+    else:
+        with open(args.file, encoding="utf-8") as f:
+            encoded = encoder.encode_text(f)
+
+    if args.symbols is not None:
+        with open(args.symbols, "w", encoding="utf-8") as f:
+            json.dump(encoded.symbols, f)
+
+    if args.output is None:
+        write_encodings(encoded, sys.stdout, args.names)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            write_encodings(encoded, f, args.names)
+
+
+def write_encodings(encoded, out, names=False):
+    for index in range(len(encoded)):
+        record = encoded.record(index, names)
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def serve(argv):
+    import render_server
+
+    parser = argparse.ArgumentParser(
+        prog=f"{os.path.basename(sys.argv[0])} serve",
+        description="Keep the glyphs and caches warm and serve render and encode "
+        "requests over HTTP. See render_server.py for the endpoints.",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        help="Address to listen on",
+        default=render_server.DEFAULT_HOST,
+    )
+    parser.add_argument(
+        "--port", type=int, help="Port to listen on", default=render_server.DEFAULT_PORT
+    )
+    parser.add_argument(
+        "--unix", type=str, help="Listen on this Unix socket instead of on a port"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Number of render threads (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        help="Refuse requests while this many are queued or running",
+        default=render_server.DEFAULT_MAX_PENDING,
+    )
+    add_cache_dir_argument(parser)
+    args = parser.parse_args(argv)
+    use_cache_dir(args)
+    render_server.run(args.host, args.port, args.unix, args.workers, args.max_pending)
+
+
+def batch(argv):
+    parser = argparse.ArgumentParser(
+        prog=f"{os.path.basename(sys.argv[0])} batch",
+        description="Render many text files into a directory, skipping those whose "
+        "outputs are up to date, and print a timing summary.",
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Text files or glob patterns ('**' recurses)"
+    )
+    parser.add_argument(
+        "--output-dir", type=str, required=True, help="Where to write the outputs"
+    )
+    parser.add_argument(
+        "--png",
+        action="store_true",
+        help="Write PNG pages, laid out by the options below (the default)",
+    )
+    parser.add_argument(
+        "--pdf", action="store_true", help="Write a PDF, laid out by --profile"
     )
-    rendered_image.show()
+    parser.add_argument(
+        "--profile",
+        choices=sorted(pdf_export.PROFILES),
+        help="Page format of the PDFs",
+        default=pdf_export.DEFAULT_PROFILE,
+    )
+    parser.add_argument(
+        "--bits", type=int, choices=[1, 8], help="Bits per PDF pixel", default=8
+    )
+    add_pdf_backend_argument(parser)
+    parser.add_argument(
+        "--workers", type=int, help="Number of processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Render up-to-date documents again"
+    )
+    add_cache_dir_argument(parser)
+    add_layout_arguments(parser)
+    args = parser.parse_args(argv)
+    use_cache_dir(args)
+
+    import batch_render
+
+    start = time.perf_counter()
+    try:
+        results = batch_render.run_batch(
+            args.inputs,
+            args.output_dir,
+            png=args.png or not args.pdf,
+            pdf=args.pdf,
+            profile=args.profile,
+            bits=args.bits,
+            backend=args.pdf_backend,
+            settings=layout_settings(args),
+            workers=args.workers,
+            force=args.force,
+        )
+    except (FileNotFoundError, ValueError) as error:
+        parser.error(str(error))
+    print(batch_render.format_summary(results, time.perf_counter() - start))
+    if any(result.status == "failed" for result in results):
+        sys.exit(1)
+
+
+COMMANDS = {
+    "batch": batch,
+    "encode": encode,
+    "serve": serve,
+}
 
 
 if __name__ == "__main__":
@@ -1,34 +1,15 @@
 import PySimpleGUI as sg
-from PIL import ImageOps
 
-from orthic_encoder import OrthicEncoder
-from glyph_renderer import GlyphRenderer
+import live_preview
+from orthic_engine import get_engine
 
-
-def create_thumbnail(image, max_size=(550, 200)):
-    thumbnail = image.copy()
-    thumbnail.thumbnail(max_size)
-    return thumbnail
-
-
-def expand_canvas(img, target_width, target_height, padding_size):
-    # First, add padding around the original image
-    padded_img = ImageOps.expand(img, border=padding_size, fill="white")
-
-    # Calculate how much to expand on the right and bottom after padding
-    right_padding = max(target_width - padded_img.width, 0)
-    bottom_padding = max(target_height - padded_img.height, 0)
-
-    # Apply additional padding to expand to the target size
-    return ImageOps.expand(
-        padded_img, border=(0, 0, right_padding, bottom_padding), fill="white"
-    )
+THUMBNAIL_SIZE = (550, 200)
 
 
 def main():
     layout = [
         [sg.Text("Enter text to transcribe:")],
-        [sg.Multiline(key="-INPUT-", size=(80, 20))],
+        [sg.Multiline(key="-INPUT-", size=(80, 20), enable_events=True)],
         [
             sg.Button("Transcribe"),
             sg.Button("Open in Viewer"),
@@ -49,44 +30,64 @@ def main():
                 visible=False,
             )
         ],
+        [
+            sg.ProgressBar(
+                100, orientation="h", size=(40, 10), key="-PROGRESS-", visible=False
+            )
+        ],
     ]
 
-    window = sg.Window("text2orthic", layout)
+    window = sg.Window("text2orthic", layout, finalize=True)
+    engine = get_engine()
     orthic_image = None
 
+    # Renders in the background and posts its progress and results as window
+    # events, so the window stays responsive; only the lines that changed are
+    # rendered again as the text is edited
+    preview = live_preview.PreviewWorker(
+        engine, window.write_event_value, THUMBNAIL_SIZE
+    )
+    # PDF exports are written in the background too
+    exporter = live_preview.PdfExportWorker(engine, window.write_event_value)
+
     while True:
         event, values = window.read()
         if event == sg.WIN_CLOSED or event == "Exit":
             break
-        if event == "Transcribe":
+        if event == "-INPUT-":
+            # re-render the preview as the user types
+            text = values["-INPUT-"]
+            if text.strip():
+                preview.submit(text)
+            else:
+                preview.cancel()
+                orthic_image = None
+                window["-IMAGE-"].update(visible=False)
+                window["-INFO-"].update(visible=False)
+                window["-PROGRESS-"].update(visible=False)
+        elif event == "Transcribe":
             text = values["-INPUT-"]
 
-            if text:
-                # render text to orthic
-                orthic_image = GlyphRenderer().render_text(text)
-                img_path = (
-                    "temp_output.png"  # Temporary file to save the rendered image
-                )
-                orthic_image.save(img_path)
-
-                # if big, create a thumbnail to dislay in the window
-                thumbnail = create_thumbnail(orthic_image)
-                thumbnail_path = "temp_thumbnail.png"
-                thumbnail.save(thumbnail_path)
-
-                # display the thumbnail
-                window["-IMAGE-"].update(filename=thumbnail_path)
-
-                # show/hide text about image having been resized
-                if (
-                    thumbnail.width == orthic_image.width
-                    and thumbnail.height == orthic_image.height
-                ):
-                    window["-INFO-"].update(visible=False)
-                else:
-                    window["-INFO-"].update(visible=True)
+            if text.strip():
+                preview.submit(text)
             else:
                 sg.Popup("Enter some text to transcribe.", title="Error")
+        elif event == live_preview.PROGRESS_EVENT:
+            done, total = values[event]
+            window["-PROGRESS-"].update(done, max=total, visible=True)
+        elif event == live_preview.DONE_EVENT:
+            result = values[event]
+            orthic_image = result.image
+
+            # display the thumbnail, straight from memory
+            window["-IMAGE-"].update(data=result.thumbnail, visible=True)
+            window["-PROGRESS-"].update(visible=False)
+
+            # show/hide text about image having been resized
+            window["-INFO-"].update(visible=result.resized)
+        elif event == live_preview.ERROR_EVENT:
+            window["-PROGRESS-"].update(visible=False)
+            sg.popup(f"Rendering failed:\n\n{values[event]}", title="Error")
         elif event == "Open in Viewer":
             if orthic_image:
                 orthic_image.show()
@@ -96,48 +97,31 @@ def main():
                 )
         elif event == "Export to PDF":
             # Optimize format for Kindle
-            PADDING_SIZE = 20
-            KINDLE_HEIGHT = 1024  # 1448
-            KINDLE_WIDTH = 768  # 1072
-            line_height = 100
-            DPI = 212  # 300
-
             text = values["-INPUT-"]
-            images = GlyphRenderer().render_text(
-                text,
-                line_width=KINDLE_WIDTH - PADDING_SIZE,
-                line_height=line_height,
-                lines_per_page=(KINDLE_HEIGHT - PADDING_SIZE) // line_height,
-            )
-
-            # Convert and expand PIL Images for saving as PDF
-            pdf_images = [
-                expand_canvas(
-                    img.convert("RGB"), KINDLE_WIDTH, KINDLE_HEIGHT, PADDING_SIZE
-                )
-                for img in images
-            ]
-
-            # Save as a PDF
             pdf_filename = "transcription.pdf"
-            pdf_images[0].save(
-                pdf_filename,
-                save_all=True,
-                append_images=pdf_images[1:],
-                dpi=(DPI, DPI),
-            )
-
+            exporter.submit(text, pdf_filename, "kindle", backend="words")
+            window["Export to PDF"].update("Exporting...", disabled=True)
+        elif event == live_preview.EXPORT_DONE_EVENT:
+            pdf_filename, _ = values[event]
+            window["Export to PDF"].update("Export to PDF", disabled=False)
             sg.popup(
                 f"Exported to PDF successfully!\n\nFile: {pdf_filename}",
                 title="Export Complete",
             )
+        elif event == live_preview.EXPORT_ERROR_EVENT:
+            pdf_filename, message = values[event]
+            window["Export to PDF"].update("Export to PDF", disabled=False)
+            sg.popup(f"Exporting {pdf_filename} failed:\n\n{message}", title="Error")
         elif event == "About":
             sg.popup(
                 "text2orthic: Orthic Shorthand Transcriptor\n\nCreated by rmattila\nhttps://github.com/rmattila/text2orthic",
                 title="About",
             )
 
+    preview.close()
     window.close()
+    # Let an export in progress finish writing its file
+    exporter.close()
 
 
 if __name__ == "__main__":
@@ -1,45 +1,212 @@
-import os
-from typing import List
+import functools
+from array import array
+from typing import Iterable, List
 from glyph import Glyph, SPECIAL_SYMBOLS
 from importlib import resources
 
+import glyph_pack
+import instrumentation
+import text_layout
+
 uses_under_ay = frozenset("dtjqmnvt") | {"qu"}
 uses_over_ea = frozenset("sbmpny")
 needs_angle_after_over_ea = frozenset("tds")
 
+# Endings that are folded into a single "ws_final" glyph
+WS_ENDINGS = (
+    [Glyph("w"), Glyph("s")],
+    [Glyph("w_initial"), Glyph("s")],
+)
+
+# Glyph names `encode_word` produces itself rather than by matching the glyph
+# folder; they get glyph IDs whether or not the folder has them
+GENERATED_SYMBOLS = (
+    "Unknown",
+    ".",
+    "l_standalone",
+    "s_straight",
+    "ay_under",
+    "w_initial",
+    "ia_over",
+    "ia_over_angled",
+    "ea_over",
+    "ea_over_angled",
+    "lt_initial",
+    "ws_final",
+)
+
+# Bits of the per-glyph flags in `EncodedWords`
+CAPITAL = 1
+DOUBLE = 2
+
+DEFAULT_MEMO_SIZE = 65536
+
+
+class EncodedWords:
+    """
+    The encodings of a sequence of words, packed into flat arrays.
+
+    The glyphs of all words are stored back to back: word `i` consists of the
+    glyphs `offsets[i]` up to `offsets[i + 1]`. Each glyph is an integer ID
+    into `symbols` plus a byte of `CAPITAL` and `DOUBLE` flags.
+
+    Attributes:
+        symbols (list): Glyph names, indexed by glyph ID.
+        words (list): The encoded words, in order.
+        ids (array): The glyph IDs of all words.
+        flags (array): The flags of all glyphs.
+        offsets (array): Where each word's glyphs start, plus the total count.
+    """
+
+    __slots__ = ("symbols", "words", "ids", "flags", "offsets")
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.words = []
+        self.ids = array("H")
+        self.flags = array("B")
+        self.offsets = array("I", [0])
+
+    def append(self, word, ids, flags):
+        self.words.append(word)
+        self.ids.extend(ids)
+        self.flags.extend(flags)
+        self.offsets.append(len(self.ids))
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, index):
+        """
+        Returns:
+            tuple: (word, ids, flags) of the word at `index`.
+        """
+        index = range(len(self.words))[index]
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.words[index], self.ids[start:end], self.flags[start:end]
+
+    def __iter__(self):
+        for index in range(len(self.words)):
+            yield self[index]
+
+    def record(self, index, names=False):
+        """
+        Returns:
+            dict: The word at `index` as plain JSON-serialisable data, with its
+            glyph IDs as "ids" (or its glyph names as "glyphs") and its "flags".
+        """
+        word, ids, flags = self[index]
+        if names:
+            record = {"word": word, "glyphs": [self.symbols[i] for i in ids]}
+        else:
+            record = {"word": word, "ids": ids.tolist()}
+        record["flags"] = flags.tolist()
+        return record
+
+    def glyphs(self, index) -> List[Glyph]:
+        """
+        Unpacks a word into Glyph objects, as `OrthicEncoder.encode_word` returns.
+        """
+        _, ids, flags = self[index]
+        return [
+            Glyph(self.symbols[glyph_id], bool(flag & CAPITAL), bool(flag & DOUBLE))
+            for glyph_id, flag in zip(ids, flags)
+        ]
+
+    def __repr__(self):
+        return f"EncodedWords(words={len(self.words)}, glyphs={len(self.ids)})"
+
 
 class OrthicEncoder:
     """
     A class to encode English words into sequences of Orthic shorthand glyphs.
     """
 
-    def __init__(self):
+    def __init__(
+        self, glyph_folder=resources.files("glyphs"), memo_size=DEFAULT_MEMO_SIZE
+    ):
+        """
+        Args:
+            glyph_folder (optional): Folder containing the glyph PNGs.
+            memo_size (int, optional): How many distinct words `encode_many`
+                remembers the encoding of.
+        """
+        self.glyph_folder = glyph_folder
         self.glyph_dict = self.load_glyphs()
+        self.glyph_trie = self.build_trie(self.glyph_dict)
+        self.symbols = [
+            "Unknown",
+            *sorted(set(self.glyph_dict).union(GENERATED_SYMBOLS) - {"Unknown"}),
+        ]
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._encode_packed = functools.lru_cache(maxsize=memo_size)(self._pack_word)
 
     def load_glyphs(self):
         """
-        Loads glyph images from the resources directory and maps them to their names.
+        Lists the glyph names of the glyph folder and maps them to Glyph objects.
+        The images themselves are not loaded (see `glyph_atlas`).
 
         Returns:
             dict: A dictionary mapping glyph names to Glyph objects.
         """
         glyphs = {}
 
-        for resource in resources.files("glyphs").iterdir():
-            filename = os.path.basename(resource.name)
-            glyph_name, ext = os.path.splitext(filename)
-            if ext == ".png":
-                glyph = Glyph(glyph_name)
-                glyphs[glyph_name] = glyph
+        for glyph_name in glyph_pack.glyph_names(self.glyph_folder):
+            glyphs[glyph_name] = Glyph(glyph_name)
 
         return glyphs
 
-    def encode_word(self, word: str) -> List[Glyph]:
+    def build_trie(self, glyph_names):
+        """
+        Builds a prefix trie over the glyph names.
+
+        Each node is a dict mapping a character to the next node; a node at which
+        a glyph name ends additionally maps `None` to that name.
+
+        Args:
+            glyph_names (iterable): The glyph names to insert.
+
+        Returns:
+            dict: The root node.
+        """
+        root = {}
+        for glyph_name in glyph_names:
+            node = root
+            for char in glyph_name:
+                node = node.setdefault(char, {})
+            node[None] = glyph_name
+        return root
+
+    def match_prefixes(self, text: str, start: int = 0) -> List[str]:
+        """
+        Finds every glyph name that `text[start:]` starts with.
+
+        Args:
+            text (str): The (lowercased) text to match against.
+            start (int, optional): Where in `text` to start matching. Defaults to 0.
+
+        Returns:
+            list: The matching glyph names, longest first.
+        """
+        matches = []
+        node = self.glyph_trie
+        for char in text[start:]:
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                matches.append(node[None])
+        matches.reverse()
+        return matches
+
+    def encode_word(self, word: str, unknown=None) -> List[Glyph]:
         """
         Encodes a given English word into a sequence of Orthic shorthand glyphs.
 
         Args:
             word (str): The word to encode.
+            unknown (list, optional): If given, every character that no glyph
+                matched is appended to it.
 
         Returns:
             list: A list of Glyph objects representing the encoded word.
@@ -56,11 +223,21 @@ class OrthicEncoder:
                 result.append(Glyph("."))
             return result
 
+        # Lowercasing can change the length of a string (e.g. "İ"); only then
+        # do we need to lowercase each suffix separately to match like
+        # `word[i:].lower().startswith(glyph_name)` would
+        lowered = word.lower()
+        same_length = len(lowered) == len(word)
+
         result = []
         i = 0
         while i < len(word):
             glyph_added = False
-            for glyph_name in sorted(self.glyph_dict.keys(), key=len, reverse=True):
+            if same_length:
+                candidates = self.match_prefixes(lowered, i)
+            else:
+                candidates = self.match_prefixes(word[i:].lower())
+            for glyph_name in candidates:
                 next_index = i + len(glyph_name)
 
                 # Check if the next character forms a double letter with the last in
@@ -78,56 +255,105 @@ class OrthicEncoder:
                 if forms_double and len(glyph_name) > 1:
                     continue
 
-                if word[i:].lower().startswith(glyph_name):
-                    advance = len(glyph_name)
-                    if glyph_name == "ay":
-                        if (
-                            i > 0
-                            and word[i - 1].lower() in uses_under_ay
-                            # Handle "qu"
-                            or i > 1
-                            and word[i - 2 : i].lower() in uses_under_ay
-                        ):
-                            glyph_name = "ay_under"
-                    elif glyph_name == "w" and (
-                        i == 0
-                        # Handle "wl" digraph
-                        or (len(word) > i + 1 and word[i + 1].lower() == "l")
+                advance = len(glyph_name)
+                if glyph_name == "ay":
+                    if (
+                        i > 0
+                        and word[i - 1].lower() in uses_under_ay
+                        # Handle "qu"
+                        or i > 1
+                        and word[i - 2 : i].lower() in uses_under_ay
                     ):
-                        glyph_name = "w_initial"
-                    elif (
-                        glyph_name == "ea"
-                        or glyph_name == "ae"
-                        or glyph_name == "ia"
-                        and (i == 0 or i > 0 and word[i - 1].lower() in uses_over_ea)
+                        glyph_name = "ay_under"
+                elif glyph_name == "w" and (
+                    i == 0
+                    # Handle "wl" digraph
+                    or (len(word) > i + 1 and word[i + 1].lower() == "l")
+                ):
+                    glyph_name = "w_initial"
+                elif (
+                    glyph_name == "ea"
+                    or glyph_name == "ae"
+                    or glyph_name == "ia"
+                    and (i == 0 or i > 0 and word[i - 1].lower() in uses_over_ea)
+                ):
+                    glyph_name = "ia_over" if "i" in glyph_name else "ea_over"
+                    if (
+                        len(word) > i + 2
+                        and word[i + 2].lower() in needs_angle_after_over_ea
                     ):
-                        glyph_name = "ia_over" if "i" in glyph_name else "ea_over"
-                        if (
-                            len(word) >= i + 2
-                            and word[i + 2].lower() in needs_angle_after_over_ea
-                        ):
-                            glyph_name = f"{glyph_name}_angled"
-                    elif glyph_name == "lt" and i == 0:
-                        glyph_name = "lt_initial"
-                    glyph = self.create_glyph(word, i, glyph_name)
-                    result.append(glyph)
-                    if glyph.double:
-                        advance = 2
-                    i += advance
-                    glyph_added = True
-                    break
+                        glyph_name = f"{glyph_name}_angled"
+                elif glyph_name == "lt" and i == 0:
+                    glyph_name = "lt_initial"
+                glyph = self.create_glyph(word, i, glyph_name)
+                result.append(glyph)
+                if glyph.double:
+                    advance = 2
+                i += advance
+                glyph_added = True
+                break
 
             if not glyph_added:
                 result.append(Glyph("Unknown"))
+                if unknown is not None:
+                    unknown.append(word[i])
                 i += 1
-        if result[-2:] == [Glyph("w"), Glyph("s")] or result[-2:] == [
-            Glyph("w_initial"),
-            Glyph("s"),
-        ]:
+        if result[-2:] in WS_ENDINGS:
             result[-2] = Glyph("ws_final")
             result.pop()
         return result
 
+    def encode_many(self, words: Iterable[str]) -> EncodedWords:
+        """
+        Encodes many words into a compact representation.
+
+        Each distinct word is encoded once; encodings are also remembered across
+        calls, up to `memo_size` distinct words.
+
+        Args:
+            words (iterable): The words to encode.
+
+        Returns:
+            EncodedWords: The glyph IDs and flags of every word, in order.
+        """
+        encoded = EncodedWords(self.symbols)
+        vocabulary = {}
+        with instrumentation.timer("encode_many"):
+            for word in words:
+                packed = vocabulary.get(word)
+                if packed is None:
+                    packed = vocabulary[word] = self._encode_packed(word)
+                encoded.append(word, *packed)
+        return encoded
+
+    def encode_text(self, source) -> EncodedWords:
+        """
+        Encodes every word of a text, see `encode_many`.
+
+        Args:
+            source (str or iterable): The text, or an iterable of text chunks such
+                as an open file, which is read incrementally.
+
+        Returns:
+            EncodedWords: The glyph IDs and flags of every word, in order.
+        """
+        return self.encode_many(text_layout.iter_words(source))
+
+    def memo_info(self):
+        """
+        Returns:
+            CacheInfo: Hits, misses and size of the `encode_many` memo.
+        """
+        return self._encode_packed.cache_info()
+
+    def _pack_word(self, word):
+        glyphs = self.encode_word(word)
+        ids = tuple(self.symbol_ids[glyph.symbol] for glyph in glyphs)
+        flags = bytes(
+            glyph.capital * CAPITAL | glyph.double * DOUBLE for glyph in glyphs
+        )
+        return ids, flags
+
     def create_glyph(self, word, index, glyph_name):
         """
         Creates a Glyph object for a specific part of the word. This method checks if the
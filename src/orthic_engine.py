@@ -0,0 +1,238 @@
+import os
+import threading
+from collections import Counter
+from importlib import resources
+
+import disk_cache
+import glyph_atlas
+import glyph_outlines
+from glyph_renderer import GlyphRenderer
+from orthic_encoder import OrthicEncoder
+from vector_render import VectorRenderer
+from word_cache import DEFAULT_MAX_BYTES
+
+
+class OrthicEngine:
+    """
+    Long-lived owner of the encoder, the glyph data and the render settings.
+
+    Building an encoder or loading glyphs touches the filesystem, so a process
+    should create one engine and route every encode and render call through it.
+    The engine is safe to share between threads: its glyph data is read-only
+    once loaded, and `reload` swaps in a complete new set of encoder, atlas and
+    renderer at once so that concurrent calls never see a mix of old and new
+    glyphs.
+    """
+
+    def __init__(
+        self,
+        glyph_folder=resources.files("glyphs"),
+        space_width=10,
+        line_height=100,
+        line_width=1300,
+        lines_per_page=float("inf"),
+        cache_bytes=DEFAULT_MAX_BYTES,
+        blend=None,
+        cache_dir=None,
+        disk_cache_bytes=disk_cache.DEFAULT_MAX_BYTES,
+        scale=1.0,
+    ):
+        self.glyph_folder = glyph_folder
+        self.cache_bytes = cache_bytes
+        self.blend = blend
+        self.cache_dir = cache_dir
+        self.disk_cache_bytes = disk_cache_bytes
+        self.space_width = space_width
+        self.line_height = line_height
+        self.line_width = line_width
+        self.lines_per_page = lines_per_page
+        self._lock = threading.Lock()
+        self.renderer = GlyphRenderer(
+            glyph_folder,
+            cache_bytes=cache_bytes,
+            blend=blend,
+            cache_dir=cache_dir,
+            disk_cache_bytes=disk_cache_bytes,
+            scale=scale,
+        )
+        self._scaled_renderers = {scale: self.renderer}
+        self._vector_renderer = None
+
+    @property
+    def encoder(self) -> OrthicEncoder:
+        return self.renderer.encoder
+
+    @property
+    def atlas(self) -> glyph_atlas.GlyphAtlas:
+        return self.renderer.atlas
+
+    def reload(self):
+        """
+        Reloads the glyphs, e.g. after PNGs were added to or edited in the glyph
+        folder. Calls already in progress finish with the previous glyphs.
+        """
+        with self._lock:
+            previous = list(self._scaled_renderers.values())
+            atlas = glyph_atlas.reload_atlas(self.glyph_folder)
+            encoder = OrthicEncoder(self.glyph_folder)
+            self.renderer = self._new_renderer(encoder, atlas, self.renderer.scale)
+            self._scaled_renderers = {self.renderer.scale: self.renderer}
+            if self._vector_renderer is not None:
+                glyph_outlines.reload_outlines(self.glyph_folder)
+                self._vector_renderer = None
+        # Write the words the previous renderers still hold back, and release
+        # their databases (calls still using them simply reconnect)
+        for renderer in previous:
+            if renderer.disk_cache is not None:
+                renderer.disk_cache.close()
+        return self
+
+    def scaled_renderer(self, scale) -> GlyphRenderer:
+        """
+        Returns a renderer drawing at another scale, e.g. for a device or printer
+        of a different resolution (see `GlyphRenderer`). It shares the engine's
+        encoder and glyphs, and is kept until `reload`, so each scale's glyphs
+        are resampled once.
+
+        Args:
+            scale (float): Multiple of the size of the glyph PNGs.
+
+        Returns:
+            GlyphRenderer: The renderer for `scale`.
+        """
+        with self._lock:
+            renderer = self._scaled_renderers.get(scale)
+            if renderer is None:
+                renderer = self._new_renderer(
+                    self.renderer.encoder, self.renderer.layout_renderer.atlas, scale
+                )
+                self._scaled_renderers[scale] = renderer
+            return renderer
+
+    def vector_renderer(self) -> VectorRenderer:
+        """
+        Returns a renderer drawing the engine's words as vector outlines (see
+        `vector_render`), at the scale of the engine's renderer. It is kept
+        until `reload`, so each word is converted to outlines once.
+        """
+        with self._lock:
+            if self._vector_renderer is None:
+                self._vector_renderer = VectorRenderer(
+                    self.renderer,
+                    glyph_outlines.get_outlines(self.glyph_folder),
+                )
+            return self._vector_renderer
+
+    def _new_renderer(self, encoder, atlas, scale):
+        return GlyphRenderer(
+            self.glyph_folder,
+            encoder,
+            atlas,
+            cache_bytes=self.cache_bytes,
+            blend=self.blend,
+            cache_dir=self.cache_dir,
+            disk_cache_bytes=self.disk_cache_bytes,
+            scale=scale,
+        )
+
+    def encode_word(self, word: str):
+        return self.renderer.encoder.encode_word(word)
+
+    def render_word(self, word: str, transparent_background: bool = False):
+        return self.renderer.render_word(word, transparent_background)
+
+    def render_text(self, text: str, **settings):
+        """
+        Renders text with the engine's render settings.
+
+        Args:
+            text (str): The English text to be rendered in Orthic shorthand.
+            **settings: Overrides for `space_width`, `line_height`, `line_width`
+                and `lines_per_page` for this call only, and `workers`.
+
+        Returns:
+            list or Image: See `GlyphRenderer.render_text`.
+        """
+        return self.renderer.render_text(text, **self.render_settings(**settings))
+
+    def iter_pages(self, source, **settings):
+        """
+        Renders text page by page with the engine's render settings.
+
+        Args:
+            source (str or iterable): The text, or an iterable of text chunks such
+                as an open file.
+            **settings: Overrides for the render settings for this call only.
+
+        Yields:
+            Image: The pages, see `GlyphRenderer.iter_pages`.
+        """
+        return self.renderer.iter_pages(source, **self.render_settings(**settings))
+
+    def warm_cache(self, text: str, max_words=None):
+        """
+        Pre-renders the most frequent words of a text into the word cache.
+
+        Args:
+            text (str): Text to take word frequencies from (e.g. a sample corpus).
+            max_words (int, optional): How many of the most frequent words to render.
+                Defaults to all of them.
+        """
+        words = [word for word, _ in Counter(text.split()).most_common(max_words)]
+        self.renderer.warm_cache(words)
+
+    def cache_stats(self):
+        """
+        Returns:
+            dict or None: Word cache counters (see `WordCache.stats`), or None if
+            caching is disabled.
+        """
+        word_cache = self.renderer.word_cache
+        return word_cache.stats() if word_cache is not None else None
+
+    def disk_cache_stats(self):
+        """
+        Returns:
+            dict or None: Counters and warm/cold timings of the word cache on
+            disk (see `DiskWordCache.stats`), or None if there is none.
+        """
+        cache = self.renderer.disk_cache
+        return cache.stats() if cache is not None else None
+
+    def flush(self):
+        """Writes any words still waiting to go into the word cache on disk."""
+        with self._lock:
+            renderers = list(self._scaled_renderers.values())
+        for renderer in renderers:
+            if renderer.disk_cache is not None:
+                renderer.disk_cache.flush()
+
+    def render_settings(self, **overrides):
+        settings = {
+            "space_width": self.space_width,
+            "line_height": self.line_height,
+            "line_width": self.line_width,
+            "lines_per_page": self.lines_per_page,
+        }
+        settings.update(overrides)
+        return settings
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> OrthicEngine:
+    """
+    Returns the process-wide engine for the default glyph folder.
+
+    The engine keeps a word cache on disk in the directory named by the
+    TEXT2ORTHIC_CACHE_DIR environment variable, if it is set.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = OrthicEngine(
+                cache_dir=os.environ.get(disk_cache.CACHE_DIR_ENV) or None
+            )
+        return _engine
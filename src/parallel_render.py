@@ -0,0 +1,177 @@
+"""
+Multi-process rendering of long texts.
+
+The text is laid out in the calling process (which only needs word sizes),
+then the work is fanned out to a process pool in two stages: every distinct
+word is rasterised once somewhere in the pool, and then the pages are
+composited from those word images. Images cross process boundaries as
+zlib-compressed raw buffers rather than pickled PIL images. Results are
+collected in order, so the output is deterministic and identical to the
+serial `GlyphRenderer.render_text`.
+"""
+
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+from PIL import Image
+
+import instrumentation
+from glyph_renderer import GlyphRenderer
+from text_layout import TextLayout
+
+# Set in each worker process by `_init_worker`
+_worker_renderer = None
+
+
+def pack_image(img):
+    """Turns an image into a compact, picklable (mode, size, buffer) tuple."""
+    return img.mode, img.size, zlib.compress(img.tobytes(), 1)
+
+
+def unpack_image(packed):
+    mode, size, data = packed
+    return Image.frombytes(mode, size, zlib.decompress(data))
+
+
+def _init_worker(glyph_folder, cache_bytes, blend, cache_dir, scale):
+    global _worker_renderer
+    settings = dict(
+        cache_bytes=cache_bytes, blend=blend, cache_dir=cache_dir, scale=scale
+    )
+    if glyph_folder is None:
+        _worker_renderer = GlyphRenderer(**settings)
+    else:
+        _worker_renderer = GlyphRenderer(glyph_folder, **settings)
+
+
+def _render_words(words):
+    packed = [pack_image(_worker_renderer.compose_word(word)[1]) for word in words]
+    if _worker_renderer.disk_cache is not None:
+        # Workers are not shut down cleanly enough to flush at exit
+        _worker_renderer.disk_cache.flush()
+    return packed
+
+
+def _render_pages(task):
+    pages, word_images = task
+    images = {word: unpack_image(packed) for word, packed in word_images.items()}
+    return [
+        pack_image(_worker_renderer.compose_page(page, images.__getitem__))
+        for page in pages
+    ]
+
+
+def _chunks(items, n_chunks):
+    size = max(1, -(-len(items) // n_chunks))
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def render_layout(
+    layout: TextLayout,
+    workers: int,
+    glyph_folder=None,
+    cache_bytes=0,
+    blend=None,
+    progress=instrumentation.tqdm_progress,
+    cache_dir=None,
+    scale=1.0,
+) -> List[Image.Image]:
+    """
+    Renders each page of a layout using a pool of worker processes.
+
+    Args:
+        layout (TextLayout): The layout to render.
+        workers (int): Number of worker processes.
+        glyph_folder (optional): Glyph folder for the workers. Defaults to the
+            default glyph folder.
+        cache_bytes (int, optional): Word cache budget of each worker. Each
+            distinct word is only rendered once anyway, so this defaults to 0.
+        blend (str, optional): Coverage blend mode of the workers, see
+            `GlyphRenderer`.
+        progress (callable, optional): Progress factory for the rasterising
+            stage, see `GlyphRenderer`; None for no progress reporting.
+        cache_dir (str, optional): Word cache on disk for the workers, see
+            `GlyphRenderer`.
+        scale (float, optional): Scale of the layout and of the word images,
+            see `GlyphRenderer`.
+
+    Returns:
+        list: One image per page, as `GlyphRenderer.render_layout` returns.
+    """
+    words = list(dict.fromkeys(box.word for page in layout.pages for box in page.words))
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(glyph_folder, cache_bytes, blend, cache_dir, scale),
+    ) as pool:
+        # Stage 1: rasterise every distinct word once
+        word_images = {}
+        word_chunks = _chunks(words, workers * 4)
+        reporter = progress(len(words)) if progress is not None else None
+        for chunk, packed in zip(word_chunks, pool.map(_render_words, word_chunks)):
+            word_images.update(zip(chunk, packed))
+            if reporter is not None:
+                reporter.update(len(chunk))
+        if reporter is not None:
+            reporter.close()
+
+        # Stage 2: composite the pages, shipping each task the words it needs
+        tasks = []
+        for pages in _chunks(layout.pages, workers * 2):
+            needed = {box.word for page in pages for box in page.words}
+            tasks.append((pages, {word: word_images[word] for word in needed}))
+
+        return [
+            unpack_image(packed)
+            for packed_pages in pool.map(_render_pages, tasks)
+            for packed in packed_pages
+        ]
+
+
+def render_document(
+    text: str,
+    workers: int,
+    space_width=10,
+    line_height=100,
+    line_width=1300,
+    lines_per_page=float("inf"),
+    renderer=None,
+):
+    """
+    Renders text like `GlyphRenderer.render_text`, using `workers` processes.
+
+    Args:
+        text (str): The English text to be rendered in Orthic shorthand.
+        workers (int): Number of worker processes.
+        space_width, line_height, line_width, lines_per_page: See
+            `GlyphRenderer.render_text`.
+        renderer (GlyphRenderer, optional): Renderer used for the layout pass;
+            its glyph folder, blend mode and scale are also used by the workers.
+
+    Returns:
+        list or Image: See `GlyphRenderer.render_text`.
+    """
+    if renderer is None:
+        renderer = GlyphRenderer()
+
+    layout = renderer.layout_text(
+        text,
+        space_width=space_width,
+        line_height=line_height,
+        line_width=line_width,
+        lines_per_page=lines_per_page,
+    )
+    pages = render_layout(
+        layout,
+        workers,
+        renderer.glyph_folder,
+        blend=renderer.blend,
+        cache_dir=(
+            renderer.disk_cache.directory if renderer.disk_cache is not None else None
+        ),
+        scale=renderer.scale,
+    )
+
+    return pages if layout.paginated else pages[0]
@@ -0,0 +1,708 @@
+"""
+Headless PDF export that writes pages as they are rendered.
+
+There are three backends. "raster" embeds each page as a Flate-compressed 8-bit
+(or 1-bit) grayscale image. "words" works from the page layouts instead: each
+distinct word is embedded once, as an image that every page showing the word
+refers to, so a book that repeats a few thousand words is written (and paged
+through) much faster and is a fraction of the size. "vector" embeds each
+distinct word once too, as the filled outlines of its glyphs (see
+`vector_render`): nothing is rasterised, the text stays sharp at any zoom, and
+books are smaller still. Whatever the backend, pages are written to the file
+straight away, so only one page is ever held in memory no matter how long the
+book is. Page formats for e-book readers are available as named profiles.
+
+`render_pdfs` writes PDFs for several profiles from one layout pass: every
+device gets the same lines and pages, each drawn directly at its own
+resolution rather than resampled from another device's pages.
+"""
+
+import contextlib
+import os
+import zlib
+
+import instrumentation
+
+
+class PdfProfile:
+    """
+    A target page format.
+
+    Attributes:
+        name (str): The profile's name.
+        width (int): Page width in pixels.
+        height (int): Page height in pixels.
+        dpi (int): Resolution of the target screen.
+        padding (int): White margin around the text, in pixels.
+        line_height (int): Height of each line of text, in pixels.
+    """
+
+    def __init__(self, name, width, height, dpi, padding=20, line_height=100):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.dpi = dpi
+        self.padding = padding
+        self.line_height = line_height
+
+    def render_settings(self):
+        """
+        Returns:
+            dict: `render_text` settings that fill pages of this format.
+        """
+        return {
+            "line_width": self.width - self.padding,
+            "line_height": self.line_height,
+            "lines_per_page": (self.height - self.padding) // self.line_height,
+        }
+
+    def __repr__(self):
+        return (
+            f"PdfProfile(name={self.name}, size={self.width}x{self.height}, "
+            f"dpi={self.dpi})"
+        )
+
+
+PROFILES = {
+    profile.name: profile
+    for profile in [
+        PdfProfile("kindle", 768, 1024, 212),
+        PdfProfile("kindle-paperwhite", 1072, 1448, 300),
+    ]
+}
+DEFAULT_PROFILE = "kindle"
+BACKENDS = ("raster", "words", "vector")
+DEFAULT_BACKEND = "raster"
+
+
+def get_profile(profile):
+    """Looks up a profile by name; profiles themselves are passed through."""
+    if isinstance(profile, PdfProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"Unknown PDF profile '{profile}', expected one of {', '.join(PROFILES)}"
+        ) from None
+
+
+def page_size(size, profile: PdfProfile):
+    """
+    Returns:
+        tuple: The size of the PDF page, in pixels, for a rendered page of `size`.
+    """
+    return (
+        max(size[0] + 2 * profile.padding, profile.width),
+        max(size[1] + 2 * profile.padding, profile.height),
+    )
+
+
+def fit_page(page, profile: PdfProfile, bits=8):
+    """
+    Places a rendered page on a white page of the profile's size.
+
+    The page is padded on all sides and then expanded to the right and bottom
+    to the profile's size (pages larger than that are kept whole).
+
+    Args:
+        page (Image): A rendered page.
+        profile (PdfProfile): The target format.
+        bits (int, optional): 8 for grayscale, 1 for black and white.
+
+    Returns:
+        Image: An "L" or "1" mode image.
+    """
+    from PIL import Image
+
+    gray = page.convert("L")
+    fitted = Image.new("L", page_size(gray.size, profile), 255)
+    fitted.paste(gray, (profile.padding, profile.padding))
+    if bits == 1:
+        fitted = fitted.point(lambda v: 255 if v >= 128 else 0, mode="1")
+    return fitted
+
+
+class StreamingPdfWriter:
+    """
+    Writes a PDF one image page at a time.
+
+    Usage:
+        with StreamingPdfWriter(open("book.pdf", "wb"), dpi=212) as writer:
+            for page in pages:
+                writer.add_page(page)
+    """
+
+    def __init__(self, fp, dpi=72, close_fp=True):
+        """
+        Args:
+            fp: A binary file object to write to.
+            dpi (int, optional): Resolution the page images are meant for.
+            close_fp (bool, optional): Whether `close` also closes `fp`.
+        """
+        self.fp = fp
+        self.dpi = dpi
+        self.close_fp = close_fp
+        self.offsets = {}
+        self.page_ids = []
+        # Objects 1 and 2 are the catalog and page tree, written last
+        self.next_id = 3
+        self.position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write(self, data):
+        self.fp.write(data)
+        self.position += len(data)
+
+    def _reserve_id(self):
+        object_id = self.next_id
+        self.next_id += 1
+        return object_id
+
+    def _write_object(self, object_id, body, stream=None):
+        self.offsets[object_id] = self.position
+        self._write(f"{object_id} 0 obj\n".encode())
+        if stream is None:
+            self._write(body + b"\nendobj\n")
+        else:
+            self._write(body + b"\nstream\n" + stream + b"\nendstream\nendobj\n")
+
+    def _write_page(self, width_pt, height_pt, content, xobjects):
+        # A page with a compressed content stream drawing the given XObjects,
+        # by resource name
+        content = zlib.compress("\n".join(content).encode())
+        content_id = self._reserve_id()
+        self._write_object(
+            content_id,
+            f"<< /Filter /FlateDecode /Length {len(content)} >>".encode(),
+            content,
+        )
+
+        xobjects = " ".join(
+            f"/{name} {object_id} 0 R" for name, object_id in xobjects.items()
+        )
+        page_id = self._reserve_id()
+        self._write_object(
+            page_id,
+            (
+                f"<< /Type /Page /Parent 2 0 R "
+                f"/MediaBox [0 0 {width_pt} {height_pt}] "
+                f"/Resources << /XObject << {xobjects} >> >> "
+                f"/Contents {content_id} 0 R >>"
+            ).encode(),
+        )
+        self.page_ids.append(page_id)
+
+    def add_page(self, image):
+        """
+        Adds a page showing `image` at the writer's resolution.
+
+        Args:
+            image (Image): An "L" or "1" mode image, e.g. from `fit_page`.
+        """
+        if image.mode not in ("L", "1"):
+            image = image.convert("L")
+        bits = 1 if image.mode == "1" else 8
+
+        width_pt = image.width * 72 / self.dpi
+        height_pt = image.height * 72 / self.dpi
+
+        image_id = self._reserve_id()
+        data = zlib.compress(image.tobytes())
+        self._write_object(
+            image_id,
+            (
+                f"<< /Type /XObject /Subtype /Image /Width {image.width} "
+                f"/Height {image.height} /ColorSpace /DeviceGray "
+                f"/BitsPerComponent {bits} /Filter /FlateDecode "
+                f"/Length {len(data)} >>"
+            ).encode(),
+            data,
+        )
+
+        content_id = self._reserve_id()
+        content = f"q {width_pt:.4f} 0 0 {height_pt:.4f} 0 0 cm /Im0 Do Q".encode()
+        self._write_object(
+            content_id, f"<< /Length {len(content)} >>".encode(), content
+        )
+
+        page_id = self._reserve_id()
+        self._write_object(
+            page_id,
+            (
+                f"<< /Type /Page /Parent 2 0 R "
+                f"/MediaBox [0 0 {width_pt:.4f} {height_pt:.4f}] "
+                f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> "
+                f"/Contents {content_id} 0 R >>"
+            ).encode(),
+        )
+        self.page_ids.append(page_id)
+
+    def close(self):
+        """Writes the page tree, cross-reference table and trailer."""
+        if self.fp is None:
+            return
+
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._write_object(
+            2,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode(),
+        )
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_position = self.position
+        self._write(f"xref\n0 {self.next_id}\n".encode())
+        self._write(b"0000000000 65535 f \n")
+        for object_id in range(1, self.next_id):
+            self._write(f"{self.offsets[object_id]:010d} 00000 n \n".encode())
+        self._write(
+            (
+                f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\n"
+                f"startxref\n{xref_position}\n%%EOF\n"
+            ).encode()
+        )
+
+        if self.close_fp:
+            self.fp.close()
+        self.fp = None
+
+
+class WordPdfWriter(StreamingPdfWriter):
+    """
+    Writes a PDF one laid-out page at a time, embedding each distinct word once.
+
+    A word is written as an image XObject the first time a page shows it:
+    black, with the word's coverage as its soft mask (8 bits), or as a stencil
+    mask (1 bit). Pages draw the words they show with references to those
+    objects, clipped to the page's crop box as the rendered page would be.
+
+    Usage:
+        with WordPdfWriter(open("book.pdf", "wb"), profile) as writer:
+            for page in page_layouts:
+                writer.add_layout_page(page, word_image)
+    """
+
+    def __init__(self, fp, profile: PdfProfile, bits=8, close_fp=True):
+        """
+        Args:
+            fp: A binary file object to write to.
+            profile (PdfProfile): The page format.
+            bits (int, optional): 8 for grayscale, 1 for black-and-white words.
+            close_fp (bool, optional): Whether `close` also closes `fp`.
+        """
+        super().__init__(fp, dpi=profile.dpi, close_fp=close_fp)
+        self.profile = profile
+        self.bits = bits
+        # word -> (resource name, object id), or None for a blank word
+        self.words = {}
+
+    def _add_word(self, word, image):
+        """
+        Writes a word image, unless it was written before.
+
+        Returns:
+            tuple or None: The word's (resource name, object id), or None if it
+            has no visible pixels.
+        """
+        if word in self.words:
+            return self.words[word]
+
+        mask = image.getchannel("A") if image.mode == "RGBA" else image.convert("L")
+        if mask.getbbox() is None:
+            self.words[word] = None
+            return None
+
+        size = f"/Width {mask.width} /Height {mask.height}"
+        image_id = self._reserve_id()
+        if self.bits == 1:
+            # Painted where the sample is 0, i.e. where the word is inked
+            stencil = mask.point(lambda v: 0 if v >= 128 else 255, mode="1")
+            data = zlib.compress(stencil.tobytes())
+            self._write_object(
+                image_id,
+                (
+                    f"<< /Type /XObject /Subtype /Image {size} /ImageMask true "
+                    f"/BitsPerComponent 1 /Filter /FlateDecode /Length {len(data)} >>"
+                ).encode(),
+                data,
+            )
+        else:
+            mask_id = self._reserve_id()
+            data = zlib.compress(mask.tobytes())
+            self._write_object(
+                mask_id,
+                (
+                    f"<< /Type /XObject /Subtype /Image {size} "
+                    f"/ColorSpace /DeviceGray /BitsPerComponent 8 "
+                    f"/Filter /FlateDecode /Length {len(data)} >>"
+                ).encode(),
+                data,
+            )
+            # All black; the soft mask says where
+            data = zlib.compress(bytes(mask.width * mask.height))
+            self._write_object(
+                image_id,
+                (
+                    f"<< /Type /XObject /Subtype /Image {size} "
+                    f"/ColorSpace /DeviceGray /BitsPerComponent 8 "
+                    f"/SMask {mask_id} 0 R /Filter /FlateDecode "
+                    f"/Length {len(data)} >>"
+                ).encode(),
+                data,
+            )
+
+        entry = self.words[word] = (f"W{len(self.words)}", image_id)
+        return entry
+
+    def add_layout_page(self, page, word_image):
+        """
+        Adds a page showing a laid-out page of words, placed as `fit_page`
+        places the rendered page.
+
+        Args:
+            page (PageLayout): The page to add.
+            word_image (callable): Maps a word to its transparent-background
+                image or coverage mask, e.g. `GlyphRenderer.compose_word`'s.
+        """
+        padding = self.profile.padding
+        width, height = page_size(page.size, self.profile)
+        left, top = page.crop[0] - padding, page.crop[1] - padding
+        scale = 72 / self.dpi
+        width_pt = f"{width * scale:.4f}"
+        height_pt = f"{height * scale:.4f}"
+
+        # Drawn in pixels from the top left of the page, as the page image would
+        # be; the scale is precise enough that word edges stay on pixel edges
+        content = [
+            f"q {scale:.10f} 0 0 {-scale:.10f} 0 {height_pt} cm",
+            f"{padding} {padding} {page.width} {page.height} re W n",
+        ]
+        resources = {}
+        for box in page.words:
+            entry = self.words.get(box.word, False)
+            if entry is False:
+                entry = self._add_word(box.word, word_image(box.word))
+            if entry is None:
+                continue
+            name, image_id = entry
+            resources[name] = image_id
+            # Images are drawn bottom up, so flip them back. The edges are set a
+            # hundredth of a pixel inside the word's box: renderers that snap
+            # image edges outwards to whole pixels would otherwise stretch a
+            # word by a pixel whenever rounding puts an edge just outside it
+            x, y = box.x - left, box.y - top
+            content.append(
+                f"q {box.width - 0.02:.2f} 0 0 {0.02 - box.height:.2f} "
+                f"{x + 0.01:.2f} {y + box.height - 0.01:.2f} cm /{name} Do Q"
+            )
+        content.append("Q")
+        self._write_page(width_pt, height_pt, content, resources)
+
+
+class VectorPdfWriter(StreamingPdfWriter):
+    """
+    Writes a PDF one laid-out page at a time, with every word drawn as vector
+    outlines (see `vector_render`).
+
+    A word is written as a form XObject filling its glyphs' outlines the first
+    time a page shows it, and pages place the words they show as
+    `WordPdfWriter` does. The text is drawn at the vector renderer's scale on
+    pages of the profile's size.
+
+    Usage:
+        with VectorPdfWriter(open("book.pdf", "wb"), profile) as writer:
+            for page in vector.iter_page_layouts(text):
+                writer.add_layout_page(page, vector)
+    """
+
+    def __init__(self, fp, profile: PdfProfile, close_fp=True):
+        """
+        Args:
+            fp: A binary file object to write to.
+            profile (PdfProfile): The page format.
+            close_fp (bool, optional): Whether `close` also closes `fp`.
+        """
+        super().__init__(fp, dpi=profile.dpi, close_fp=close_fp)
+        self.profile = profile
+        # word -> (resource name, object id), or None for a blank word
+        self.words = {}
+
+    def _add_word(self, word, vector):
+        """
+        Writes a word's outlines, unless they were written before.
+
+        Returns:
+            tuple or None: The word's (resource name, object id), or None if it
+            has no outlines.
+        """
+        if word in self.words:
+            return self.words[word]
+
+        vector_word = vector.word(word)
+        if not vector_word.shapes:
+            self.words[word] = None
+            return None
+
+        width, height = vector_word.size
+        data = zlib.compress(("0 g\n" + vector.pdf_operators(vector_word)).encode())
+        form_id = self._reserve_id()
+        self._write_object(
+            form_id,
+            (
+                f"<< /Type /XObject /Subtype /Form /BBox [0 0 {width} {height}] "
+                f"/Filter /FlateDecode /Length {len(data)} >>"
+            ).encode(),
+            data,
+        )
+
+        entry = self.words[word] = (f"W{len(self.words)}", form_id)
+        return entry
+
+    def add_layout_page(self, page, vector):
+        """
+        Adds a page showing a laid-out page of words, placed as `fit_page`
+        places the rendered page.
+
+        Args:
+            page (PageLayout): The page to add, laid out at scale 1.
+            vector (VectorRenderer): Provides the words' outlines and the scale
+                to draw them at.
+        """
+        scale = vector.scale
+        padding = self.profile.padding
+        width, height = page_size(
+            (page.width * scale, page.height * scale), self.profile
+        )
+        left, top = page.crop[0], page.crop[1]
+        pt = 72 / self.dpi
+        width_pt = f"{width * pt:.4f}"
+        height_pt = f"{height * pt:.4f}"
+
+        # Drawn in pixels from the top left of the page, then in the layout's
+        # unscaled pixels from the top left of its crop box
+        content = [
+            f"q {pt:.10f} 0 0 {-pt:.10f} 0 {height_pt} cm",
+            f"{padding} {padding} {page.width * scale:.4f} "
+            f"{page.height * scale:.4f} re W n",
+            f"{scale:.10f} 0 0 {scale:.10f} {padding - left * scale:.4f} "
+            f"{padding - top * scale:.4f} cm",
+        ]
+        resources = {}
+        for box in page.words:
+            entry = self.words.get(box.word, False)
+            if entry is False:
+                entry = self._add_word(box.word, vector)
+            if entry is None:
+                continue
+            name, form_id = entry
+            resources[name] = form_id
+            content.append(f"q 1 0 0 1 {box.x} {box.y} cm /{name} Do Q")
+        content.append("Q")
+        self._write_page(width_pt, height_pt, content, resources)
+
+
+def export_pdf(pages, path, profile=DEFAULT_PROFILE, bits=8):
+    """
+    Writes rendered pages to a PDF, one page at a time.
+
+    Args:
+        pages (iterable): Rendered pages, e.g. from `GlyphRenderer.iter_pages`.
+        path (str or file): Where to write the PDF, or a binary file object to
+            write it to (which is left open).
+        profile (str or PdfProfile, optional): The page format. Defaults to "kindle".
+        bits (int, optional): 8 for grayscale, 1 for black-and-white pages.
+
+    Returns:
+        int: The number of pages written.
+    """
+    profile = get_profile(profile)
+    with _open_writer(path, profile, bits, "raster") as writer:
+        for page in pages:
+            with instrumentation.timer("export"):
+                writer.add_page(fit_page(page, profile, bits))
+            instrumentation.count("pages_exported")
+        return len(writer.page_ids)
+
+
+def export_pdf_words(page_layouts, word_image, path, profile=DEFAULT_PROFILE, bits=8):
+    """
+    Writes laid-out pages to a PDF, embedding each distinct word once.
+
+    Args:
+        page_layouts (iterable): PageLayouts, e.g. from
+            `GlyphRenderer.iter_page_layouts`.
+        word_image (callable): Maps a word to its transparent-background image
+            or coverage mask.
+        path (str or file): Where to write the PDF, see `export_pdf`.
+        profile (str or PdfProfile, optional): The page format. Defaults to "kindle".
+        bits (int, optional): 8 for grayscale, 1 for black-and-white words.
+
+    Returns:
+        int: The number of pages written.
+    """
+    profile = get_profile(profile)
+    with _open_writer(path, profile, bits, "words") as writer:
+        for page in page_layouts:
+            with instrumentation.timer("export"):
+                writer.add_layout_page(page, word_image)
+            instrumentation.count("pages_exported")
+        return len(writer.page_ids)
+
+
+def export_pdf_vector(page_layouts, vector, path, profile=DEFAULT_PROFILE):
+    """
+    Writes laid-out pages to a PDF, with each distinct word embedded once as
+    vector outlines.
+
+    Args:
+        page_layouts (iterable): PageLayouts at scale 1, e.g. from
+            `VectorRenderer.iter_page_layouts`.
+        vector (VectorRenderer): Draws the words.
+        path (str or file): Where to write the PDF, see `export_pdf`.
+        profile (str or PdfProfile, optional): The page format. Defaults to "kindle".
+
+    Returns:
+        int: The number of pages written.
+    """
+    profile = get_profile(profile)
+    with _open_writer(path, profile, 8, "vector") as writer:
+        for page in page_layouts:
+            with instrumentation.timer("export"):
+                writer.add_layout_page(page, vector)
+            instrumentation.count("pages_exported")
+        return len(writer.page_ids)
+
+
+def _open_writer(path, profile, bits, backend):
+    if isinstance(path, (str, os.PathLike)):
+        fp, close_fp = open(path, "wb"), True
+    else:
+        fp, close_fp = path, False
+    if backend == "words":
+        return WordPdfWriter(fp, profile, bits, close_fp=close_fp)
+    if backend == "vector":
+        return VectorPdfWriter(fp, profile, close_fp=close_fp)
+    return StreamingPdfWriter(fp, dpi=profile.dpi, close_fp=close_fp)
+
+
+def check_backend(backend):
+    if backend not in BACKENDS:
+        raise ValueError(
+            f"Unknown PDF backend '{backend}', expected one of {', '.join(BACKENDS)}"
+        )
+    return backend
+
+
+def render_pdf(
+    engine,
+    source,
+    path,
+    profile=DEFAULT_PROFILE,
+    bits=8,
+    backend=DEFAULT_BACKEND,
+):
+    """
+    Renders text straight into a PDF laid out for a profile.
+
+    Args:
+        engine (OrthicEngine): The engine to render with.
+        source (str or iterable): The text, or an iterable of text chunks such as
+            an open file.
+        path (str or file): Where to write the PDF, see `export_pdf`.
+        profile (str or PdfProfile, optional): The page format. Defaults to "kindle".
+        bits (int, optional): 8 for grayscale, 1 for black-and-white pages.
+            Vector pages are always drawn in black on white.
+        backend (str, optional): "raster" embeds every page as an image, "words"
+            embeds each distinct word once, and "vector" embeds each distinct
+            word once as outlines. Defaults to "raster".
+
+    Returns:
+        int: The number of pages written.
+    """
+    profile = get_profile(profile)
+    settings = engine.render_settings(**profile.render_settings())
+    if check_backend(backend) == "vector":
+        vector = engine.vector_renderer()
+        page_layouts = vector.iter_page_layouts(source, **settings)
+        return export_pdf_vector(page_layouts, vector, path, profile)
+    if backend == "words":
+        renderer = engine.renderer
+        page_layouts = renderer.iter_page_layouts(source, **settings)
+        return export_pdf_words(
+            page_layouts,
+            lambda word: renderer.compose_word(word)[1],
+            path,
+            profile,
+            bits,
+        )
+    pages = engine.iter_pages(source, **profile.render_settings())
+    return export_pdf(pages, path, profile, bits)
+
+
+def render_pdfs(engine, source, targets, bits=8, backend=DEFAULT_BACKEND):
+    """
+    Renders text into PDFs for several page formats from a single layout.
+
+    The text is laid out once, with the first target's profile, and every PDF
+    gets the same lines and pages. Each is drawn at its own profile's resolution
+    by a renderer of the matching scale (see `OrthicEngine.scaled_renderer`):
+    a profile with 1.5 times the DPI of the first gets glyphs resampled to 1.5
+    times the size (or, with the "vector" backend, outlines drawn 1.5 times as
+    large), so the text has the same physical size on every device.
+
+    Args:
+        engine (OrthicEngine): The engine to render with.
+        source (str or iterable): The text, or an iterable of text chunks such as
+            an open file.
+        targets (list): (path, profile) for each PDF, see `render_pdf`.
+        bits (int, optional): 8 for grayscale, 1 for black-and-white pages.
+        backend (str, optional): See `render_pdf`.
+
+    Returns:
+        int: The number of pages written to each PDF.
+    """
+    check_backend(backend)
+    targets = [(path, get_profile(profile)) for path, profile in targets]
+    if not targets:
+        raise ValueError("No PDFs to render")
+    layout_profile = targets[0][1]
+    settings = engine.render_settings(**layout_profile.render_settings())
+    base = engine.renderer
+    scales = [base.scale * profile.dpi / layout_profile.dpi for _, profile in targets]
+    if backend == "vector":
+        vector = engine.vector_renderer()
+        renderers = [vector.scaled(scale) for scale in scales]
+        page_layouts = vector.iter_page_layouts(source, **settings)
+    else:
+        renderers = [engine.scaled_renderer(scale) for scale in scales]
+        page_layouts = base.layout_renderer.iter_page_layouts(source, **settings)
+
+    with contextlib.ExitStack() as stack:
+        writers = [
+            stack.enter_context(_open_writer(path, profile, bits, backend))
+            for path, profile in targets
+        ]
+        for page in page_layouts:
+            for writer, renderer, (_, profile) in zip(writers, renderers, targets):
+                if backend == "vector":
+                    # Outlines are scaled as they are drawn
+                    with instrumentation.timer("export"):
+                        writer.add_layout_page(page, renderer)
+                elif backend == "words":
+                    with instrumentation.timer("export"):
+                        writer.add_layout_page(
+                            renderer.scale_page(page),
+                            lambda word: renderer.compose_word(word)[1],
+                        )
+                else:
+                    image = renderer.render_page(renderer.scale_page(page))
+                    with instrumentation.timer("export"):
+                        writer.add_page(fit_page(image, profile, bits))
+                instrumentation.count("pages_exported")
+        return len(writers[0].page_ids)
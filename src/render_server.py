@@ -0,0 +1,565 @@
+"""
+A long-running render server.
+
+The server keeps one warm `OrthicEngine` in memory: the glyphs, the encoder memo
+and the word cache. It answers render and encode requests over HTTP on
+localhost or on a Unix socket. Connections are handled on an asyncio event
+loop, and the encoding and rasterising run on a thread pool that shares the
+engine.
+
+Endpoints (request and response bodies are JSON unless noted):
+    POST /render   {"text": ..., "format": "png" | "svg" | "pdf" | "layout", ...}
+                   PNG and SVG: optional "page" (1-based) and the layout
+                   settings "space_width", "line_height", "line_width" and
+                   "lines_per_page". The page count is returned in the
+                   X-Page-Count header. SVG pages are drawn from the glyph
+                   outlines, see `vector_render`.
+                   PDF: optional "profile", "bits" and "backend", see
+                   `pdf_export`.
+                   Layout: the same settings as PNG; returns `TextLayout.to_dict`.
+    POST /encode   {"text": ..., "names": false}; returns {"words": [...]} with
+                   one `EncodedWords.record` per word.
+    GET  /symbols  The glyph names, indexed by glyph ID.
+    GET  /stats    Request, batch and word cache counters (in memory and on
+                   disk).
+    GET  /health   {"status": "ok"}
+
+Encode requests that arrive while an encode is running are batched into one
+`encode_many` call. At most `max_pending` jobs may be queued or running at
+once. Further requests are refused with 503 and a Retry-After header instead
+of piling up.
+
+Usage:
+    python3 src/main.py serve --port 8765
+    python3 src/main.py serve --unix /tmp/text2orthic.sock
+
+    client = RenderClient(port=8765)
+    png = client.render("hello, world.")
+"""
+
+import asyncio
+import http.client
+import io
+import json
+import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import pdf_export
+from orthic_engine import get_engine
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 64
+MAX_BODY_BYTES = 16 * 1024 * 1024
+READ_TIMEOUT = 30
+
+LAYOUT_SETTINGS = ("space_width", "line_height", "line_width", "lines_per_page")
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class EncodeBatcher:
+    """
+    Encodes the texts of concurrent requests together.
+
+    While one batch is being encoded on the pool, new requests queue up. They
+    are then encoded together as the next batch, so every distinct word is
+    encoded only once per batch.
+    """
+
+    def __init__(self, engine, executor, max_batch=64):
+        self.engine = engine
+        self.executor = executor
+        self.max_batch = max_batch
+        self.batches = 0
+        self.queue = asyncio.Queue()
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+
+    async def encode(self, words, names=False):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((words, names, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            results = await loop.run_in_executor(
+                self.executor, self._encode_batch, batch
+            )
+            self.batches += 1
+            for (_, _, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _encode_batch(self, batch):
+        try:
+            encoded = self.engine.encoder.encode_many(
+                word for words, _, _ in batch for word in words
+            )
+        except Exception as error:
+            if len(batch) == 1:
+                return [error]
+            # Don't fail the whole batch for one request's words
+            return [self._encode_batch([request])[0] for request in batch]
+
+        results = []
+        start = 0
+        for words, names, _ in batch:
+            end = start + len(words)
+            results.append([encoded.record(i, names) for i in range(start, end)])
+            start = end
+        return results
+
+
+class RenderServer:
+    """
+    Serves an engine over HTTP. See the module docstring for the endpoints.
+    """
+
+    def __init__(self, engine=None, workers=None, max_pending=DEFAULT_MAX_PENDING):
+        """
+        Args:
+            engine (OrthicEngine, optional): The engine to serve. Defaults to the
+                process-wide engine.
+            workers (int, optional): Number of threads rendering and encoding.
+                Defaults to the number of CPUs.
+            max_pending (int, optional): How many jobs may be queued or running
+                before requests are refused.
+        """
+        self.engine = engine if engine is not None else get_engine()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.requests = 0
+        self.rejected = 0
+        self.batcher = None
+        self.server = None
+        self.routes = {
+            ("POST", "/render"): self.render,
+            ("POST", "/encode"): self.encode,
+            ("GET", "/symbols"): self.symbols,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/health"): self.health,
+        }
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """
+        Starts listening on `host`:`port`, or on the Unix socket `unix_path`.
+
+        Returns:
+            asyncio.Server: The listening server.
+        """
+        self.batcher = EncodeBatcher(self.engine, self.executor)
+        self.batcher.start()
+        if unix_path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, unix_path)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.batcher is not None and self.batcher.task is not None:
+            self.batcher.task.cancel()
+        self.executor.shutdown(wait=False)
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                response = await self._respond(reader)
+            except asyncio.TimeoutError:
+                return
+            except HttpError as error:
+                response = _error_response(error.status, str(error), error.headers)
+            except Exception as error:
+                response = _error_response(
+                    HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(error).__name__}: {error}"
+                )
+            await self._write_response(writer, *response)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, reader):
+        method, path, body = await asyncio.wait_for(
+            self._read_request(reader), READ_TIMEOUT
+        )
+        handler = self.routes.get((method, path))
+        if handler is None:
+            if any(route_path == path for _, route_path in self.routes):
+                status = HTTPStatus.METHOD_NOT_ALLOWED
+            else:
+                status = HTTPStatus.NOT_FOUND
+            raise HttpError(status, f"No route for {method} {path}")
+        self.requests += 1
+        return await handler(self._parse_json(body))
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        try:
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, target.split("?", 1)[0], body
+
+    async def _write_response(self, writer, status, content_type, content, headers):
+        status = HTTPStatus(status)
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(content)}",
+            "Connection: close",
+            *(f"{name}: {value}" for name, value in headers.items()),
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + content)
+        await writer.drain()
+
+    def _parse_json(self, body):
+        if not body:
+            return {}
+        try:
+            payload = json.loads(body)
+        except (ValueError, RecursionError):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON") from None
+        if not isinstance(payload, dict):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Body must be a JSON object")
+        return payload
+
+    async def _run_job(self, job, *args):
+        # Backpressure: refuse instead of queueing without bound
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HttpError(
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                "Too many pending requests",
+                {"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await job(*args)
+        finally:
+            self.pending -= 1
+
+    async def _in_executor(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def render(self, payload):
+        text = _get_text(payload)
+        output_format = payload.get("format", "png")
+        if output_format == "pdf":
+            try:
+                profile = pdf_export.get_profile(
+                    payload.get("profile", pdf_export.DEFAULT_PROFILE)
+                )
+            except ValueError as error:
+                raise HttpError(HTTPStatus.BAD_REQUEST, str(error)) from None
+            bits = payload.get("bits", 8)
+            if not _is_int(bits) or bits not in (1, 8):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "'bits' must be 1 or 8")
+            try:
+                backend = pdf_export.check_backend(
+                    payload.get("backend", pdf_export.DEFAULT_BACKEND)
+                )
+            except ValueError as error:
+                raise HttpError(HTTPStatus.BAD_REQUEST, str(error)) from None
+            content = await self._run_job(
+                self._in_executor, self._render_pdf, text, profile, bits, backend
+            )
+            return HTTPStatus.OK, "application/pdf", content, {}
+
+        settings = _get_settings(payload)
+        if output_format == "layout":
+            layout = await self._run_job(
+                self._in_executor, self._layout, text, settings
+            )
+            content = json.dumps(layout.to_dict()).encode()
+            return HTTPStatus.OK, "application/json", content, {}
+
+        if output_format in ("png", "svg"):
+            page = payload.get("page", 1)
+            if not _is_int(page) or page < 1:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "'page' must be 1 or more")
+            if output_format == "svg":
+                render_page, content_type = self._render_svg, "image/svg+xml"
+            else:
+                render_page, content_type = self._render_png, "image/png"
+            content, page_count = await self._run_job(
+                self._in_executor, render_page, text, settings, page
+            )
+            return (
+                HTTPStatus.OK,
+                content_type,
+                content,
+                {"X-Page-Count": str(page_count)},
+            )
+
+        raise HttpError(
+            HTTPStatus.BAD_REQUEST, "'format' must be 'png', 'svg', 'pdf' or 'layout'"
+        )
+
+    async def encode(self, payload):
+        words = _get_text(payload).split()
+        names = bool(payload.get("names", False))
+        records = await self._run_job(self.batcher.encode, words, names)
+        content = json.dumps({"words": records}, ensure_ascii=False).encode()
+        return HTTPStatus.OK, "application/json", content, {}
+
+    async def symbols(self, payload):
+        content = json.dumps(self.engine.encoder.symbols).encode()
+        return HTTPStatus.OK, "application/json", content, {}
+
+    async def stats(self, payload):
+        content = json.dumps(
+            {
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "pending": self.pending,
+                "encode_batches": self.batcher.batches if self.batcher else 0,
+                "word_cache": self.engine.cache_stats(),
+                "disk_cache": self.engine.disk_cache_stats(),
+            }
+        ).encode()
+        return HTTPStatus.OK, "application/json", content, {}
+
+    async def health(self, payload):
+        return HTTPStatus.OK, "application/json", b'{"status": "ok"}', {}
+
+    def _layout(self, text, settings):
+        return self.engine.renderer.layout_text(
+            text, **self.engine.render_settings(**settings)
+        )
+
+    def _render_png(self, text, settings, page):
+        renderer = self.engine.renderer
+        layout = renderer.layout_text(text, **self.engine.render_settings(**settings))
+        _check_page(page, layout)
+        buffer = io.BytesIO()
+        renderer.render_page(layout.pages[page - 1]).save(buffer, format="PNG")
+        return buffer.getvalue(), len(layout.pages)
+
+    def _render_svg(self, text, settings, page):
+        vector = self.engine.vector_renderer()
+        layout = vector.layout_text(text, **self.engine.render_settings(**settings))
+        _check_page(page, layout)
+        return vector.page_svg(layout.pages[page - 1]).encode(), len(layout.pages)
+
+    def _render_pdf(self, text, profile, bits, backend):
+        if backend == "vector":
+            vector = self.engine.vector_renderer()
+            layout = vector.layout_text(text, **profile.render_settings())
+            buffer = io.BytesIO()
+            pdf_export.export_pdf_vector(layout.pages, vector, buffer, profile)
+            return buffer.getvalue()
+        renderer = self.engine.renderer
+        layout = renderer.layout_text(text, **profile.render_settings())
+        buffer = io.BytesIO()
+        if backend == "words":
+            pdf_export.export_pdf_words(
+                layout.pages,
+                lambda word: renderer.compose_word(word)[1],
+                buffer,
+                profile,
+                bits,
+            )
+            return buffer.getvalue()
+        pdf_export.export_pdf(
+            (renderer.render_page(page) for page in layout.pages),
+            buffer,
+            profile,
+            bits,
+        )
+        return buffer.getvalue()
+
+
+def _error_response(status, message, headers=None):
+    content = json.dumps({"error": message}).encode()
+    return status, "application/json", content, headers or {}
+
+
+def _check_page(page, layout):
+    if page > len(layout.pages):
+        raise HttpError(
+            HTTPStatus.BAD_REQUEST,
+            f"'page' is {page}, but the text has {len(layout.pages)} pages",
+        )
+
+
+def _is_int(value):
+    # JSON true and false come out as bools, which are ints to isinstance
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _get_text(payload):
+    text = payload.get("text")
+    if not isinstance(text, str):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "'text' must be a string")
+    return text
+
+
+def _get_settings(payload):
+    settings = {}
+    for name in LAYOUT_SETTINGS:
+        if name in payload:
+            value = payload[name]
+            if not _is_int(value) or value <= 0:
+                raise HttpError(
+                    HTTPStatus.BAD_REQUEST, f"'{name}' must be a positive integer"
+                )
+            settings[name] = value
+    return settings
+
+
+def run(
+    host=DEFAULT_HOST,
+    port=DEFAULT_PORT,
+    unix_path=None,
+    workers=None,
+    max_pending=DEFAULT_MAX_PENDING,
+    engine=None,
+):
+    """
+    Runs a render server until interrupted.
+    """
+    server = RenderServer(engine, workers, max_pending)
+    # Decode every glyph up front so that the first request is as fast as any
+    server.engine.atlas.preload()
+
+    async def serve():
+        listener = await server.start(host, port, unix_path)
+        where = unix_path or "http://{}:{}".format(*listener.sockets[0].getsockname())
+        print(f"Serving on {where}", flush=True)
+        try:
+            await listener.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if unix_path is not None and os.path.exists(unix_path):
+            os.remove(unix_path)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """An HTTPConnection over a Unix socket."""
+
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class RenderClient:
+    """
+    A minimal client for a render server, over TCP or a Unix socket.
+
+    Methods raise `HttpError` if the server answers with an error.
+    """
+
+    def __init__(
+        self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, timeout=60
+    ):
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None):
+        """
+        Returns:
+            tuple: (status, headers, body) of the response.
+        """
+        if self.unix_path is not None:
+            connection = UnixHTTPConnection(self.unix_path, self.timeout)
+        else:
+            connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        try:
+            body = json.dumps(payload).encode() if payload is not None else None
+            headers = {"Content-Type": "application/json"} if body else {}
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            connection.close()
+
+    def _call(self, method, path, payload=None):
+        status, headers, body = self.request(method, path, payload)
+        if status != HTTPStatus.OK:
+            try:
+                message = json.loads(body)["error"]
+            except (ValueError, KeyError):
+                message = body.decode(errors="replace")
+            raise HttpError(status, message, headers)
+        return headers, body
+
+    def render(self, text, format="png", **params):
+        """
+        Returns:
+            bytes or dict: The PNG, SVG or PDF file, or the layout.
+        """
+        _, body = self._call(
+            "POST", "/render", {"text": text, "format": format, **params}
+        )
+        return json.loads(body) if format == "layout" else body
+
+    def encode(self, text, names=False):
+        """
+        Returns:
+            list: One record per word, see `EncodedWords.record`.
+        """
+        _, body = self._call("POST", "/encode", {"text": text, "names": names})
+        return json.loads(body)["words"]
+
+    def symbols(self):
+        return json.loads(self._call("GET", "/symbols")[1])
+
+    def stats(self):
+        return json.loads(self._call("GET", "/stats")[1])
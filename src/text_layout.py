@@ -0,0 +1,337 @@
+"""
+Text layout: where every word of a text goes, as plain data.
+
+Laying out needs only the size of each word (and where its visible pixels
+are), not its pixels, so a layout can be computed without rasterising
+anything. `GlyphRenderer.render_layout` then draws each page once at its final
+size. A layout can also be mapped to another scale (`scale_page`), so that a
+text laid out once is drawn at several resolutions with the same line and page
+breaks.
+"""
+
+import math
+from typing import Iterable, Iterator, List
+
+
+class WordBox:
+    """
+    A word placed on a page.
+
+    Attributes:
+        word (str): The word.
+        x (int): Left edge of the word image, in page canvas coordinates.
+        y (int): Top edge of the word image, in page canvas coordinates.
+        width (int): Width of the word image.
+        height (int): Height of the word image.
+        ink (tuple or None): Bounding box of the visible pixels, relative to the
+            word image, or None if the word image is blank.
+    """
+
+    __slots__ = ("word", "x", "y", "width", "height", "ink")
+
+    def __init__(self, word, x, y, width, height, ink):
+        self.word = word
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.ink = ink
+
+    @property
+    def box(self):
+        return (self.x, self.y, self.x + self.width, self.y + self.height)
+
+    def to_dict(self):
+        return {
+            "word": self.word,
+            "x": self.x,
+            "y": self.y,
+            "width": self.width,
+            "height": self.height,
+            "ink": list(self.ink) if self.ink else None,
+        }
+
+    def __repr__(self):
+        return f"WordBox(word={self.word!r}, box={self.box})"
+
+
+class PageLayout:
+    """
+    A laid-out page.
+
+    Words are positioned on a page canvas that is `line_width` wide and tall
+    enough for every word; the rendered page is that canvas cropped to `crop`
+    (the bounding box of everything visible), so it is `width` x `height`.
+
+    Attributes:
+        words (list): The WordBoxes on the page, in drawing order.
+        crop (tuple): (left, top, right, bottom) of the rendered page on the canvas.
+    """
+
+    __slots__ = ("words", "crop")
+
+    def __init__(self, words, crop):
+        self.words = words
+        self.crop = crop
+
+    @property
+    def width(self):
+        return self.crop[2] - self.crop[0]
+
+    @property
+    def height(self):
+        return self.crop[3] - self.crop[1]
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    def to_dict(self):
+        return {
+            "width": self.width,
+            "height": self.height,
+            "crop": list(self.crop),
+            "words": [box.to_dict() for box in self.words],
+        }
+
+    def __repr__(self):
+        return f"PageLayout(words={len(self.words)}, size={self.size})"
+
+
+class TextLayout:
+    """
+    The layout of a whole text.
+
+    Attributes:
+        pages (list): The PageLayouts.
+        paginated (bool): Whether `lines_per_page` was finite.
+    """
+
+    __slots__ = ("pages", "paginated")
+
+    def __init__(self, pages, paginated):
+        self.pages = pages
+        self.paginated = paginated
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: The layout as plain JSON-serialisable data.
+        """
+        return {
+            "paginated": self.paginated,
+            "pages": [page.to_dict() for page in self.pages],
+        }
+
+    def __repr__(self):
+        return f"TextLayout(pages={self.pages})"
+
+
+def iter_words(source) -> Iterator[str]:
+    """
+    Splits text into words, reading it incrementally.
+
+    Args:
+        source (str or iterable): The text, or an iterable of text chunks such as
+            an open file (which yields lines). Chunks may end in the middle of a
+            word.
+
+    Yields:
+        str: The whitespace-separated words, in order.
+    """
+    if isinstance(source, str):
+        yield from source.split()
+        return
+
+    pending = ""
+    for chunk in source:
+        chunk = pending + chunk
+        words = chunk.split()
+        # The last word may continue in the next chunk
+        if words and not chunk[-1].isspace():
+            pending = words.pop()
+        else:
+            pending = ""
+        yield from words
+
+    if pending:
+        yield pending
+
+
+def iter_page_layouts(
+    words: Iterable[str],
+    measure,
+    space_width=10,
+    line_height=100,
+    line_width=1300,
+    lines_per_page=float("inf"),
+    visible_ink=None,
+) -> Iterator[PageLayout]:
+    """
+    Lays out words into lines and pages, yielding each page as soon as it is full.
+
+    Words are set left to right, vertically centred on their line's baseline,
+    and wrap to the next line when they would overflow `line_width`.
+
+    Args:
+        words (iterable): The words to lay out.
+        measure (callable): Maps a word to (width, height, ink) of its image,
+            with `ink` as in `WordBox`.
+        visible_ink (callable, optional): Maps a word and a box (in word image
+            coordinates) to the bounding box of the word's visible pixels inside
+            that box, or None. Only called for the rare words that stick out of
+            the page canvas (wider than a line, or taller than two lines), whose
+            clipped extent cannot be derived from `ink` alone. Without it the
+            clipped `ink` box is used, which may be slightly too large.
+        space_width, line_height, line_width, lines_per_page: See
+            `GlyphRenderer.render_text`.
+
+    Yields:
+        PageLayout: The pages, in order. At least one page is always yielded.
+    """
+    placed = []
+    current_line = 1
+    canvas_height = line_height
+    ink = None
+    x, y = 0, line_height
+
+    for word in words:
+        width, height, word_ink = measure(word)
+        if x + width > line_width:
+            x = 0
+            y += line_height
+            current_line += 1
+
+            # paginate
+            if current_line > lines_per_page:
+                yield _finish_page(placed, ink, line_width, canvas_height)
+
+                # start a fresh page
+                placed = []
+                canvas_height = line_height
+                ink = None
+                x, y = 0, line_height
+                current_line = 1
+
+        canvas_height = max(canvas_height, y + height)
+
+        box = WordBox(word, x, y - height // 2, width, height, word_ink)
+        placed.append(box)
+        if word_ink:
+            # Anything right of or above the page canvas is clipped; the canvas
+            # always grows to fit the bottom of every word
+            visible = (
+                max(word_ink[0], -box.x),
+                max(word_ink[1], -box.y),
+                min(word_ink[2], line_width - box.x),
+                word_ink[3],
+            )
+            if visible != word_ink and visible_ink is not None:
+                visible = (
+                    visible_ink(word, visible)
+                    if visible[0] < visible[2] and visible[1] < visible[3]
+                    else None
+                )
+            if visible and visible[0] < visible[2] and visible[1] < visible[3]:
+                ink = union_boxes(
+                    ink,
+                    (
+                        box.x + visible[0],
+                        box.y + visible[1],
+                        box.x + visible[2],
+                        box.y + visible[3],
+                    ),
+                )
+
+        x += width + space_width
+
+    yield _finish_page(placed, ink, line_width, canvas_height)
+
+
+def layout_text(words: Iterable[str], measure, **settings) -> TextLayout:
+    """
+    Lays out a whole text. See `iter_page_layouts` for the arguments.
+
+    Returns:
+        TextLayout: The layout of every page.
+    """
+    pages: List[PageLayout] = list(iter_page_layouts(words, measure, **settings))
+    paginated = settings.get("lines_per_page", float("inf")) != float("inf")
+    return TextLayout(pages, paginated)
+
+
+def scale_page(page: PageLayout, scale, measure) -> PageLayout:
+    """
+    Maps a laid-out page to another scale, keeping its lines and words.
+
+    Word positions are scaled, with each word centred on its scaled baseline,
+    and word sizes come from `measure` at the new scale (rather than from
+    scaling the old ones), so that every WordBox matches the word image drawn
+    at that scale. The crop is the scaled crop, shrunk to the ink of the
+    scaled words.
+
+    Args:
+        page (PageLayout): The page to map.
+        scale (float): Scale of the new page relative to `page`.
+        measure (callable): As for `iter_page_layouts`, at the new scale.
+
+    Returns:
+        PageLayout: The page at the new scale.
+    """
+    crop = (
+        math.floor(page.crop[0] * scale),
+        math.floor(page.crop[1] * scale),
+        math.ceil(page.crop[2] * scale),
+        math.ceil(page.crop[3] * scale),
+    )
+    words = []
+    ink = None
+    for box in page.words:
+        width, height, word_ink = measure(box.word)
+        baseline = box.y + box.height // 2
+        scaled = WordBox(
+            box.word,
+            round(box.x * scale),
+            round(baseline * scale) - height // 2,
+            width,
+            height,
+            word_ink,
+        )
+        words.append(scaled)
+        if word_ink:
+            ink = union_boxes(
+                ink,
+                (
+                    scaled.x + word_ink[0],
+                    scaled.y + word_ink[1],
+                    scaled.x + word_ink[2],
+                    scaled.y + word_ink[3],
+                ),
+            )
+
+    if ink is not None:
+        # Whatever the scaled page clips stays clipped
+        ink = (
+            max(ink[0], crop[0]),
+            max(ink[1], crop[1]),
+            min(ink[2], crop[2]),
+            min(ink[3], crop[3]),
+        )
+        if ink[0] < ink[2] and ink[1] < ink[3]:
+            crop = ink
+    return PageLayout(words, crop)
+
+
+def union_boxes(a, b):
+    """Bounding box of two boxes, either of which may be None."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _finish_page(placed, ink, line_width, canvas_height):
+    # A page without anything visible keeps its full canvas size
+    crop = ink if ink is not None else (0, 0, line_width, canvas_height)
+    return PageLayout(placed, crop)
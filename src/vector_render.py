@@ -0,0 +1,333 @@
+"""
+Vector output: words and pages drawn from the traced glyph outlines.
+
+`VectorRenderer` chains glyph outlines (see `glyph_outlines`) with the same
+anchors, doubled-letter dots and capital marks as `GlyphRenderer` chains glyph
+images (`GlyphRenderer.chain_glyphs`), so every outline lands where the glyph's
+pixels would. Nothing is rasterised or composited: drawing a word is coordinate
+arithmetic, and each distinct word is converted once and then referenced by
+every page that shows it.
+
+Pages come out as SVG documents, or as PDF path operators for
+`pdf_export.VectorPdfWriter`. They print sharply at any size, and a whole book
+is a small file.
+
+Text is laid out at scale 1 as `GlyphRenderer` lays it out, and the scale is
+applied when drawing. The one difference is that words sticking out of the page
+canvas are not rasterised to find their clipped extent (see `visible_ink` in
+`text_layout.iter_page_layouts`), so the crop of such a page may be slightly
+larger than that of the rendered page.
+"""
+
+import threading
+from typing import Iterator
+
+import glyph_outlines
+import text_layout
+from glyph_renderer import GlyphRenderer
+from text_layout import PageLayout, TextLayout
+
+SVG_NAMESPACES = (
+    'xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink"'
+)
+
+
+def format_number(value):
+    """Formats a coordinate with at most two decimals and no trailing zeros."""
+    text = f"{value:.2f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+class VectorWord:
+    """
+    A word as outlines.
+
+    Attributes:
+        size (tuple): Size of the word's image, as `GlyphRenderer` draws it.
+        ink (tuple or None): Bounding box of its visible pixels, or None.
+        shapes (list): The contours of each glyph, dot and mark of the word, in
+            word image coordinates. Each shape is filled on its own with the
+            even-odd rule, so that overlapping glyphs do not cut holes in each
+            other.
+    """
+
+    __slots__ = ("size", "ink", "shapes")
+
+    def __init__(self, size, ink, shapes):
+        self.size = size
+        self.ink = ink
+        self.shapes = shapes
+
+    def __repr__(self):
+        return f"VectorWord(size={self.size}, shapes={len(self.shapes)})"
+
+
+class VectorRenderer:
+    """
+    Renders Orthic shorthand as vector graphics.
+
+    Thread-safe, like the GlyphRenderer it encodes and chains words with.
+    """
+
+    def __init__(self, renderer=None, outlines=None, scale=None, max_words=65536):
+        """
+        Args:
+            renderer (GlyphRenderer, optional): Encodes and chains the words;
+                created if omitted.
+            outlines (OutlineAtlas, optional): The glyph outlines. Defaults to
+                the process-wide outlines of the renderer's glyph folder.
+            scale (float, optional): Draw at this multiple of the size of the
+                glyph PNGs. Outlines scale freely, so this is only a transform
+                of the output. Defaults to the renderer's scale.
+            max_words (int, optional): Number of converted words to keep.
+        """
+        if renderer is None:
+            renderer = GlyphRenderer(cache_bytes=0, progress=None)
+        if outlines is None:
+            outlines = glyph_outlines.get_outlines(renderer.glyph_folder)
+        self.renderer = renderer
+        self.outlines = outlines
+        self.scale = renderer.scale if scale is None else scale
+        self.max_words = max_words
+        self._words = {}
+        self._lock = threading.Lock()
+
+    def scaled(self, scale):
+        """
+        Returns:
+            VectorRenderer: A renderer drawing at another scale, sharing this
+            one's converted words.
+        """
+        other = VectorRenderer(self.renderer, self.outlines, scale, self.max_words)
+        other._words = self._words
+        other._lock = self._lock
+        return other
+
+    def word(self, word: str) -> VectorWord:
+        """
+        Converts a word to outlines, or returns it from the words converted
+        before.
+        """
+        with self._lock:
+            vector_word = self._words.get(word)
+        if vector_word is None:
+            # Converted outside the lock; a word two threads convert at once is
+            # simply stored twice
+            vector_word = self._convert(word)
+            with self._lock:
+                if len(self._words) >= self.max_words:
+                    self._words.clear()
+                self._words[word] = vector_word
+        return vector_word
+
+    def _convert(self, word):
+        renderer = self.renderer
+        glyphs = renderer.encode_word(word)
+        chain, (left, top), size, ink, indicator = renderer.word_geometry(
+            glyphs, self.outlines
+        )
+        placements = [(outline, x - left, y - top) for outline, _, (x, y) in chain]
+        if indicator is not None:
+            mark, (x, y) = indicator
+            placements.append((mark, x, y))
+
+        shapes = []
+        for outline, dx, dy in placements:
+            if outline.contours:
+                shapes.append(
+                    [
+                        [(x + dx, y + dy) for x, y in contour]
+                        for contour in outline.contours
+                    ]
+                )
+        return VectorWord(size, ink, shapes)
+
+    def measure_word(self, word: str):
+        """
+        Computes the size of a word, as `GlyphRenderer.measure_word`.
+
+        Returns:
+            tuple: (width, height, ink).
+        """
+        vector_word = self.word(word)
+        return vector_word.size[0], vector_word.size[1], vector_word.ink
+
+    def layout_text(
+        self,
+        text: str,
+        space_width=10,
+        line_height=100,
+        line_width=1300,
+        lines_per_page=float("inf"),
+    ) -> TextLayout:
+        """
+        Lays out text as `GlyphRenderer.layout_text` does at scale 1.
+
+        Returns:
+            TextLayout: The layout of each page, at scale 1.
+        """
+        return text_layout.layout_text(
+            text.split(),
+            self.measure_word,
+            space_width=space_width,
+            line_height=line_height,
+            line_width=line_width,
+            lines_per_page=lines_per_page,
+        )
+
+    def iter_page_layouts(
+        self,
+        source,
+        space_width=10,
+        line_height=100,
+        line_width=1300,
+        lines_per_page=float("inf"),
+    ) -> Iterator[PageLayout]:
+        """
+        Lays out text page by page, see `GlyphRenderer.iter_page_layouts`.
+
+        Yields:
+            PageLayout: The layout of each page, at scale 1.
+        """
+        return text_layout.iter_page_layouts(
+            text_layout.iter_words(source),
+            self.measure_word,
+            space_width=space_width,
+            line_height=line_height,
+            line_width=line_width,
+            lines_per_page=lines_per_page,
+        )
+
+    def render_text(
+        self,
+        text: str,
+        space_width=10,
+        line_height=100,
+        line_width=1300,
+        lines_per_page=float("inf"),
+    ):
+        """
+        Renders text as SVG, with the arguments of `GlyphRenderer.render_text`.
+
+        Returns:
+            list or str: One SVG document per page if `lines_per_page` is
+            finite, otherwise a single SVG document.
+        """
+        layout = self.layout_text(
+            text,
+            space_width=space_width,
+            line_height=line_height,
+            line_width=line_width,
+            lines_per_page=lines_per_page,
+        )
+        pages = [self.page_svg(page) for page in layout.pages]
+        return pages if layout.paginated else pages[0]
+
+    def iter_pages(self, source, **settings) -> Iterator[str]:
+        """
+        Renders text page by page as SVG, see `GlyphRenderer.iter_pages`.
+
+        Yields:
+            str: An SVG document per page.
+        """
+        for page in self.iter_page_layouts(source, **settings):
+            yield self.page_svg(page)
+
+    def render_word(self, word: str, transparent_background: bool = False):
+        """
+        Renders a word as SVG, the size of `GlyphRenderer.render_word`'s image.
+
+        Returns:
+            str: The SVG document.
+        """
+        vector_word = self.word(word)
+        width, height = vector_word.size
+        body = [f'<g fill-rule="evenodd">{self.svg_paths(vector_word)}</g>']
+        return self._svg_document(width, height, body, transparent_background)
+
+    def page_svg(self, page: PageLayout, transparent_background: bool = False):
+        """
+        Draws a laid-out page as SVG. Each distinct word on the page is defined
+        once and placed with a reference wherever it is shown.
+
+        Args:
+            page (PageLayout): A page laid out at scale 1.
+            transparent_background (bool, optional): Leave out the white
+                background.
+
+        Returns:
+            str: The SVG document, with the page's crop box as its view box.
+        """
+        left, top = page.crop[0], page.crop[1]
+        names = {}
+        definitions = []
+        uses = []
+        for box in page.words:
+            name = names.get(box.word)
+            if name is None:
+                vector_word = self.word(box.word)
+                name = names[box.word] = f"w{len(names)}" if vector_word.shapes else ""
+                if name:
+                    definitions.append(
+                        f'<g id="{name}">{self.svg_paths(vector_word)}</g>'
+                    )
+            if name:
+                uses.append(
+                    f'<use xlink:href="#{name}" x="{box.x - left}" y="{box.y - top}"/>'
+                )
+
+        body = []
+        if definitions:
+            body.append("<defs>" + "\n".join(definitions) + "</defs>")
+            body.append('<g fill-rule="evenodd">\n' + "\n".join(uses) + "\n</g>")
+        return self._svg_document(page.width, page.height, body, transparent_background)
+
+    def _svg_document(self, width, height, body, transparent_background):
+        lines = [
+            f"<svg {SVG_NAMESPACES} "
+            f'width="{format_number(width * self.scale)}" '
+            f'height="{format_number(height * self.scale)}" '
+            f'viewBox="0 0 {width} {height}">'
+        ]
+        if not transparent_background:
+            lines.append(f'<rect width="{width}" height="{height}" fill="#fff"/>')
+        lines.extend(body)
+        lines.append("</svg>\n")
+        return "\n".join(lines)
+
+    @staticmethod
+    def svg_paths(vector_word: VectorWord):
+        """
+        Returns:
+            str: A `<path>` element per shape of the word, in word image
+            coordinates.
+        """
+        paths = []
+        for shape in vector_word.shapes:
+            data = "".join(
+                "M"
+                + " ".join(f"{format_number(x)} {format_number(y)}" for x, y in contour)
+                + "Z"
+                for contour in shape
+            )
+            paths.append(f'<path d="{data}"/>')
+        return "".join(paths)
+
+    @staticmethod
+    def pdf_operators(vector_word: VectorWord):
+        """
+        Returns:
+            str: PDF path construction and even-odd fill operators drawing the
+            word, in word image coordinates.
+        """
+        operators = []
+        for shape in vector_word.shapes:
+            for contour in shape:
+                (x, y), rest = contour[0], contour[1:]
+                operators.append(f"{format_number(x)} {format_number(y)} m")
+                operators.extend(
+                    f"{format_number(x)} {format_number(y)} l" for x, y in rest
+                )
+                operators.append("h")
+            operators.append("f*")
+        return "\n".join(operators)
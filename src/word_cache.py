@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def image_nbytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class WordCache:
+    """
+    A bounded LRU cache of rendered words.
+
+    Entries are keyed on the exact word string (capitalisation and punctuation
+    change the output) and hold the encoded glyphs together with the rendered
+    transparent-background image. The cache is bounded by the total number of
+    image bytes it holds; the least recently used words are evicted first.
+    Cached images are shared, so callers must not draw on them.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, word):
+        return word in self._entries
+
+    def get(self, word):
+        """
+        Looks up a word, marking it as recently used.
+
+        Returns:
+            tuple or None: (glyphs, image) if the word is cached, otherwise None.
+        """
+        with self._lock:
+            entry = self._entries.get(word)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(word)
+            self.hits += 1
+            return entry
+
+    def put(self, word, glyphs, image):
+        """
+        Stores a rendered word, evicting the least recently used words as needed.
+        Words larger than the whole budget are not stored.
+        """
+        nbytes = image_nbytes(image)
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._entries.pop(word, None)
+            if old is not None:
+                self.current_bytes -= image_nbytes(old[1])
+
+            self._entries[word] = (glyphs, image)
+            self.current_bytes += nbytes
+
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= image_nbytes(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops all entries. The counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit, miss and eviction counters, hit rate, and current size.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live flat in src/, as the scripts and benchmarks expect
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
@@ -0,0 +1,43 @@
+"""
+Checks the trie tokenizer against a golden corpus.
+
+`data/encoder_golden.json` holds the output of the tokenizer `encode_word` had
+before the prefix trie (commit 73a442d^): for every word of
+resources/demo_texts.txt and a set of edge cases, the glyphs as
+[symbol, capital, double]. The file records that behaviour and must not be
+regenerated from the current encoder. The one exception are words ending in
+"ea", "ae" or "ia" drawn over the line (e.g. "idea"), on which the old
+tokenizer raised IndexError; they hold the plain `ea_over`/`ia_over` glyph.
+"""
+
+import json
+import os
+
+import pytest
+
+from orthic_encoder import OrthicEncoder
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "data", "encoder_golden.json")
+
+with open(GOLDEN_PATH, encoding="utf-8") as f:
+    GOLDEN = json.load(f)
+
+
+@pytest.fixture(scope="module")
+def encoder():
+    return OrthicEncoder()
+
+
+def test_golden_covers_demo_texts():
+    demo_path = os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "resources", "demo_texts.txt"
+    )
+    with open(demo_path, encoding="utf-8") as f:
+        words = set(f.read().split())
+    assert words <= set(GOLDEN)
+
+
+@pytest.mark.parametrize("word", sorted(GOLDEN))
+def test_encode_word_matches_golden(encoder, word):
+    glyphs = encoder.encode_word(word)
+    assert [[g.symbol, g.capital, g.double] for g in glyphs] == GOLDEN[word]
@@ -0,0 +1,74 @@
+"""
+Checks the outline tracing and the staleness check of the outlines file.
+"""
+
+import os
+import shutil
+
+import pytest
+from PIL import Image, ImageDraw
+
+import glyph_outlines
+
+GLYPHS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "glyphs"
+)
+
+
+def test_trace_square():
+    mask = Image.new("L", (10, 10), 0)
+    ImageDraw.Draw(mask).rectangle((2, 3, 6, 7), fill=255)
+    (contour,) = glyph_outlines.trace(mask)
+    # Half coverage runs halfway between the inked and the blank pixel centres
+    xs = [x for x, _ in contour]
+    ys = [y for _, y in contour]
+    assert (min(xs), max(xs), min(ys), max(ys)) == (2, 7, 3, 8)
+    # The straight sides are simplified away, down to the corners
+    assert len(contour) <= 8
+
+
+def test_trace_ring_has_a_hole():
+    mask = Image.new("L", (12, 12), 0)
+    ImageDraw.Draw(mask).rectangle((1, 1, 10, 10), fill=255)
+    ImageDraw.Draw(mask).rectangle((4, 4, 7, 7), fill=0)
+    assert len(glyph_outlines.trace(mask)) == 2
+
+
+def test_simplify_keeps_only_needed_points():
+    square = [(0, 0), (1, 0.05), (2, 0), (2, 1), (2, 2), (1, 2), (0, 2), (0, 1)]
+    assert glyph_outlines.simplify(square, 0.2) == [(0, 0), (2, 0), (2, 2), (0, 2)]
+    assert len(glyph_outlines.simplify(square, 0.01)) == 5
+
+
+@pytest.fixture
+def glyph_folder(tmp_path):
+    folder = tmp_path / "glyphs"
+    folder.mkdir()
+    for name in os.listdir(GLYPHS):
+        if name.endswith(".png"):
+            shutil.copy2(os.path.join(GLYPHS, name), folder / name)
+    glyph_outlines.build_outlines(folder)
+    return folder
+
+
+def test_load_outlines(glyph_folder):
+    outlines = glyph_outlines.load_outlines(glyph_folder)
+    assert outlines is not None
+    assert set(outlines) == set(glyph_outlines.OutlineAtlas(glyph_folder).symbols())
+
+
+def test_load_outlines_is_none_once_a_glyph_changes(glyph_folder):
+    path = glyph_folder / "a.png"
+    with Image.open(path) as image:
+        image = image.copy()
+    ImageDraw.Draw(image).point((0, 0), fill=(0, 0, 0, 255))
+    image.save(path)
+    assert glyph_outlines.load_outlines(glyph_folder) is None
+
+
+def test_load_outlines_survives_a_touch(glyph_folder):
+    # A newer mtime alone does not change the glyphs
+    path = glyph_folder / "a.png"
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert glyph_outlines.load_outlines(glyph_folder) is not None
@@ -0,0 +1,104 @@
+"""
+Checks the NumPy glyph preprocessing of `glyph_atlas` against the per-pixel
+implementation it replaced, on every glyph PNG.
+"""
+
+import os
+
+import pytest
+from PIL import Image
+
+import glyph_atlas
+
+GLYPH_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src", "glyphs")
+GLYPH_FILES = sorted(name for name in os.listdir(GLYPH_FOLDER) if name.endswith(".png"))
+
+
+# The reference implementation: getpixel/putpixel loops, as before NumPy
+
+
+def reference_convert_grayscale_to_alpha(img):
+    img = img.convert("RGBA")
+
+    for y in range(img.height):
+        for x in range(img.width):
+            r, g, b, _ = img.getpixel((x, y))
+
+            # Skip red and green pixels
+            if (r, g, b) == (255, 0, 0) or (r, g, b) == (0, 255, 0):
+                continue
+
+            # Convert grayscale to alpha
+            grayscale = int(0.299 * r + 0.587 * g + 0.114 * b)
+            alpha = 255 - grayscale
+            img.putpixel((x, y), (0, 0, 0, alpha))
+
+    return img
+
+
+def reference_find_glyph_start_end_positions(img):
+    start_position = end_position = None
+    for y in range(img.height):
+        for x in range(img.width):
+            pixel = img.getpixel((x, y))
+            if pixel == (0, 255, 0, 255):  # Green pixel
+                start_position = (x, y)
+            elif pixel == (255, 0, 0, 255):  # Red pixel
+                end_position = (x, y)
+    return start_position, end_position
+
+
+def reference_find_alignment_pixels(img):
+    return [
+        (x, y)
+        for y in range(img.height)
+        for x in range(img.width)
+        if img.getpixel((x, y))[0:3] in ((0, 255, 0), (255, 0, 0))
+    ]
+
+
+def reference_replace_alignment_pixels(canvas, color=(0, 0, 0)):
+    for y in range(canvas.height):
+        for x in range(canvas.width):
+            pixel = canvas.getpixel((x, y))
+            if pixel[0:3] == (0, 255, 0) or pixel[0:3] == (255, 0, 0):
+                canvas.putpixel((x, y), color)
+
+    return canvas
+
+
+@pytest.fixture(params=GLYPH_FILES)
+def glyph_png(request):
+    with Image.open(os.path.join(GLYPH_FOLDER, request.param)) as img:
+        img.load()
+        return img
+
+
+def test_glyph_folder_is_not_empty():
+    assert GLYPH_FILES
+
+
+def test_convert_grayscale_to_alpha(glyph_png):
+    expected = reference_convert_grayscale_to_alpha(glyph_png.copy())
+    image = glyph_atlas.convert_grayscale_to_alpha(glyph_png.copy())
+    assert image.mode == expected.mode
+    assert image.size == expected.size
+    assert image.tobytes() == expected.tobytes()
+
+
+def test_anchors_and_alignment_pixels(glyph_png):
+    image = reference_convert_grayscale_to_alpha(glyph_png)
+    assert glyph_atlas.find_glyph_start_end_positions(
+        image
+    ) == reference_find_glyph_start_end_positions(image)
+    assert glyph_atlas.find_alignment_pixels(image) == reference_find_alignment_pixels(
+        image
+    )
+
+
+@pytest.mark.parametrize("color", [(0, 0, 0), (0, 0, 0, 0)])
+def test_replace_alignment_pixels(glyph_png, color):
+    image = reference_convert_grayscale_to_alpha(glyph_png)
+    expected = reference_replace_alignment_pixels(image.copy(), color)
+    replaced = glyph_atlas.replace_alignment_pixels(image.copy(), color)
+    assert replaced.tobytes() == expected.tobytes()
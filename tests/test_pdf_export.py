@@ -0,0 +1,91 @@
+"""
+Checks the "words" and "vector" PDF backends against the "raster" backend by
+rasterising the PDFs.
+"""
+
+import io
+import os
+
+import pytest
+
+import pdf_export
+from orthic_engine import OrthicEngine
+
+pymupdf = pytest.importorskip("pymupdf")
+np = pytest.importorskip("numpy")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Grey levels a rasterised words page may differ from the raster page by
+TOLERANCE = 2
+# Mean grey levels a rasterised vector page may differ from the raster page by;
+# outlines only follow the anti-aliased edges to a fraction of a pixel (about
+# 1.2 to 1.4 on the demo text)
+VECTOR_MEAN_TOLERANCE = 2
+
+
+@pytest.fixture(scope="module")
+def text():
+    with open(os.path.join(ROOT, "resources", "demo_texts.txt"), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = OrthicEngine()
+    engine.renderer.progress = None
+    return engine
+
+
+def render(engine, text, profile, backend):
+    buffer = io.BytesIO()
+    pages = pdf_export.render_pdf(engine, text, buffer, profile, backend=backend)
+    return pages, buffer.getvalue()
+
+
+def rasterise(data, dpi):
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        pages = []
+        for page in document:
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+            pages.append(
+                np.frombuffer(pixmap.samples, np.uint8).reshape(
+                    pixmap.height, pixmap.width
+                )
+            )
+        return pages
+
+
+@pytest.mark.parametrize("profile", sorted(pdf_export.PROFILES))
+def test_words_backend_matches_raster(engine, text, profile):
+    dpi = pdf_export.PROFILES[profile].dpi
+    raster_count, raster = render(engine, text, profile, "raster")
+    words_count, words = render(engine, text, profile, "words")
+
+    assert words_count == raster_count
+    raster_pages = rasterise(raster, dpi)
+    words_pages = rasterise(words, dpi)
+    assert len(words_pages) == len(raster_pages) == raster_count
+    for expected, page in zip(raster_pages, words_pages):
+        assert page.shape == expected.shape
+        difference = np.abs(page.astype(np.int16) - expected.astype(np.int16))
+        assert difference.max() <= TOLERANCE
+
+    assert len(words) < len(raster)
+
+
+@pytest.mark.parametrize("profile", sorted(pdf_export.PROFILES))
+def test_vector_backend_matches_raster(engine, text, profile):
+    dpi = pdf_export.PROFILES[profile].dpi
+    raster_count, raster = render(engine, text, profile, "raster")
+    vector_count, vector = render(engine, text, profile, "vector")
+
+    assert vector_count == raster_count
+    raster_pages = rasterise(raster, dpi)
+    vector_pages = rasterise(vector, dpi)
+    assert len(vector_pages) == len(raster_pages) == raster_count
+    for expected, page in zip(raster_pages, vector_pages):
+        assert page.shape == expected.shape
+        difference = np.abs(page.astype(np.int16) - expected.astype(np.int16))
+        assert difference.mean() <= VECTOR_MEAN_TOLERANCE
+
+    assert len(vector) < len(raster)
@@ -0,0 +1,225 @@
+"""
+Checks the render server: malformed requests get 400, and, end to end over a
+real socket through `RenderClient`, rendering, encode batching and the 503
+backpressure.
+"""
+
+import asyncio
+import io
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from orthic_engine import get_engine
+from render_server import HttpError, RenderClient, RenderServer
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = RenderServer(workers=1)
+    yield server
+    server.executor.shutdown(wait=False)
+
+
+def request(server, raw):
+    """Sends raw bytes to the server's connection handler and parses the reply."""
+
+    async def exchange():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        sent = bytearray()
+
+        class Writer:
+            def write(self, data):
+                sent.extend(data)
+
+            async def drain(self):
+                pass
+
+            def close(self):
+                pass
+
+        await server._handle(reader, Writer())
+        return bytes(sent)
+
+    response = asyncio.run(exchange())
+    head, _, body = response.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    return status, json.loads(body) if body.startswith(b"{") else body
+
+
+def post(server, payload):
+    body = json.dumps(payload).encode()
+    return request(
+        server,
+        b"POST /render HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body),
+    )
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5", b""])
+def test_malformed_content_length(server, length):
+    status, body = request(
+        server, b"POST /render HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}"
+    )
+    assert status == 400
+    assert body["error"] == "Malformed Content-Length"
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"\xff\xfe", b"[" * 100000])
+def test_malformed_json(server, body):
+    status, _ = request(
+        server,
+        b"POST /render HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body),
+    )
+    assert status == 400
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"format": "pdf", "bits": True},
+        {"format": "pdf", "bits": 8.0},
+        {"format": "png", "page": True},
+        {"format": "png", "line_width": True},
+    ],
+)
+def test_bools_are_not_integers(server, payload):
+    status, _ = post(server, {"text": "hello", **payload})
+    assert status == 400
+
+
+def test_valid_request(server):
+    status, body = post(server, {"text": "hello", "format": "pdf", "bits": 1})
+    assert status == 200
+    assert body.startswith(b"%PDF")
+
+
+class RunningServer:
+    """A `RenderServer` listening on an ephemeral port or a Unix socket, on an
+    event loop of its own thread."""
+
+    def __init__(self, unix_path=None, **options):
+        self.server = RenderServer(**options)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        listener = self._call(self.server.start(port=0, unix_path=unix_path))
+        if unix_path is not None:
+            self.client = RenderClient(unix_path=unix_path, timeout=30)
+        else:
+            self.client = RenderClient(
+                port=listener.sockets[0].getsockname()[1], timeout=30
+            )
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(30)
+
+    def block_workers(self):
+        """
+        Occupies the (single) worker thread until the returned event is set, so
+        that jobs arriving meanwhile have to wait.
+        """
+        release = threading.Event()
+        self.server.executor.submit(release.wait, 30)
+        return release
+
+    def wait_for_pending(self, count):
+        deadline = time.monotonic() + 30
+        while self.server.pending < count:
+            assert time.monotonic() < deadline, "requests did not arrive"
+            time.sleep(0.01)
+
+    def close(self):
+        self._call(self.server.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def running(request, tmp_path):
+    unix_path = str(tmp_path / "server.sock") if request.param == "unix" else None
+    running = RunningServer(unix_path, workers=1)
+    yield running
+    running.close()
+
+
+def test_client_render_and_encode(running):
+    client = running.client
+    assert client.request("GET", "/health")[0] == 200
+    assert client.symbols() == get_engine().encoder.symbols
+
+    status, headers, body = client.request(
+        "POST", "/render", {"text": "hello, world.", "lines_per_page": 1}
+    )
+    assert status == 200
+    assert headers["X-Page-Count"] == "1"
+    assert Image.open(io.BytesIO(body)).size[0] > 0
+
+    layout = client.render("hello, world. idea", format="layout")
+    assert [box["word"] for box in layout["pages"][0]["words"]] == [
+        "hello,",
+        "world.",
+        "idea",
+    ]
+    assert client.render("hello", format="pdf").startswith(b"%PDF")
+
+    records = client.encode("Hello idea", names=True)
+    encoded = get_engine().encoder.encode_many(["Hello", "idea"])
+    assert records == [encoded.record(i, names=True) for i in range(2)]
+
+    with pytest.raises(HttpError) as raised:
+        client.render("hello", format="gif")
+    assert raised.value.status == 400
+
+
+def test_concurrent_encodes_are_batched(running):
+    texts = [f"request {i} idea Hello" for i in range(8)]
+    release = running.block_workers()
+    with ThreadPoolExecutor(len(texts)) as pool:
+        futures = [pool.submit(running.client.encode, text) for text in texts]
+        # Every request is queued behind the blocked worker before it frees up
+        running.wait_for_pending(len(texts))
+        release.set()
+        results = [future.result(30) for future in futures]
+
+    encoder = get_engine().encoder
+    for text, records in zip(texts, results):
+        encoded = encoder.encode_many(text.split())
+        assert records == [encoded.record(i) for i in range(len(encoded))]
+    # The first request is encoded on its own, all the others in one batch
+    assert running.client.stats()["encode_batches"] == 2
+
+
+def test_backpressure():
+    running = RunningServer(workers=1, max_pending=2)
+    try:
+        release = running.block_workers()
+        with ThreadPoolExecutor(2) as pool:
+            futures = [
+                pool.submit(running.client.render, "hello", format="layout")
+                for _ in range(2)
+            ]
+            running.wait_for_pending(2)
+
+            with pytest.raises(HttpError) as raised:
+                running.client.encode("hello")
+            assert raised.value.status == 503
+            assert raised.value.headers["Retry-After"] == "1"
+
+            release.set()
+            for future in futures:
+                assert future.result(30)["pages"]
+
+        stats = running.client.stats()
+        assert stats["rejected"] == 1
+        assert stats["pending"] == 0
+        # Jobs are accepted again once the backlog has drained
+        assert running.client.encode("hello")[0]["word"] == "hello"
+    finally:
+        running.close()
@@ -0,0 +1,74 @@
+"""
+Enforces the start-up budget of the CLI: `main.py --help` and an encode-only
+`main.py encode` must not import the rendering dependencies, and their total
+import time, as `benchmarks/startup.py` measures it with -X importtime, must
+stay within its budget.
+"""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+MAIN = os.path.join(SRC, "main.py")
+
+_spec = importlib.util.spec_from_file_location(
+    "startup_benchmark", os.path.join(ROOT, "benchmarks", "startup.py")
+)
+startup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(startup)
+
+RUNS = 3
+
+# Runs main.py as a script and reports the modules it imported on stderr
+PROBE = """
+import json, runpy, sys
+main, args = sys.argv[1], sys.argv[2:]
+sys.path.insert(0, {src!r})
+sys.argv = [main, *args]
+try:
+    runpy.run_path(main, run_name="__main__")
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)), file=sys.stderr)
+"""
+
+
+@pytest.fixture(params=["help", "encode"])
+def command(request, tmp_path):
+    if request.param == "help":
+        return ["--help"]
+    path = tmp_path / "text.txt"
+    path.write_text("Hello, world. Issue 2024\n", encoding="utf-8")
+    return ["encode", str(path)]
+
+
+def test_no_rendering_imports(command):
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE.format(src=SRC), MAIN, *command],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = json.loads(completed.stderr.splitlines()[-1])
+    imported = [
+        name
+        for name in modules
+        if any(
+            name == root or name.startswith(root + ".") for root in startup.FORBIDDEN
+        )
+    ]
+    assert imported == []
+
+
+def test_import_time_within_budget(command):
+    # The best of a few runs, in ms, as the benchmark reports it
+    runs = [startup.import_times(command) for _ in range(RUNS)]
+    total_ms = min(sum(times.values()) for times in runs) / 1000
+    budget_ms = startup.DEFAULT_BUDGET_MS
+    assert total_ms <= budget_ms, f"imports took {total_ms:.1f} ms of {budget_ms} ms"